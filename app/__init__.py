@@ -1,19 +1,59 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate
 import os
+from app.replicas import SessaoRoteada
 
-db = SQLAlchemy()
+# a sessão manda os SELECTs das rotas somente leitura para uma réplica (ver replicas.py)
+db = SQLAlchemy(session_options={'class_': SessaoRoteada})
+migrate = Migrate()
 
 def create_app():
     app = Flask(__name__, static_folder='static', template_folder='templates')
     app.config.from_object('config.Config')
+
+    from app import conexoes
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', conexoes.opcoes_engine(app.config))
     db.init_app(app)
+    # esquema versionado em migrations/ (`flask db upgrade`)
+    migrate.init_app(app, db, directory=os.path.join(os.path.dirname(app.root_path), 'migrations'))
+    with app.app_context():
+        conexoes.init_app(app, db.engine)
+
+    from app import replicas
+    replicas.init_app(app)
+
+    # histogramas por rota em /metrics e log de SQL lento (ver metricas.py)
+    from app import metricas
+    with app.app_context():
+        engines = [db.engine, *getattr(app.extensions.get('replicas'), 'engines', ())]
+        metricas.init_app(app, engines)
+        # perfilador sob demanda (cabeçalho X-Perfil ou amostragem; ver perfil.py)
+        from app import perfil
+        perfil.init_app(app, engines)
 
     # criar tabelas só quando explicitamente solicitado (evita conexões automáticas em produção)
     if os.getenv('FLASK_CREATE_ALL') == '1':
         with app.app_context():
             db.create_all()
 
+    # modo estrito: lazy loads levantam erro e cada resposta informa quantos SQL emitiu
+    if app.config.get('CARREGAMENTO_ESTRITO'):
+        from app.carregamento import contar_consultas
+        with app.app_context():
+            contar_consultas(app, db.engine)
+
     from app.routes import init_app
     init_app(app)
+
+    from app import resumo, importacao, analise, api, planos, semente, desempenho, tarefas, modelos
+    resumo.init_app(app)
+    importacao.init_app(app)
+    analise.init_app(app)
+    api.init_app(app)
+    planos.init_app(app)
+    semente.init_app(app)
+    desempenho.init_app(app)
+    tarefas.init_app(app)
+    modelos.init_app(app)
     return app
\ No newline at end of file
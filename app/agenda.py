@@ -0,0 +1,209 @@
+from bisect import insort
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from flask import current_app
+from sqlalchemy import select
+from app import db
+from app.cache import SnapshotCache, invalidar_em_escritas
+from app.models import Agendamento, Mecanico
+
+#================================
+# AGENDA DOS MECÂNICOS
+#================================
+
+# Cada agendamento ocupa [data + hora, data + hora + duracao_minutos) na agenda do
+# mecânico; um atendimento que passa da meia-noite ocupa também o dia seguinte.
+# - Antes de gravar, `validar` consulta no banco os agendamentos do mecânico do dia
+#   anterior ao último dia ocupado (índice ix_agendamento_mecanico_data) e recusa
+#   sobreposições. Por isso a duração é limitada a DURACAO_MAXIMA.
+# - No PostgreSQL a constraint EXCLUDE ex_agendamento_sobreposto (ver models.py)
+#   garante o mesmo quando dois workers gravam ao mesmo tempo.
+# - A busca de "próximo horário livre" usa um índice em memória com os intervalos
+#   ocupados de cada mecânico por dia, montado com uma consulta para todo o
+#   horizonte e descartado a cada escrita em agendamentos ou mecânicos.
+
+CANCELADO = 'Cancelado'
+PASSO = 15   # horários sugeridos começam em múltiplos de 15 minutos
+DIA = 24 * 60
+DURACAO_MAXIMA = DIA   # minutos
+
+agenda_cache = SnapshotCache('agenda', ttl=60, max_itens=4)
+invalidar_em_escritas(agenda_cache, (Agendamento, Mecanico))
+
+
+class ConflitoAgenda(ValueError):
+    pass
+
+
+def _minutos(hora):
+    return hora.hour * 60 + hora.minute
+
+
+def _hora(minutos):
+    return time(minutos // 60, minutos % 60)
+
+
+def expediente():
+    # (abertura, fechamento) em minutos do dia e dias da semana atendidos (0 = segunda)
+    config = current_app.config
+    inicio = _minutos(time.fromisoformat(config.get('AGENDA_INICIO', '08:00')))
+    fim = _minutos(time.fromisoformat(config.get('AGENDA_FIM', '18:00')))
+    dias = {int(d) for d in str(config.get('AGENDA_DIAS', '0,1,2,3,4,5')).split(',') if d.strip()}
+    return inicio, fim, dias
+
+
+def duracao_padrao():
+    return current_app.config.get('AGENDA_DURACAO_PADRAO', 60)
+
+
+def _arredondar(minutos):
+    return -(-minutos // PASSO) * PASSO
+
+
+def _intervalo(hora, duracao):
+    inicio = _minutos(hora)
+    return inicio, inicio + duracao
+
+
+def _periodo(dia, hora, duracao):
+    inicio = datetime.combine(dia, hora)
+    return inicio, inicio + timedelta(minutes=duracao)
+
+
+#================================
+# Verificação na gravação
+#================================
+
+def consulta_agenda_do_mecanico(id_mecanico, de, ate, ignorar=None):
+    # agendamentos ativos do mecânico com data em [de, ate] (índice ix_agendamento_mecanico_data)
+    consulta = (
+        select(Agendamento.id_agendamento, Agendamento.data_agendamento,
+               Agendamento.hora_agendamento, Agendamento.duracao_minutos)
+        .where(Agendamento.id_mecanico == id_mecanico,
+               Agendamento.data_agendamento >= de,
+               Agendamento.data_agendamento <= ate,
+               Agendamento.status != CANCELADO)
+    )
+    if ignorar is not None:
+        consulta = consulta.where(Agendamento.id_agendamento != ignorar)
+    return consulta
+
+
+def conflitos(id_mecanico, dia, hora, duracao, ignorar=None):
+    # agendamentos ativos do mecânico que se sobrepõem a [inicio, fim), comparados como
+    # datetime; os do dia anterior entram porque podem avançar pela madrugada
+    inicio, fim = _periodo(dia, hora, duracao)
+    consulta = consulta_agenda_do_mecanico(id_mecanico, dia - timedelta(days=DURACAO_MAXIMA // DIA),
+                                           fim.date(), ignorar)
+    ocupados = []
+    # sem autoflush: o próprio agendamento (pendente na sessão) não pode ir ao banco antes da checagem
+    with db.session.no_autoflush:
+        linhas = db.session.execute(consulta).all()
+    for id_agendamento, outro_dia, outra_hora, outra_duracao in linhas:
+        outro_inicio, outro_fim = _periodo(outro_dia, outra_hora, outra_duracao)
+        if outro_inicio < fim and inicio < outro_fim:
+            ocupados.append((id_agendamento, outro_inicio, outro_fim))
+    return ocupados
+
+
+def validar(agendamento):
+    # levanta ConflitoAgenda se o agendamento (novo ou editado) colidir com outro
+    if agendamento.status == CANCELADO:
+        return
+    if agendamento.duracao_minutos is None or agendamento.duracao_minutos <= 0:
+        raise ConflitoAgenda('A duração do agendamento deve ser maior que zero.')
+    if agendamento.duracao_minutos > DURACAO_MAXIMA:
+        raise ConflitoAgenda(f'A duração do agendamento não pode passar de {DURACAO_MAXIMA // 60} horas.')
+    dia = agendamento.data_agendamento
+    ocupados = conflitos(agendamento.id_mecanico, dia,
+                         agendamento.hora_agendamento, agendamento.duracao_minutos,
+                         ignorar=agendamento.id_agendamento)
+    if ocupados:
+        def _quando(momento):
+            return f'{momento:%H:%M}' if momento.date() == dia else f'{momento:%d/%m %H:%M}'
+        descricao = ', '.join(f'{_quando(ini)}–{_quando(fim)}' for _, ini, fim in ocupados)
+        raise ConflitoAgenda(f'O mecânico já tem agendamento neste horário ({descricao}).')
+
+
+#================================
+# Índice em memória e busca de horário livre
+#================================
+
+class IndiceAgenda:
+
+    def __init__(self, inicio, dias):
+        self.inicio = inicio
+        self.fim = inicio + timedelta(days=dias)
+        self.ocupado = defaultdict(lambda: defaultdict(list))   # mecânico -> dia -> [(ini, fim)] ordenado
+        self.especialidades = {}                                 # mecânico -> especialidade
+        for id_mecanico, especialidade in db.session.execute(
+                select(Mecanico.id_mecanico, Mecanico.especialidade)):
+            self.especialidades[id_mecanico] = (especialidade or '').strip().lower()
+        for id_mecanico, dia, hora, duracao in db.session.execute(
+                select(Agendamento.id_mecanico, Agendamento.data_agendamento,
+                       Agendamento.hora_agendamento, Agendamento.duracao_minutos)
+                .where(Agendamento.data_agendamento >= self.inicio - timedelta(days=DURACAO_MAXIMA // DIA),
+                       Agendamento.data_agendamento < self.fim,
+                       Agendamento.status != CANCELADO)):
+            # o que passa da meia-noite vira um intervalo a partir de 0 no dia seguinte
+            ini, fim = _intervalo(hora, duracao)
+            while fim > 0:
+                insort(self.ocupado[id_mecanico][dia], (max(ini, 0), min(fim, DIA)))
+                dia, ini, fim = dia + timedelta(days=1), ini - DIA, fim - DIA
+
+    def mecanicos(self, especialidade=None):
+        if not especialidade:
+            return sorted(self.especialidades)
+        procurada = especialidade.strip().lower()
+        return sorted(m for m, e in self.especialidades.items() if procurada in e)
+
+    def livre_no_dia(self, id_mecanico, dia, duracao, a_partir, expediente):
+        # primeiro início >= a_partir (em passos de PASSO minutos) em que cabe
+        # `duracao` dentro do expediente; poucos intervalos por dia, varredura linear
+        abre, fecha = expediente
+        candidato = _arredondar(max(abre, a_partir))
+        for ini, fim in self.ocupado[id_mecanico].get(dia, ()):
+            if fim <= candidato:
+                continue
+            if ini >= candidato + duracao:
+                break
+            candidato = _arredondar(fim)
+        return candidato if candidato + duracao <= fecha else None
+
+    def proximo(self, mecanicos, duracao, a_partir):
+        abre, fecha, dias_uteis = expediente()
+        dia = a_partir.date()
+        primeiro_minuto = _minutos(a_partir.time())
+        while dia < self.fim:
+            if dia.weekday() in dias_uteis:
+                melhor = None
+                for id_mecanico in mecanicos:
+                    minuto = self.livre_no_dia(id_mecanico, dia, duracao, primeiro_minuto, (abre, fecha))
+                    if minuto is not None and (melhor is None or minuto < melhor[1]):
+                        melhor = (id_mecanico, minuto)
+                if melhor:
+                    return melhor[0], datetime.combine(dia, _hora(melhor[1]))
+            dia += timedelta(days=1)
+            primeiro_minuto = 0
+        return None
+
+
+def indice(hoje=None):
+    hoje = hoje or date.today()
+    dias = current_app.config.get('AGENDA_HORIZONTE_DIAS', 31)
+    return agenda_cache.get_or_set((hoje, dias), lambda: IndiceAgenda(hoje, dias))
+
+
+def proximo_horario(id_mecanico=None, especialidade=None, duracao=None, a_partir=None):
+    # (id_mecanico, datetime) do primeiro horário livre no horizonte, ou None
+    agora = datetime.now().replace(second=0, microsecond=0)
+    if a_partir is not None and a_partir.tzinfo is not None:
+        # a agenda é gravada em hora local sem fuso
+        a_partir = a_partir.astimezone().replace(tzinfo=None)
+    a_partir = max(a_partir or agora, agora)
+    atual = indice(agora.date())
+    if id_mecanico is not None:
+        mecanicos = [id_mecanico] if id_mecanico in atual.especialidades else []
+    else:
+        mecanicos = atual.mecanicos(especialidade)
+    return atual.proximo(mecanicos, duracao or duracao_padrao(), a_partir)
@@ -0,0 +1,290 @@
+import time as relogio
+from dataclasses import dataclass
+from datetime import date, timedelta
+import click
+import numpy as np
+from sqlalchemy import select, func, literal, union_all, extract, null, cast, Float
+from app import db
+from app.agenda import CANCELADO, expediente
+from app.cache import SnapshotCache, invalidar_em_escritas
+from app.models import Mecanico, Servico, Agendamento, OrdemDeServico, ItemOrdemServico
+from app.relatorios import Periodo
+
+#================================
+# CARGA DE TRABALHO E PREVISÃO (NumPy)
+#================================
+
+# Ordens e agendamentos do período vêm numa única consulta (UNION ALL) já como
+# colunas numéricas — tipo, mecânico, início/fim em segundos desde 1970 e minutos
+# de trabalho — e viram arrays NumPy. Todos os cálculos (somas por mecânico,
+# tempo de ciclo, séries semanais, tendência) são vetorizados: nenhum laço
+# Python por linha. Minutos de trabalho de uma OS = Σ quantidade × tempo_estimado.
+
+ORDEM, AGENDAMENTO = 0, 1
+SEMANAS_PREVISAO = 4
+SEMANAS_TENDENCIA = 26
+DIA = 86400
+
+analise_cache = SnapshotCache('analise', ttl=300, max_itens=16)
+invalidar_em_escritas(analise_cache, (OrdemDeServico, ItemOrdemServico, Agendamento, Servico, Mecanico))
+
+
+@dataclass(frozen=True)
+class AnaliseCarga:
+    mecanicos: tuple = ()     # dicts: id, nome, ordens, concluidas, minutos_os, minutos_agenda, utilizacao, ocupacao, ciclo_horas
+    ciclo: dict = None        # tempo de ciclo geral (horas): media, mediana, p90, ordens
+    semanas: tuple = ()       # dicts: inicio, realizado, previsto, agendado, capacidade
+    capacidade_mecanico: float = 0.0
+
+
+def _epoch(coluna):
+    return cast(extract('epoch', coluna), Float)
+
+
+def _consulta(periodo, ate_agendamentos):
+    minutos_os = (
+        select(ItemOrdemServico.id_ordem_servico.label('id_ordem'),
+               func.sum(ItemOrdemServico.quantidade * func.coalesce(Servico.tempo_estimado, 0)).label('minutos'))
+        .join(Servico, Servico.id_servico == ItemOrdemServico.id_servico)
+        .group_by(ItemOrdemServico.id_ordem_servico)
+        .subquery('minutos_os')
+    )
+    ordens = (
+        select(literal(ORDEM).label('tipo'),
+               OrdemDeServico.id_mecanico.label('id_mecanico'),
+               _epoch(OrdemDeServico.data_abertura).label('inicio'),
+               _epoch(OrdemDeServico.data_conclusao).label('fim'),
+               cast(func.coalesce(minutos_os.c.minutos, 0), Float).label('minutos'))
+        .join(minutos_os, minutos_os.c.id_ordem == OrdemDeServico.id_ordem_servico, isouter=True)
+        .where(*periodo.filtro(OrdemDeServico.data_abertura))
+    )
+    # agendamentos do período e das semanas previstas (carga já marcada)
+    agendamentos = (
+        select(literal(AGENDAMENTO),
+               Agendamento.id_mecanico,
+               _epoch(Agendamento.data_agendamento),
+               cast(null(), Float),
+               cast(Agendamento.duracao_minutos, Float))
+        .where(Agendamento.data_agendamento >= periodo.inicio,
+               Agendamento.data_agendamento <= ate_agendamentos,
+               Agendamento.status != CANCELADO)
+    )
+    return union_all(ordens, agendamentos)
+
+
+def carregar_colunas(periodo, ate_agendamentos):
+    return _colunas(db.session.execute(_consulta(periodo, ate_agendamentos)).all())
+
+
+def _colunas(linhas):
+    if not linhas:
+        vazio = np.empty(0)
+        return {'tipo': vazio.astype(np.int8), 'id_mecanico': vazio.astype(np.int64),
+                'inicio': vazio, 'fim': vazio, 'minutos': vazio}
+    tipo, mecanico, inicio, fim, minutos = zip(*linhas)
+    return {
+        'tipo': np.array(tipo, dtype=np.int8),
+        'id_mecanico': np.array(mecanico, dtype=np.int64),
+        'inicio': np.array(inicio, dtype=float),
+        'fim': np.array(fim, dtype=float),       # None -> nan (OS não concluída)
+        'minutos': np.array(minutos, dtype=float),
+    }
+
+
+def _semana(dias):
+    # dias desde 1970-01-01 (quinta) -> índice da semana começando na segunda
+    return (dias + 3) // 7
+
+
+def _dividir(a, b):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(b > 0, a / np.where(b > 0, b, 1), np.nan)
+
+
+def calcular(colunas, ids_mecanicos, inicio, fim, abre, fecha, dias_uteis):
+    # núcleo vetorizado: recebe arrays e devolve só agregados (sem acesso ao banco)
+    tipo, mecanico = colunas['tipo'], colunas['id_mecanico']
+    dias = np.floor(colunas['inicio'] / DIA).astype(np.int64)
+    minutos = colunas['minutos']
+    dia_inicio = (inicio - date(1970, 1, 1)).days
+    dia_fim = (fim - date(1970, 1, 1)).days
+
+    # posição de cada linha no vetor (ordenado) de mecânicos
+    ids_mecanicos = np.asarray(ids_mecanicos, dtype=np.int64)
+    n = len(ids_mecanicos)
+    posicao = np.searchsorted(ids_mecanicos, mecanico)
+    conhecido = np.zeros(len(mecanico), dtype=bool)
+    if n:
+        conhecido = (posicao < n) & (ids_mecanicos[np.minimum(posicao, n - 1)] == mecanico)
+
+    ordem = (tipo == ORDEM) & conhecido
+    agenda = (tipo == AGENDAMENTO) & conhecido & (dias <= dia_fim)
+    concluida = ordem & ~np.isnan(colunas['fim'])
+    ciclo = (colunas['fim'] - colunas['inicio']) / 3600.0
+
+    # capacidade = dias de atendimento no período × horas de expediente
+    mascara = ''.join('1' if d in dias_uteis else '0' for d in range(7))
+    dias_periodo = np.busday_count(inicio, fim + timedelta(days=1), weekmask=mascara)
+    capacidade = float(dias_periodo * (fecha - abre))
+
+    por_mecanico = {
+        'ordens': np.bincount(posicao[ordem], minlength=n),
+        'concluidas': np.bincount(posicao[concluida], minlength=n),
+        'minutos_os': np.bincount(posicao[ordem], weights=minutos[ordem], minlength=n),
+        'minutos_agenda': np.bincount(posicao[agenda], weights=minutos[agenda], minlength=n),
+    }
+    soma_ciclo = np.bincount(posicao[concluida], weights=ciclo[concluida], minlength=n)
+    por_mecanico['ciclo_horas'] = _dividir(soma_ciclo, por_mecanico['concluidas'])
+    por_mecanico['utilizacao'] = _dividir(por_mecanico['minutos_os'], np.full(n, capacidade))
+    por_mecanico['ocupacao'] = _dividir(por_mecanico['minutos_agenda'], np.full(n, capacidade))
+
+    ciclos = ciclo[concluida]
+    geral = {
+        'ordens': int(ciclos.size),
+        'media': float(ciclos.mean()) if ciclos.size else None,
+        'mediana': float(np.median(ciclos)) if ciclos.size else None,
+        'p90': float(np.percentile(ciclos, 90)) if ciclos.size else None,
+    }
+
+    # série semanal: só semanas completas dentro do período entram na tendência
+    semana_inicio = _semana(dia_inicio + 6)
+    ultima_completa = _semana(dia_fim + 1) - 1
+    historico = max(ultima_completa - semana_inicio + 1, 0)
+    semana = _semana(dias)
+    em_historico = ordem & (semana >= semana_inicio) & (semana <= ultima_completa)
+    realizado = np.bincount(semana[em_historico] - semana_inicio,
+                            weights=minutos[em_historico], minlength=historico)[:historico]
+
+    futuras = ultima_completa + 1 + np.arange(SEMANAS_PREVISAO)
+    ja_agendado = (tipo == AGENDAMENTO) & (semana > ultima_completa)
+    agendado = np.bincount(semana[ja_agendado] - futuras[0],
+                           weights=minutos[ja_agendado], minlength=SEMANAS_PREVISAO)[:SEMANAS_PREVISAO]
+
+    base = realizado[-SEMANAS_TENDENCIA:]
+    if base.size >= 2:
+        x = np.arange(base.size)
+        inclinacao, intercepto = np.polyfit(x, base, 1)
+        previsto = np.clip(intercepto + inclinacao * (base.size + np.arange(SEMANAS_PREVISAO)), 0, None)
+    else:
+        previsto = np.full(SEMANAS_PREVISAO, base.mean() if base.size else 0.0)
+
+    capacidade_semana = float(n * len(dias_uteis) * (fecha - abre))
+    return por_mecanico, geral, {
+        'semanas_historico': semana_inicio + np.arange(historico),
+        'realizado': realizado,
+        'semanas_futuras': futuras,
+        'previsto': previsto,
+        'agendado': agendado,
+        'capacidade': capacidade_semana,
+    }, capacidade
+
+
+def _data_da_semana(semana):
+    return date(1970, 1, 1) + timedelta(days=int(semana) * 7 - 3)
+
+
+def analisar(periodo):
+    abre, fecha, dias_uteis = expediente()
+    mecanicos = db.session.execute(
+        select(Mecanico.id_mecanico, Mecanico.nome).order_by(Mecanico.id_mecanico)).all()
+    ids = [m.id_mecanico for m in mecanicos]
+    ate = periodo.fim + timedelta(weeks=SEMANAS_PREVISAO + 1)
+    colunas = carregar_colunas(periodo, ate)
+    por_mecanico, geral, serie, capacidade = calcular(
+        colunas, ids, periodo.inicio, periodo.fim, abre, fecha, dias_uteis)
+
+    def _num(valor):
+        return None if np.isnan(valor) else float(valor)
+
+    linhas = [
+        {'id': m.id_mecanico, 'nome': m.nome,
+         'ordens': int(por_mecanico['ordens'][i]),
+         'concluidas': int(por_mecanico['concluidas'][i]),
+         'minutos_os': float(por_mecanico['minutos_os'][i]),
+         'minutos_agenda': float(por_mecanico['minutos_agenda'][i]),
+         'utilizacao': _num(por_mecanico['utilizacao'][i]),
+         'ocupacao': _num(por_mecanico['ocupacao'][i]),
+         'ciclo_horas': _num(por_mecanico['ciclo_horas'][i])}
+        for i, m in enumerate(mecanicos)
+    ]
+    linhas.sort(key=lambda l: l['minutos_os'], reverse=True)
+
+    semanas = [{'inicio': _data_da_semana(s), 'realizado': float(v), 'previsto': None,
+                'agendado': None, 'capacidade': serie['capacidade']}
+               for s, v in zip(serie['semanas_historico'][-8:], serie['realizado'][-8:])]
+    semanas += [{'inicio': _data_da_semana(s), 'realizado': None, 'previsto': float(p),
+                 'agendado': float(a), 'capacidade': serie['capacidade']}
+                for s, p, a in zip(serie['semanas_futuras'], serie['previsto'], serie['agendado'])]
+    return AnaliseCarga(tuple(linhas), geral, tuple(semanas), capacidade)
+
+
+def analisar_em_cache(periodo):
+    return analise_cache.get_or_set(periodo, lambda: analisar(periodo))
+
+
+def _benchmark_banco(dias, repeticoes):
+    # mesmas etapas de analisar(): execute (o psycopg2 já traz o resultado inteiro),
+    # .all() (tuplas do driver + Row), colunas NumPy e o cálculo
+    abre, fecha, dias_uteis = expediente()
+    periodo = Periodo(date.today() - timedelta(days=dias), date.today())
+    ate = periodo.fim + timedelta(weeks=SEMANAS_PREVISAO + 1)
+    ids = db.session.execute(select(Mecanico.id_mecanico).order_by(Mecanico.id_mecanico)).scalars().all()
+    etapas = {'consulta': [], 'linhas (Row)': [], 'arrays': [], 'cálculo': []}
+    for _ in range(repeticoes):
+        marcas = [relogio.perf_counter()]
+        resultado = db.session.execute(_consulta(periodo, ate))
+        marcas.append(relogio.perf_counter())
+        linhas = resultado.all()
+        marcas.append(relogio.perf_counter())
+        colunas = _colunas(linhas)
+        marcas.append(relogio.perf_counter())
+        calcular(colunas, ids, periodo.inicio, periodo.fim, abre, fecha, dias_uteis)
+        marcas.append(relogio.perf_counter())
+        for tempos, antes, depois in zip(etapas.values(), marcas, marcas[1:]):
+            tempos.append(depois - antes)
+    totais = [sum(t) for t in zip(*etapas.values())]
+    click.echo(f'{len(linhas)} linhas de {periodo.inicio} a {periodo.fim}, {len(ids)} mecânicos (medianas):')
+    for nome, tempos in etapas.items():
+        click.echo(f'  {nome:<14}{np.median(tempos) * 1000:>10.1f} ms  {sum(tempos) / sum(totais):>4.0%}')
+    click.echo(f"  {'total':<14}{np.median(totais) * 1000:>10.1f} ms  (melhor {min(totais) * 1000:.1f} ms)")
+
+
+def _benchmark_sintetico(ordens, mecanicos, repeticoes):
+    gerador = np.random.default_rng(42)
+    fim = date.today()
+    inicio = fim - timedelta(days=365)
+    base = (inicio - date(1970, 1, 1)).days * DIA
+    n_agendamentos = ordens // 2
+    total = ordens + n_agendamentos
+    abertura = base + gerador.uniform(0, 365 * DIA, total)
+    colunas = {
+        'tipo': np.r_[np.zeros(ordens, np.int8), np.ones(n_agendamentos, np.int8)],
+        'id_mecanico': gerador.integers(1, mecanicos + 1, total),
+        'inicio': abertura,
+        'fim': np.where(gerador.random(total) < 0.8, abertura + gerador.exponential(2 * DIA, total), np.nan),
+        'minutos': gerador.integers(15, 480, total).astype(float),
+    }
+    abre, fecha, dias_uteis = expediente()
+    tempos = []
+    for _ in range(repeticoes):
+        comeco = relogio.perf_counter()
+        calcular(colunas, range(1, mecanicos + 1), inicio, fim, abre, fecha, dias_uteis)
+        tempos.append(relogio.perf_counter() - comeco)
+    click.echo(f'{ordens} ordens + {n_agendamentos} agendamentos, {mecanicos} mecânicos: '
+               f'melhor {min(tempos) * 1000:.1f} ms, mediana {np.median(tempos) * 1000:.1f} ms')
+
+
+def init_app(app):
+
+    @app.cli.command('analise-benchmark')
+    @click.option('--dias', default=365, show_default=True, help='Período analisado (até hoje).')
+    @click.option('--sintetico', is_flag=True, help='Só o cálculo, com dados gerados em memória.')
+    @click.option('--ordens', default=1_000_000, show_default=True, help='Ordens sintéticas.')
+    @click.option('--mecanicos', default=50, show_default=True, help='Mecânicos sintéticos.')
+    @click.option('--repeticoes', default=5, show_default=True)
+    def analise_benchmark(dias, sintetico, ordens, mecanicos, repeticoes):
+        """Mede a análise de carga de ponta a ponta: consulta, linhas, arrays e cálculo."""
+        if sintetico:
+            _benchmark_sintetico(ordens, mecanicos, repeticoes)
+        else:
+            _benchmark_banco(dias, repeticoes)
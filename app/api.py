@@ -0,0 +1,230 @@
+import hashlib
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from flask import Blueprint, Response, request, current_app, url_for, abort
+from sqlalchemy import select, inspect
+from werkzeug.exceptions import HTTPException
+from app import db
+from app.models import (Cliente, Veiculo, Mecanico, Servico, Peca, Agendamento,
+                        OrdemDeServico, ItemOrdemServico, PecaOrdemServico)
+from app.paginacao import codificar_cursor, decodificar_cursor, POR_PAGINA_PADRAO, POR_PAGINA_MAX
+
+try:
+    import orjson
+except ImportError:  # opcional: sem ele usamos o json da biblioteca padrão
+    orjson = None
+
+#================================
+# API JSON (somente leitura) — /api/v1
+#================================
+
+# GET /api/v1/<recurso>?campos=a,b&limite=50&apos=<cursor>&<filtro>=<valor>
+# GET /api/v1/<recurso>/<id>?campos=a,b
+#
+# - As consultas selecionam só as colunas pedidas (tuplas do Core, sem montar
+#   objetos do ORM) e cada conjunto de campos tem um serializador pré-compilado
+#   que aplica conversões apenas nas colunas que precisam (Decimal, datas).
+# - A paginação é por cursor na chave primária (ver paginacao.py).
+# - O ETag é um hash das linhas lidas do banco e dos parâmetros da consulta.
+#   Se bater com o If-None-Match a resposta é 304, antes de qualquer
+#   serialização. Como depende só dos dados, vale entre workers diferentes.
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def _conversor(coluna):
+    try:
+        tipo = coluna.type.python_type
+    except NotImplementedError:
+        return None
+    if tipo is Decimal:
+        return str     # valores monetários em texto, sem perder precisão
+    if tipo in (date, datetime, time):
+        return tipo.isoformat
+    return None
+
+
+def _compilar(campos, conversores):
+    # serializador de uma linha (tupla) para o conjunto de campos pedido
+    if all(conversores[c] is None for c in campos):
+        return lambda linha: dict(zip(campos, linha))
+    pares = tuple((c, conversores[c]) for c in campos)
+
+    def serializar(linha):
+        return {nome: valor if conv is None or valor is None else conv(valor)
+                for (nome, conv), valor in zip(pares, linha)}
+    return serializar
+
+
+class Recurso:
+
+    def __init__(self, modelo, filtros=()):
+        self.modelo = modelo
+        atributos = inspect(modelo).column_attrs
+        self.colunas = {a.key: getattr(modelo, a.key) for a in atributos}
+        self.pk = getattr(modelo, inspect(modelo).primary_key[0].key)
+        self.conversores = {chave: _conversor(col) for chave, col in self.colunas.items()}
+        self.filtros = {chave: self.colunas[chave] for chave in filtros}
+        self._serializadores = {}
+
+    def campos(self, pedido):
+        # PK sempre presente e sempre primeiro; demais na ordem do modelo
+        if not pedido:
+            return tuple(self.colunas)
+        nomes = {c.strip() for c in pedido.split(',') if c.strip()}
+        desconhecidos = nomes - set(self.colunas)
+        if desconhecidos:
+            abort(400, f"campo(s) inexistente(s): {', '.join(sorted(desconhecidos))}")
+        nomes.add(self.pk.key)
+        return tuple(c for c in self.colunas if c in nomes)
+
+    def serializador(self, campos):
+        serializar = self._serializadores.get(campos)
+        if serializar is None:
+            serializar = self._serializadores[campos] = _compilar(campos, self.conversores)
+        return serializar
+
+    def consulta(self, campos):
+        return select(*[self.colunas[c] for c in campos])
+
+    def filtrar(self, consulta, args):
+        for chave, coluna in self.filtros.items():
+            valor = args.get(chave)
+            if valor is None:
+                continue
+            try:
+                tipo = coluna.type.python_type
+                valor = tipo.fromisoformat(valor) if tipo in (date, datetime, time) else tipo(valor)
+            except ValueError:
+                abort(400, f"valor inválido para '{chave}'")
+            consulta = consulta.where(coluna == valor)
+        return consulta
+
+
+RECURSOS = {
+    'clientes': Recurso(Cliente, filtros=('cpf', 'email')),
+    'veiculos': Recurso(Veiculo, filtros=('id_cliente', 'placa')),
+    'mecanicos': Recurso(Mecanico, filtros=('especialidade',)),
+    'servicos': Recurso(Servico),
+    'pecas': Recurso(Peca),
+    'agendamentos': Recurso(Agendamento, filtros=('id_veiculo', 'id_mecanico', 'data_agendamento', 'status')),
+    'ordens': Recurso(OrdemDeServico, filtros=('id_veiculo', 'id_mecanico', 'id_agendamento', 'status')),
+}
+
+# linhas da OS incluídas no detalhe de /ordens/<id>
+LINHAS_ORDEM = {
+    'servicos': Recurso(ItemOrdemServico),
+    'pecas': Recurso(PecaOrdemServico),
+}
+
+
+#================================
+# Respostas
+#================================
+
+def _dumps(dados):
+    if orjson is not None:
+        return orjson.dumps(dados)
+    return json.dumps(dados, ensure_ascii=False, separators=(',', ':'))
+
+
+def _etag(*partes):
+    # repr de tuplas com int/str/Decimal/date é estável entre processos
+    return hashlib.blake2b(repr(partes).encode(), digest_size=16).hexdigest()
+
+
+def _responder(etag, montar):
+    # `montar` só é chamado (e o JSON só é gerado) se o cliente não tiver a versão atual
+    if etag in request.if_none_match:
+        resposta = Response(status=304)
+    else:
+        resposta = Response(_dumps(montar()), mimetype='application/json')
+    resposta.set_etag(etag)
+    resposta.headers['Cache-Control'] = 'private, no-cache'
+    return resposta
+
+
+@api.errorhandler(HTTPException)
+def _erro(e):
+    return Response(_dumps({'erro': e.description}), status=e.code, mimetype='application/json')
+
+
+def _recurso(nome):
+    recurso = RECURSOS.get(nome)
+    if recurso is None:
+        abort(404, f"recurso '{nome}' não existe")
+    return recurso
+
+
+#================================
+# Rotas
+#================================
+
+@api.route('/')
+def indice():
+    return Response(_dumps({nome: {'url': url_for('api.listar', recurso=nome),
+                                   'campos': list(r.colunas), 'filtros': list(r.filtros)}
+                            for nome, r in RECURSOS.items()}),
+                    mimetype='application/json')
+
+
+@api.route('/<recurso>')
+def listar(recurso):
+    nome, recurso = recurso, _recurso(recurso)
+    campos = recurso.campos(request.args.get('campos'))
+    maximo = current_app.config.get('LISTAGEM_MAX_POR_PAGINA', POR_PAGINA_MAX)
+    limite = request.args.get('limite', type=int) or current_app.config.get('LISTAGEM_POR_PAGINA', POR_PAGINA_PADRAO)
+    limite = max(1, min(limite, maximo))
+
+    consulta = recurso.filtrar(recurso.consulta(campos), request.args)
+    apos = decodificar_cursor(request.args.get('apos'), nome, [(recurso.pk, False)])
+    if apos is not None:
+        consulta = consulta.where(recurso.pk > apos[0])
+    linhas = db.session.execute(consulta.order_by(recurso.pk).limit(limite + 1)).all()
+
+    proximo = url = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo = codificar_cursor(nome, [linhas[-1][campos.index(recurso.pk.key)]])
+        url = url_for('api.listar', recurso=nome, _external=True, **{**request.args.to_dict(), 'apos': proximo})
+
+    def montar():
+        serializar = recurso.serializador(campos)
+        return {'dados': [serializar(l) for l in linhas], 'proximo': proximo, 'url_proximo': url}
+
+    resposta = _responder(_etag(request.full_path, linhas), montar)
+    if url:
+        resposta.headers['Link'] = f'<{url}>; rel="next"'
+    return resposta
+
+
+@api.route('/<recurso>/<int:id>')
+def detalhe(recurso, id):
+    nome, recurso = recurso, _recurso(recurso)
+    campos = recurso.campos(request.args.get('campos'))
+    linha = db.session.execute(recurso.consulta(campos).where(recurso.pk == id)).first()
+    if linha is None:
+        abort(404, f"{nome} #{id} não encontrado")
+
+    extras = {}
+    if recurso.modelo is OrdemDeServico:
+        for chave, linhas_recurso in LINHAS_ORDEM.items():
+            campos_linha = linhas_recurso.campos(None)
+            extras[chave] = (campos_linha, db.session.execute(
+                linhas_recurso.consulta(campos_linha)
+                .where(linhas_recurso.colunas['id_ordem_servico'] == id)
+                .order_by(linhas_recurso.pk)).all())
+
+    def montar():
+        dados = recurso.serializador(campos)(linha)
+        for chave, (campos_linha, linhas) in extras.items():
+            serializar = LINHAS_ORDEM[chave].serializador(campos_linha)
+            dados[chave] = [serializar(l) for l in linhas]
+        return dados
+
+    return _responder(_etag(request.full_path, linha, [l for _, l in extras.values()]), montar)
+
+
+def init_app(app):
+    app.register_blueprint(api)
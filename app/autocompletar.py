@@ -0,0 +1,136 @@
+from sqlalchemy import select, or_, case
+from app import db, catalogos
+from app.models import Cliente, Veiculo, Agendamento, Peca
+
+#================================
+# AUTOCOMPLETAR (campos de seleção dos formulários)
+#================================
+
+# Os formulários não embutem mais tabelas inteiras em <select>: cada campo busca
+# as opções sob demanda em /autocompletar/<tipo>?q=..., limitado a poucas linhas.
+# Resultados que começam com o termo vêm antes dos que apenas o contêm; no
+# PostgreSQL os dois casos usam os índices de trigramas (ver models.py).
+# Serviços e mecânicos são filtrados em memória sobre o snapshot de catalogos.py;
+# peças continuam no banco porque o rótulo mostra o estoque atual.
+
+LIMITE = 10
+LIMITE_MAX = 50
+
+
+class Fonte:
+
+    def __init__(self, chave, colunas, pesquisadas, ordem, texto, extras=None, juncoes=()):
+        self.chave = chave
+        self.colunas = colunas
+        self.pesquisadas = pesquisadas
+        self.ordem = ordem
+        self.texto = texto
+        self.extras = extras or (lambda linha: {})
+        self.juncoes = juncoes
+
+    def _consulta(self):
+        consulta = select(self.chave, *self.colunas)
+        for alvo, condicao in self.juncoes:
+            consulta = consulta.join(alvo, condicao)
+        return consulta
+
+    def _item(self, linha):
+        return {'id': linha[0], 'texto': self.texto(linha), **self.extras(linha)}
+
+    def buscar(self, termo, limite):
+        consulta = self._consulta()
+        termo = (termo or '').strip()
+        if termo:
+            padrao = termo.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            prefixo = or_(*[c.ilike(f'{padrao}%', escape='\\') for c in self.pesquisadas])
+            contem = or_(*[c.ilike(f'%{padrao}%', escape='\\') for c in self.pesquisadas])
+            consulta = consulta.where(contem).order_by(case((prefixo, 0), else_=1))
+        consulta = consulta.order_by(*self.ordem, self.chave).limit(limite)
+        return [self._item(linha) for linha in db.session.execute(consulta)]
+
+    def selecionados(self, ids):
+        # rótulos dos valores já gravados (formulários de edição) — uma consulta
+        ids = {i for i in ids if i is not None}
+        if not ids:
+            return {}
+        consulta = self._consulta().where(self.chave.in_(ids))
+        return {linha[0]: self._item(linha) for linha in db.session.execute(consulta)}
+
+
+class FonteCatalogo:
+    # mesma interface de Fonte, sobre o snapshot imutável do catálogo
+
+    def __init__(self, catalogo, texto, extras=None):
+        self.catalogo = catalogo
+        self.texto = texto
+        self.extras = extras or (lambda item: {})
+
+    def _item(self, item):
+        return {'id': item.id, 'texto': self.texto(item), **self.extras(item)}
+
+    def buscar(self, termo, limite):
+        itens = catalogos.CATALOGOS[self.catalogo].obter().itens
+        termo = (termo or '').strip().lower()
+        if termo:
+            # itens já vêm ordenados por nome; o sort estável só sobe os que começam com o termo
+            itens = [item for item in itens if termo in item.nome.lower()]
+            itens.sort(key=lambda item: not item.nome.lower().startswith(termo))
+        return [self._item(item) for item in itens[:limite]]
+
+    def selecionados(self, ids):
+        por_id = catalogos.CATALOGOS[self.catalogo].obter().por_id
+        return {i: self._item(por_id[i]) for i in ids if i in por_id}
+
+
+FONTES = {
+    'clientes': Fonte(
+        Cliente.id_cliente, (Cliente.nome, Cliente.cpf),
+        pesquisadas=(Cliente.nome, Cliente.cpf),
+        ordem=(Cliente.nome,),
+        texto=lambda l: f'{l.nome} — {l.cpf}'),
+    'veiculos': Fonte(
+        Veiculo.id_veiculo, (Veiculo.placa, Veiculo.modelo),
+        pesquisadas=(Veiculo.placa, Veiculo.modelo),
+        ordem=(Veiculo.placa,),
+        texto=lambda l: f'{l.placa} - {l.modelo}'),
+    'mecanicos': FonteCatalogo('mecanicos', texto=lambda m: m.nome),
+    'agendamentos': Fonte(
+        Agendamento.id_agendamento,
+        (Agendamento.data_agendamento, Agendamento.hora_agendamento, Veiculo.placa),
+        pesquisadas=(Veiculo.placa,),
+        ordem=(Agendamento.data_agendamento.desc(), Agendamento.hora_agendamento.desc()),
+        texto=lambda l: f'{l.data_agendamento} - {l.hora_agendamento} ({l.placa})',
+        juncoes=((Veiculo, Veiculo.id_veiculo == Agendamento.id_veiculo),)),
+    'servicos': FonteCatalogo(
+        'servicos', texto=lambda s: s.nome,
+        extras=lambda s: {'preco': float(s.preco), 'tempo': s.tempo}),
+    'pecas': Fonte(
+        Peca.id_peca, (Peca.nome_peca, Peca.preco_venda, Peca.estoque_atual),
+        pesquisadas=(Peca.nome_peca,),
+        ordem=(Peca.nome_peca,),
+        texto=lambda l: f'{l.nome_peca} (estoque: {l.estoque_atual})',
+        extras=lambda l: {'preco': float(l.preco_venda)}),
+}
+
+
+def buscar(tipo, termo, limite=LIMITE):
+    return FONTES[tipo].buscar(termo, max(1, min(limite, LIMITE_MAX)))
+
+
+def selecionados(tipo, ids):
+    return FONTES[tipo].selecionados(ids)
+
+
+def selecionado(tipo, id_item):
+    return selecionados(tipo, (id_item,)).get(id_item)
+
+
+def selecionados_das_linhas(tipo, linhas, atributo):
+    # linhas já lançadas na OS: rótulo do catálogo + preço praticado na própria linha
+    rotulos = selecionados(tipo, [getattr(l, atributo) for l in linhas])
+    pares = []
+    for linha in linhas:
+        id_item = getattr(linha, atributo)
+        rotulo = rotulos.get(id_item, {'texto': f'#{id_item}'})
+        pares.append((linha, {**rotulo, 'id': id_item, 'preco': float(linha.preco_unitario)}))
+    return pares
@@ -0,0 +1,161 @@
+import re
+import unicodedata
+from collections import defaultdict
+from flask import url_for
+from sqlalchemy import select, func, or_
+from app import db
+from app.cache import SnapshotCache, invalidar_em_escritas
+from app.models import Cliente, Veiculo, OrdemDeServico
+
+#================================
+# BUSCA RÁPIDA (clientes, veículos e ordens)
+#================================
+
+# No PostgreSQL a busca usa os índices GIN com gin_trgm_ops (pg_trgm, ver models.py):
+# ILIKE '%termo%' e o operador de similaridade `%` são atendidos pelo índice e o
+# ranking é feito por similarity(). Em outros bancos (SQLite nos testes locais)
+# usamos um índice de trigramas em memória, reconstruído após escritas.
+
+LIMITE = 8
+LIMITE_MAX = 50
+MIN_CARACTERES = 2
+
+busca_cache = SnapshotCache('busca', ttl=300, max_itens=3)
+invalidar_em_escritas(busca_cache, (Cliente, Veiculo, OrdemDeServico))
+
+
+def _resultado_cliente(id_cliente, nome, cpf, telefone, email):
+    return {'id': id_cliente, 'titulo': nome, 'detalhe': f'{cpf} · {telefone} · {email}',
+            'url': url_for('clientes_editar', id=id_cliente)}
+
+
+def _resultado_veiculo(id_veiculo, placa, marca, modelo):
+    return {'id': id_veiculo, 'titulo': placa, 'detalhe': f'{marca} {modelo}',
+            'url': url_for('veiculos_editar', id=id_veiculo)}
+
+
+def _resultado_ordem(id_ordem, numero_os, status):
+    return {'id': id_ordem, 'titulo': numero_os, 'detalhe': status,
+            'url': url_for('ordens_editar', id=id_ordem)}
+
+
+# tipo -> (modelo, colunas exibidas, colunas pesquisadas, formatador)
+FONTES = {
+    'clientes': (Cliente,
+                 (Cliente.id_cliente, Cliente.nome, Cliente.cpf, Cliente.telefone, Cliente.email),
+                 (Cliente.nome, Cliente.cpf, Cliente.telefone, Cliente.email),
+                 _resultado_cliente),
+    'veiculos': (Veiculo,
+                 (Veiculo.id_veiculo, Veiculo.placa, Veiculo.marca, Veiculo.modelo),
+                 (Veiculo.placa, Veiculo.modelo),
+                 _resultado_veiculo),
+    'ordens': (OrdemDeServico,
+               (OrdemDeServico.id_ordem_servico, OrdemDeServico.numero_os, OrdemDeServico.status),
+               (OrdemDeServico.numero_os,),
+               _resultado_ordem),
+}
+
+
+def normalizar(texto):
+    # minúsculas e sem acentos, para casar "joao" com "João"
+    texto = unicodedata.normalize('NFKD', str(texto or '').lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c)).strip()
+
+
+def _escapar_like(termo):
+    return re.sub(r'([\\%_])', r'\\\1', termo)
+
+
+#================================
+# PostgreSQL (pg_trgm)
+#================================
+
+def _buscar_sql(tipo, termo, limite):
+    _, exibidas, pesquisadas, formatar = FONTES[tipo]
+    padrao = f'%{_escapar_like(termo)}%'
+    parecido = [coluna.ilike(padrao, escape='\\') for coluna in pesquisadas]
+    parecido += [coluna.op('%')(termo) for coluna in pesquisadas]
+    # contém o termo > semelhante ao termo; depois, maior similaridade
+    contem = or_(*parecido[:len(pesquisadas)])
+    score = func.greatest(*[func.similarity(coluna, termo) for coluna in pesquisadas])
+    consulta = (
+        select(*exibidas, score.label('score'))
+        .where(or_(*parecido))
+        .order_by(contem.desc(), score.desc(), exibidas[0])
+        .limit(limite)
+    )
+    return [dict(formatar(*linha[:-1]), score=round(float(linha.score), 3))
+            for linha in db.session.execute(consulta)]
+
+
+#================================
+# Fallback em memória (SQLite)
+#================================
+
+def _trigramas(texto):
+    # mesma regra do pg_trgm: palavras com dois espaços antes e um depois
+    trigramas = set()
+    for palavra in re.findall(r'\w+', texto):
+        palavra = f'  {palavra} '
+        trigramas.update(palavra[i:i + 3] for i in range(len(palavra) - 2))
+    return trigramas
+
+
+class IndiceMemoria:
+
+    def __init__(self, tipo):
+        _, exibidas, pesquisadas, _ = FONTES[tipo]
+        self.tipo = tipo
+        self.registros = {}                  # id -> linha exibida
+        self.textos = {}                     # id -> [textos normalizados]
+        self.invertido = defaultdict(set)    # trigrama -> ids
+        consulta = select(*exibidas, *pesquisadas)
+        for linha in db.session.execute(consulta):
+            chave = linha[0]
+            self.registros[chave] = tuple(linha[:len(exibidas)])
+            textos = [normalizar(v) for v in linha[len(exibidas):] if v is not None]
+            self.textos[chave] = textos
+            for texto in textos:
+                for trigrama in _trigramas(texto):
+                    self.invertido[trigrama].add(chave)
+
+    def buscar(self, termo, limite):
+        termo = normalizar(termo)
+        alvo = _trigramas(termo)
+        if len(termo) < 3:
+            candidatos = self.registros  # termo curto: trigramas não ajudam, varre tudo
+        else:
+            candidatos = set()
+            for trigrama in alvo:
+                candidatos |= self.invertido.get(trigrama, set())
+        achados = []
+        for chave in candidatos:
+            contem = any(termo in texto for texto in self.textos[chave])
+            score = max((self._similaridade(alvo, texto) for texto in self.textos[chave]), default=0.0)
+            if contem or score >= 0.3:
+                achados.append((not contem, -score, chave))
+        achados.sort()
+        formatar = FONTES[self.tipo][3]
+        return [dict(formatar(*self.registros[chave]), score=round(-score, 3))
+                for _, score, chave in achados[:limite]]
+
+    @staticmethod
+    def _similaridade(alvo, texto):
+        trigramas = _trigramas(texto)
+        uniao = alvo | trigramas
+        return len(alvo & trigramas) / len(uniao) if uniao else 0.0
+
+
+def _buscar_memoria(tipo, termo, limite):
+    indice = busca_cache.get_or_set(tipo, lambda: IndiceMemoria(tipo))
+    return indice.buscar(termo, limite)
+
+
+def buscar(termo, tipos=None, limite=LIMITE):
+    termo = (termo or '').strip()
+    tipos = [t for t in (tipos or FONTES) if t in FONTES]
+    if len(termo) < MIN_CARACTERES:
+        return {t: [] for t in tipos}
+    limite = max(1, min(limite, LIMITE_MAX))
+    motor = _buscar_sql if db.engine.dialect.name == 'postgresql' else _buscar_memoria
+    return {t: motor(t, termo, limite) for t in tipos}
@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.replicas import atraso_da_replica
+
+#================================
+# CACHE EM MEMÓRIA (por processo)
+#================================
+
+_AUSENTE = object()
+
+
+class SnapshotCache:
+    # cache LRU com expiração (TTL). Cada worker do gunicorn tem o seu;
+    # as escritas feitas por outro worker só aparecem após o TTL.
+
+    def __init__(self, nome, ttl=30, max_itens=16):
+        self.nome = nome
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidacoes = 0
+        self._invalidado_em = float('-inf')
+
+    def get(self, chave):
+        agora = time.monotonic()
+        with self._lock:
+            item = self._itens.get(chave, _AUSENTE)
+            if item is not _AUSENTE:
+                expira, valor = item
+                if expira > agora:
+                    self._itens.move_to_end(chave)
+                    self.hits += 1
+                    return valor
+                del self._itens[chave]
+            self.misses += 1
+            return _AUSENTE
+
+    def set(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + self.ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def get_or_set(self, chave, calcular):
+        valor = self.get(chave)
+        if valor is _AUSENTE:
+            valor = calcular()
+            if not self._talvez_atrasado():
+                self.set(chave, valor)
+        return valor
+
+    def _talvez_atrasado(self):
+        # calculado numa réplica logo após uma invalidação: a réplica pode ainda
+        # não ter a escrita, então o valor serve só para esta requisição
+        atraso = atraso_da_replica()
+        return atraso > 0 and time.monotonic() - self._invalidado_em < atraso
+
+    def invalidar(self):
+        with self._lock:
+            self._itens.clear()
+            self.invalidacoes += 1
+            self._invalidado_em = time.monotonic()
+
+    def invalidar_na_sessao(self, sessao):
+        # para escritas em lote (update()/insert() do Core), que não disparam
+        # os eventos do mapper: invalida agora e de novo após o commit
+        self.invalidar()
+        sessao.info[self.chave_sessao] = True
+
+    @property
+    def chave_sessao(self):
+        return f'invalidar_{self.nome}'
+
+    def configurar(self, ttl=None, max_itens=None):
+        if ttl is not None:
+            self.ttl = ttl
+        if max_itens is not None:
+            self.max_itens = max_itens
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'nome': self.nome,
+                'itens': len(self._itens),
+                'max_itens': self.max_itens,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidacoes': self.invalidacoes,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+def invalidar_em_escritas(cache, modelos):
+    # Invalida `cache` sempre que algum dos modelos é inserido, alterado ou removido.
+    # A invalidação acontece no flush e de novo após o commit, para que uma
+    # requisição concorrente que tenha recalculado entre os dois não deixe
+    # um snapshot antigo no cache.
+    chave_sessao = cache.chave_sessao
+
+    def _marcar(mapper, connection, target):
+        sessao = Session.object_session(target)
+        if sessao is not None:
+            cache.invalidar_na_sessao(sessao)
+        else:
+            cache.invalidar()
+
+    for modelo in modelos:
+        for evento in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(modelo, evento, _marcar)
+
+    @event.listens_for(Session, 'after_commit')
+    def _apos_commit(sessao):
+        if sessao.info.pop(chave_sessao, False):
+            cache.invalidar()
+
+    @event.listens_for(Session, 'after_rollback')
+    def _apos_rollback(sessao):
+        sessao.info.pop(chave_sessao, None)
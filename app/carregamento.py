@@ -0,0 +1,82 @@
+from flask import current_app, request
+from sqlalchemy.orm import joinedload, load_only, raiseload
+from app import metricas
+from app.models import Cliente, Veiculo, Mecanico, Agendamento, OrdemDeServico
+
+#================================
+# POLÍTICA DE CARREGAMENTO (EAGER LOADING)
+#================================
+
+# Para cada rota, quais relacionamentos o template acessa e como carregá-los.
+# Formato: endpoint -> modelo consultado -> ((relacionamento, colunas, estratégia), ...)
+# Colunas vazias = carrega o objeto relacionado inteiro. Rotas sem relacionamentos
+# no template ficam com {} (no modo estrito, qualquer lazy load vira erro).
+CARREGAMENTOS = {
+    'clientes_listar': {},
+    'mecanicos_listar': {},
+    'servicos_listar': {},
+    'pecas_listar': {},
+    'pecas_reposicao': {},
+    # os formulários de edição mostram só rótulos (autocompletar.selecionado)
+    'clientes_editar': {},
+    'veiculos_editar': {},
+    'mecanicos_editar': {},
+    'servicos_editar': {},
+    'pecas_editar': {},
+    'agendamentos_editar': {},
+    'ordens_editar': {},
+    'veiculos_listar': {
+        Veiculo: ((Veiculo.cliente, (Cliente.nome,), joinedload),),
+    },
+    'agendamentos_listar': {
+        Agendamento: (
+            (Agendamento.veiculo, (Veiculo.placa, Veiculo.modelo), joinedload),
+            (Agendamento.mecanico, (Mecanico.nome,), joinedload),
+        ),
+    },
+    'ordens_listar': {
+        OrdemDeServico: (
+            (OrdemDeServico.veiculo, (Veiculo.placa, Veiculo.modelo), joinedload),
+            (OrdemDeServico.mecanico, (Mecanico.nome,), joinedload),
+        ),
+    },
+}
+
+
+def _estrito():
+    # com CARREGAMENTO_ESTRITO ligado, qualquer lazy load não previsto acima
+    # levanta InvalidRequestError em vez de disparar um SELECT por linha
+    return current_app.config.get('CARREGAMENTO_ESTRITO', False)
+
+
+def opcoes_para(endpoint, modelo, estrito=False):
+    opcoes = []
+    for relacao, colunas, estrategia in CARREGAMENTOS.get(endpoint, {}).get(modelo, ()):
+        sub = []
+        if colunas:
+            sub.append(load_only(*colunas, raiseload=estrito))
+        if estrito:
+            sub.append(raiseload('*'))
+        carregador = estrategia(relacao)
+        opcoes.append(carregador.options(*sub) if sub else carregador)
+    if estrito:
+        opcoes.append(raiseload('*'))
+    return opcoes
+
+
+def carregar(query, endpoint=None):
+    # aplica à query as opções registradas para a rota atual
+    modelo = query.column_descriptions[0]['entity']
+    opcoes = opcoes_para(endpoint or request.endpoint, modelo, estrito=_estrito())
+    return query.options(*opcoes) if opcoes else query
+
+
+def contar_consultas(app, engine):
+    # Em modo estrito, devolve no cabeçalho X-SQL-Queries quantos statements a
+    # requisição emitiu (o contador de metricas.py; ver tests/test_carregamento.py).
+    metricas.contar_statements(engine)
+
+    @app.after_request
+    def _cabecalho(resposta):
+        resposta.headers['X-SQL-Queries'] = str(metricas.statements())
+        return resposta
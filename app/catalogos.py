@@ -0,0 +1,174 @@
+import threading
+from decimal import Decimal
+from types import MappingProxyType
+from typing import NamedTuple, Optional
+from flask import g, has_request_context
+from sqlalchemy import event, select, update, inspect
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Servico, Peca, Mecanico, VersaoCatalogo
+
+#================================
+# CATÁLOGOS DE REFERÊNCIA (serviços, peças, mecânicos)
+#================================
+
+# Cada worker guarda os catálogos como snapshots imutáveis (tuplas de registros,
+# não objetos do ORM), marcados com a versão lida em versao_catalogo. Toda escrita
+# nesses modelos incrementa a versão na mesma transação; antes de reaproveitar o
+# snapshot o worker faz um único SELECT nas três versões (uma vez por requisição)
+# e só recarrega o catálogo que mudou — vale para escritas feitas em qualquer worker.
+# O estoque das peças muda a cada OS e fica fora do snapshot: só alterações em
+# nome/preço incrementam a versão das peças.
+
+
+class ServicoRef(NamedTuple):
+    id: int
+    nome: str
+    preco: Decimal
+    tempo: Optional[int]
+
+
+class PecaRef(NamedTuple):
+    id: int
+    nome: str
+    preco: Decimal
+
+
+class MecanicoRef(NamedTuple):
+    id: int
+    nome: str
+    especialidade: Optional[str]
+
+
+class Snapshot:
+    __slots__ = ('versao', 'itens', 'por_id')
+
+    def __init__(self, versao, itens):
+        self.versao = versao
+        self.itens = itens                                            # ordenados por nome
+        self.por_id = MappingProxyType({item.id: item for item in itens})
+
+
+class Catalogo:
+
+    def __init__(self, nome, modelo, registro, colunas):
+        self.nome = nome
+        self.modelo = modelo
+        self.registro = registro
+        self.colunas = colunas                    # na ordem dos campos do registro
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self.recargas = 0
+        self.reaproveitados = 0
+
+    def _carregar(self, versao):
+        chave, nome = self.colunas[:2]
+        linhas = db.session.execute(select(*self.colunas).order_by(nome, chave))
+        return Snapshot(versao, tuple(self.registro._make(linha) for linha in linhas))
+
+    def obter(self):
+        if self.nome in db.session.info.get(CHAVE_SESSAO, ()):
+            # escrita ainda não confirmada nesta sessão: não publica o que ela enxerga
+            return self._carregar(None)
+        versao = versoes().get(self.nome)
+        atual = self._snapshot
+        if atual is not None and versao is not None and atual.versao == versao:
+            self.reaproveitados += 1
+            return atual
+        with self._lock:
+            atual = self._snapshot
+            if atual is None or versao is None or atual.versao != versao:
+                atual = self._carregar(versao)
+                self._snapshot = atual
+                self.recargas += 1
+            return atual
+
+    def stats(self):
+        atual = self._snapshot
+        return {
+            'nome': self.nome,
+            'versao': atual.versao if atual else None,
+            'itens': len(atual.itens) if atual else 0,
+            'recargas': self.recargas,
+            'reaproveitados': self.reaproveitados,
+        }
+
+
+CHAVE_SESSAO = 'catalogos_alterados'
+
+CATALOGOS = {
+    'servicos': Catalogo('servicos', Servico, ServicoRef,
+                         (Servico.id_servico, Servico.nome_servico, Servico.preco_base, Servico.tempo_estimado)),
+    'pecas': Catalogo('pecas', Peca, PecaRef,
+                      (Peca.id_peca, Peca.nome_peca, Peca.preco_venda)),
+    'mecanicos': Catalogo('mecanicos', Mecanico, MecanicoRef,
+                          (Mecanico.id_mecanico, Mecanico.nome, Mecanico.especialidade)),
+}
+
+
+def versoes():
+    # {catálogo: versão}; lido uma vez por requisição
+    if has_request_context() and 'versoes_catalogo' in g:
+        return g.versoes_catalogo
+    atuais = dict(db.session.execute(select(VersaoCatalogo.nome, VersaoCatalogo.versao)).all())
+    if has_request_context():
+        g.versoes_catalogo = atuais
+    return atuais
+
+
+def servicos():
+    return CATALOGOS['servicos'].obter()
+
+
+def pecas():
+    return CATALOGOS['pecas'].obter()
+
+
+def mecanicos():
+    return CATALOGOS['mecanicos'].obter()
+
+
+def _incrementar(executar, nomes):
+    executar(update(VersaoCatalogo).where(VersaoCatalogo.nome.in_(nomes))
+             .values(versao=VersaoCatalogo.versao + 1))
+    if has_request_context():
+        g.pop('versoes_catalogo', None)
+
+
+def _marcar(sessao, nomes):
+    sessao.info.setdefault(CHAVE_SESSAO, set()).update(nomes)
+
+
+def alterados(sessao, *nomes):
+    # para escritas em lote (insert()/update() do Core), que não disparam os eventos do mapper
+    _incrementar(sessao.execute, nomes)
+    _marcar(sessao, nomes)
+
+
+def _ouvir(catalogo):
+    chaves = [coluna.key for coluna in catalogo.colunas]
+
+    def _escrita(mapper, connection, target):
+        _incrementar(connection.execute, (catalogo.nome,))
+        sessao = Session.object_session(target)
+        if sessao is not None:
+            _marcar(sessao, (catalogo.nome,))
+
+    def _alteracao(mapper, connection, target):
+        estado = inspect(target)
+        if any(estado.attrs[chave].history.has_changes() for chave in chaves):
+            _escrita(mapper, connection, target)
+
+    event.listen(catalogo.modelo, 'after_insert', _escrita)
+    event.listen(catalogo.modelo, 'after_delete', _escrita)
+    event.listen(catalogo.modelo, 'after_update', _alteracao)
+
+
+for _catalogo in CATALOGOS.values():
+    _ouvir(_catalogo)
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _fim_transacao(sessao):
+    sessao.info.pop(CHAVE_SESSAO, None)
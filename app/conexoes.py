@@ -0,0 +1,173 @@
+import os
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import QueuePool, NullPool
+
+#================================
+# POOL DE CONEXÕES
+#================================
+
+# O gunicorn cria um processo por worker e cada um tem o seu pool. Conexões no
+# PostgreSQL ≈ workers × (DB_POOL_SIZE + DB_MAX_OVERFLOW); ajuste os dois pela
+# rota /sistema/pool sob carga (conexões em uso e tempo de espera por conexão).
+#
+# DB_PGBOUNCER=1 (PgBouncer em pool_mode=transaction):
+# - nada de parâmetros de sessão na conexão: o statement_timeout vira
+#   SET LOCAL no início de cada transação, em vez de `options=-c ...`;
+# - sem prepared statements no servidor (psycopg 3 usa prepare_threshold=None;
+#   o psycopg2 nunca os usa);
+# - DB_POOL_SIZE=0 desliga o pool da aplicação (NullPool) e deixa o
+#   PgBouncer fazer todo o pooling.
+
+
+class Medidas:
+    # contadores de um pool (um por engine, neste processo)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.zerar()
+
+    def zerar(self):
+        with self._lock:
+            self.em_uso = 0
+            self.pico_em_uso = 0
+            self.checkouts = 0
+            self.conexoes_abertas = 0
+            self.invalidadas = 0
+            self.timeouts = 0
+            self.espera_total = 0.0
+            self.espera_max = 0.0
+
+    def esperou(self, segundos):
+        with self._lock:
+            self.espera_total += segundos
+            self.espera_max = max(self.espera_max, segundos)
+
+    def incrementar(self, campo, valor=1):
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + valor)
+            if campo == 'em_uso':
+                self.pico_em_uso = max(self.pico_em_uso, self.em_uso)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'em_uso': self.em_uso,
+                'pico_em_uso': self.pico_em_uso,
+                'checkouts': self.checkouts,
+                'conexoes_abertas': self.conexoes_abertas,
+                'invalidadas': self.invalidadas,
+                'timeouts': self.timeouts,
+                'espera_media_ms': round(self.espera_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'espera_max_ms': round(self.espera_max * 1000, 3),
+            }
+
+
+class _MedirEspera:
+    # tempo para obter uma conexão do pool (fila + eventual abertura)
+    medidas = None
+
+    def _do_get(self):
+        if self.medidas is None:
+            return super()._do_get()
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeout:
+            self.medidas.incrementar('timeouts')
+            raise
+        finally:
+            self.medidas.esperou(time.perf_counter() - inicio)
+
+    def recreate(self):
+        # engine.dispose() troca o pool; os contadores continuam
+        novo = super().recreate()
+        novo.medidas = self.medidas
+        return novo
+
+
+class PoolMedido(_MedirEspera, QueuePool):
+    pass
+
+
+class PoolNuloMedido(_MedirEspera, NullPool):
+    pass
+
+
+def _inteiro(config, chave, padrao):
+    return int(config.get(chave, padrao))
+
+
+def opcoes_engine(config):
+    # SQLALCHEMY_ENGINE_OPTIONS a partir da configuração; só o PostgreSQL é
+    # ajustado (o SQLite local segue com os padrões do Flask-SQLAlchemy)
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() != 'postgresql':
+        return {}
+
+    pgbouncer = bool(config.get('DB_PGBOUNCER'))
+    timeout_ms = _inteiro(config, 'DB_STATEMENT_TIMEOUT_MS', 0)
+    connect_args = {'application_name': config.get('DB_APPLICATION_NAME') or 'sistema_oficina'}
+    if timeout_ms and not pgbouncer:
+        connect_args['options'] = f'-c statement_timeout={timeout_ms}'
+    if pgbouncer and url.get_driver_name() == 'psycopg':
+        connect_args['prepare_threshold'] = None
+
+    opcoes = {
+        'pool_pre_ping': bool(config.get('DB_POOL_PRE_PING', True)),
+        'connect_args': connect_args,
+    }
+    tamanho = _inteiro(config, 'DB_POOL_SIZE', 5)
+    if tamanho <= 0:
+        opcoes['poolclass'] = PoolNuloMedido
+    else:
+        opcoes.update(
+            poolclass=PoolMedido,
+            pool_size=tamanho,
+            max_overflow=_inteiro(config, 'DB_MAX_OVERFLOW', 10),
+            pool_timeout=_inteiro(config, 'DB_POOL_TIMEOUT', 30),
+            pool_recycle=_inteiro(config, 'DB_POOL_RECYCLE', 1800),
+            pool_use_lifo=True,   # reusa as mais recentes; as ociosas no fundo da fila expiram pelo recycle
+        )
+    return opcoes
+
+
+def estatisticas(engine):
+    pool = engine.pool
+    medidas = getattr(pool, 'medidas', None) or Medidas()
+    dados = {'pid': os.getpid(), 'pool': type(pool).__name__, **medidas.stats()}
+    if isinstance(pool, QueuePool):
+        dados.update(tamanho=pool.size(), ociosas=pool.checkedin(), overflow=pool.overflow())
+    return dados
+
+
+def init_app(app, engine):
+    # contadores do pool e, em modo PgBouncer, o statement_timeout por transação
+    pool = engine.pool
+    medidas = pool.medidas = Medidas()
+
+    @event.listens_for(pool, 'connect')
+    def _conectou(dbapi_conn, registro):
+        medidas.incrementar('conexoes_abertas')
+
+    @event.listens_for(pool, 'checkout')
+    def _checkout(dbapi_conn, registro, proxy):
+        medidas.incrementar('checkouts')
+        medidas.incrementar('em_uso')
+
+    @event.listens_for(pool, 'checkin')
+    def _checkin(dbapi_conn, registro):
+        medidas.incrementar('em_uso', -1)
+
+    @event.listens_for(pool, 'invalidate')
+    def _invalidada(dbapi_conn, registro, excecao):
+        medidas.incrementar('invalidadas')
+
+    timeout_ms = _inteiro(app.config, 'DB_STATEMENT_TIMEOUT_MS', 0)
+    if app.config.get('DB_PGBOUNCER') and timeout_ms and engine.dialect.name == 'postgresql':
+        @event.listens_for(engine, 'begin')
+        def _timeout_da_transacao(conn):
+            conn.exec_driver_sql(f'SET LOCAL statement_timeout = {timeout_ms}')
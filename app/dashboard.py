@@ -0,0 +1,231 @@
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from flask import current_app
+from sqlalchemy import select, func, extract, literal, union_all
+from app import db
+from app.cache import SnapshotCache, invalidar_em_escritas
+from app.models import Cliente, Veiculo, Mecanico, Servico, Peca, Agendamento, OrdemDeServico, ResumoDiario
+
+#================================
+# ESTATÍSTICAS DA DASHBOARD
+#================================
+
+# quantidade de meses exibidos nos gráficos
+MESES_SERIE = 6
+
+# snapshot da dashboard; TTL e tamanho vêm de DASHBOARD_CACHE_TTL/DASHBOARD_CACHE_MAX
+dashboard_cache = SnapshotCache('dashboard', ttl=30, max_itens=8)
+invalidar_em_escritas(dashboard_cache,
+                      (Cliente, Veiculo, Mecanico, Servico, Peca, Agendamento, OrdemDeServico))
+
+
+# quantos itens cada lista da dashboard mostra
+ITENS_LISTA = 5
+EM_ANDAMENTO = ('Em Andamento', 'Pendente')
+
+
+@dataclass(frozen=True)
+class ProximoAgendamento:
+    data_agendamento: date
+    hora_agendamento: time
+    placa: str
+    cliente: str
+
+
+@dataclass(frozen=True)
+class OrdemAndamento:
+    numero_os: str
+    placa: str
+    mecanico: str
+    status: str
+
+
+@dataclass(frozen=True)
+class DashboardStats:
+    # tudo o que dashboard.html exibe; guardado inteiro em dashboard_cache
+    clientes: int = 0
+    veiculos: int = 0
+    mecanicos: int = 0
+    servicos: int = 0
+    pecas: int = 0
+    agendamentos: int = 0
+    ordens: int = 0
+    pecas_repor: int = 0
+    months_labels: tuple = ()
+    orders_series: tuple = ()
+    agend_series: tuple = ()
+    proximos_agendamentos: tuple = ()
+    ordens_andamento: tuple = ()
+
+    def contexto(self):
+        # nomes de variáveis esperados por dashboard.html
+        return {
+            'clientes': self.clientes, 'veiculos': self.veiculos, 'mecanicos': self.mecanicos,
+            'servicos': self.servicos, 'pecas': self.pecas, 'agendamentos': self.agendamentos,
+            'ordens': self.ordens, 'pecas_repor': self.pecas_repor,
+            'months_labels': list(self.months_labels),
+            'orders_series': list(self.orders_series),
+            'agend_series': list(self.agend_series),
+            'proximos_agendamentos': self.proximos_agendamentos,
+            'ordens_andamento': self.ordens_andamento,
+        }
+
+
+def _contar(modelo):
+    return select(func.count()).select_from(modelo).scalar_subquery()
+
+
+def _como_data(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    # alguns drivers (ex.: sqlite) devolvem agregados como texto
+    return datetime.fromisoformat(str(valor)).date()
+
+
+def _meses(fim, quantidade):
+    # lista de (ano, mês) do mais antigo ao mais recente, terminando em `fim`
+    meses = []
+    ano, mes = fim.year, fim.month
+    for _ in range(quantidade):
+        meses.append((ano, mes))
+        mes -= 1
+        if mes == 0:
+            mes = 12
+            ano -= 1
+    meses.reverse()
+    return meses
+
+
+def _proximo_mes(ano, mes):
+    return (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+
+
+def carregar_estatisticas(hoje=None, meses=MESES_SERIE):
+    hoje = hoje or datetime.now().date()
+
+    # 1ª consulta: todas as contagens e as últimas datas numa única ida ao banco
+    totais = db.session.execute(select(
+        _contar(Cliente).label('clientes'),
+        _contar(Veiculo).label('veiculos'),
+        _contar(Mecanico).label('mecanicos'),
+        _contar(Servico).label('servicos'),
+        _contar(Peca).label('pecas'),
+        _contar(Agendamento).label('agendamentos'),
+        _contar(OrdemDeServico).label('ordens'),
+        # usa o índice parcial ix_peca_reposicao
+        select(func.count()).select_from(Peca)
+        .where(Peca.estoque_atual < Peca.estoque_minimo).scalar_subquery().label('pecas_repor'),
+        select(func.max(OrdemDeServico.data_abertura)).scalar_subquery().label('ultima_ordem'),
+        select(func.max(Agendamento.data_agendamento)).scalar_subquery().label('ultimo_agend'),
+    )).one()
+
+    # o mês final é o maior entre hoje e as últimas datas presentes no banco
+    fim = max(d for d in (hoje, _como_data(totais.ultima_ordem), _como_data(totais.ultimo_agend)) if d)
+    janela = _meses(fim, meses)
+    inicio = date(janela[0][0], janela[0][1], 1)
+    limite = date(*_proximo_mes(*janela[-1]), 1)
+
+    # 2ª consulta: histogramas mensais, do resumo diário quando ligado
+    if current_app.config.get('RESUMO_DIARIO'):
+        contagens = _series_do_resumo(inicio, limite)
+    else:
+        contagens = _series_das_tabelas(inicio, limite)
+
+    return DashboardStats(
+        clientes=totais.clientes,
+        veiculos=totais.veiculos,
+        mecanicos=totais.mecanicos,
+        servicos=totais.servicos,
+        pecas=totais.pecas,
+        agendamentos=totais.agendamentos,
+        ordens=totais.ordens,
+        pecas_repor=totais.pecas_repor,
+        months_labels=tuple(date(a, m, 1).strftime('%b %Y') for a, m in janela),
+        orders_series=tuple(contagens.get(('o', a, m), 0) for a, m in janela),
+        agend_series=tuple(contagens.get(('a', a, m), 0) for a, m in janela),
+        proximos_agendamentos=_proximos_agendamentos(hoje),
+        ordens_andamento=_ordens_andamento(),
+    )
+
+
+# consultas separadas da execução: planos.py confere o EXPLAIN das mesmas
+
+def consulta_proximos_agendamentos(hoje):
+    return (select(Agendamento.data_agendamento, Agendamento.hora_agendamento, Veiculo.placa, Cliente.nome)
+            .join(Veiculo, Veiculo.id_veiculo == Agendamento.id_veiculo)
+            .join(Cliente, Cliente.id_cliente == Veiculo.id_cliente, isouter=True)
+            .where(Agendamento.data_agendamento >= hoje)
+            .order_by(Agendamento.data_agendamento, Agendamento.hora_agendamento)
+            .limit(ITENS_LISTA))
+
+
+def consulta_ordens_andamento():
+    return (select(OrdemDeServico.numero_os, Veiculo.placa, Mecanico.nome, OrdemDeServico.status)
+            .join(Veiculo, Veiculo.id_veiculo == OrdemDeServico.id_veiculo)
+            .join(Mecanico, Mecanico.id_mecanico == OrdemDeServico.id_mecanico, isouter=True)
+            .where(OrdemDeServico.status.in_(EM_ANDAMENTO))
+            .order_by(OrdemDeServico.data_abertura.desc())
+            .limit(ITENS_LISTA))
+
+
+# as listas vêm como valores simples (não objetos do ORM): o snapshot é
+# compartilhado entre requisições e sessões
+
+def _proximos_agendamentos(hoje):
+    return tuple(ProximoAgendamento(*linha) for linha in db.session.execute(consulta_proximos_agendamentos(hoje)))
+
+
+def _ordens_andamento():
+    return tuple(OrdemAndamento(*linha) for linha in db.session.execute(consulta_ordens_andamento()))
+
+
+def _series_das_tabelas(inicio, limite):
+    # histogramas mensais de ordens e agendamentos (GROUP BY ano/mês).
+    # O filtro por intervalo mantém a consulta restrita à janela exibida.
+    ordens = select(
+        literal('o').label('serie'),
+        extract('year', OrdemDeServico.data_abertura).label('ano'),
+        extract('month', OrdemDeServico.data_abertura).label('mes'),
+        func.count().label('total'),
+    ).where(
+        OrdemDeServico.data_abertura >= datetime.combine(inicio, datetime.min.time()),
+        OrdemDeServico.data_abertura < datetime.combine(limite, datetime.min.time()),
+    ).group_by('ano', 'mes')
+
+    agends = select(
+        literal('a').label('serie'),
+        extract('year', Agendamento.data_agendamento).label('ano'),
+        extract('month', Agendamento.data_agendamento).label('mes'),
+        func.count().label('total'),
+    ).where(
+        Agendamento.data_agendamento >= inicio,
+        Agendamento.data_agendamento < limite,
+    ).group_by('ano', 'mes')
+
+    contagens = {}
+    for serie, ano, mes, total in db.session.execute(union_all(ordens, agends)):
+        contagens[(serie, int(ano), int(mes))] = total
+    return contagens
+
+
+def _series_do_resumo(inicio, limite):
+    # mesmas séries lidas de resumo_diario: custo proporcional aos dias da janela
+    ano = extract('year', ResumoDiario.dia)
+    mes = extract('month', ResumoDiario.dia)
+    contagens = {}
+    for a, m, ordens, agends in db.session.execute(
+            select(ano, mes, func.sum(ResumoDiario.ordens_abertas), func.sum(ResumoDiario.agendamentos))
+            .where(ResumoDiario.dia >= inicio, ResumoDiario.dia < limite)
+            .group_by(ano, mes)):
+        contagens[('o', int(a), int(m))] = int(ordens or 0)
+        contagens[('a', int(a), int(m))] = int(agends or 0)
+    return contagens
+
+
+def estatisticas_em_cache(hoje=None, meses=MESES_SERIE):
+    hoje = hoje or datetime.now().date()
+    return dashboard_cache.get_or_set((hoje, meses), lambda: carregar_estatisticas(hoje, meses))
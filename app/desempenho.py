@@ -0,0 +1,485 @@
+import csv
+import http.client
+import io
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import time as relogio
+import uuid
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from multiprocessing import get_context
+from urllib.parse import urlencode
+import click
+import numpy as np
+from flask import current_app, url_for, request_finished
+from werkzeug.datastructures import MultiDict
+from sqlalchemy import select, func, delete
+from app import db, metricas, catalogos
+from app.exportacao import EXPORTACOES, gerar_csv, gerar_xlsx
+from app.importacao import importar, copy_disponivel
+from app.models import Cliente, Veiculo, Mecanico, Servico, Peca, OrdemDeServico
+
+#================================
+# BENCHMARK DAS ROTAS (latência e consultas por requisição)
+#================================
+
+# `flask desempenho` dispara cada cenário N vezes e mostra p50/p95/p99 e a média
+# de consultas SQL por requisição. Use sobre uma base populada (`flask semear`).
+# - --modo cliente: test client do Flask no próprio processo (sem rede); as
+#   consultas vêm do contador por requisição de metricas.py.
+# - --modo gunicorn: sobe `gunicorn run:app` numa porta local e dispara com
+#   --concorrencia threads; as consultas vêm do cabeçalho X-SQL-Queries
+#   (o servidor sobe com CARREGAMENTO_ESTRITO=1).
+# --salvar grava o resultado como baseline; --baseline compara e sai com
+# código 1 se algum p95 piorar além da --tolerancia ou se o número de
+# consultas de algum cenário aumentar.
+# ordens_criar grava ordens novas (numero_os com prefixo BENCH); ordens_estoque
+# edita essas ordens trocando as quantidades de um punhado de peças em comum, em
+# ordem aleatória — com --modo gunicorn e --concorrencia > 1 mede a disputa pelas
+# linhas de peca (esperas e, se houver, deadlocks, contados como erros).
+# --exportacoes mede também cada exportação (CSV e XLSX) inteira, num processo
+# novo por exportação: linhas/s, tamanho e pico de RSS acima do processo recém-
+# iniciado (deve ficar constante com o tamanho da tabela). Regressão: linhas/s
+# caindo ou pico de RSS subindo além da --tolerancia.
+# --importacoes importa --linhas-importacao clientes, veículos e peças sintéticos
+# (cpf BENCH..., placa BN..., peça "BENCH n", apagados ao fim), com INSERT em lote
+# e com COPY (só no PostgreSQL), e mostra linhas/s de cada caminho.
+
+ROTAS_LISTAGEM = ('clientes_listar', 'veiculos_listar', 'mecanicos_listar', 'servicos_listar',
+                  'pecas_listar', 'agendamentos_listar', 'ordens_listar')
+CENARIOS = ('home', *ROTAS_LISTAGEM, 'ordens_editar', 'ordens_criar', 'ordens_estoque')
+FORMATOS = {'csv': gerar_csv, 'xlsx': gerar_xlsx}
+EXPORTACOES_CENARIOS = {f'exportar_{nome}_{formato}': (nome, formato)
+                        for nome in EXPORTACOES for formato in FORMATOS}
+IMPORTACOES_CENARIOS = {f'importar_{tipo}_{metodo}': (tipo, metodo)
+                        for metodo in ('insert', 'copy') for tipo in ('clientes', 'veiculos', 'pecas')}
+AMOSTRA = 500
+PECAS_DISPUTADAS = 4
+
+
+@dataclass
+class Medicao:
+    tempos: list = field(default_factory=list)      # segundos
+    consultas: list = field(default_factory=list)
+    erros: int = 0
+
+    def resumo(self):
+        ms = np.array(self.tempos) * 1000
+        p50, p95, p99 = np.percentile(ms, (50, 95, 99)) if len(ms) else (0.0, 0.0, 0.0)
+        return {
+            'n': len(self.tempos),
+            'p50_ms': round(float(p50), 2),
+            'p95_ms': round(float(p95), 2),
+            'p99_ms': round(float(p99), 2),
+            'consultas': round(float(np.mean(self.consultas)), 1) if self.consultas else None,
+            'erros': self.erros,
+        }
+
+
+class Cenarios:
+    # cada cenário devolve (método, caminho, formulário) sorteando ids reais da base
+
+    def __init__(self, rng, filtro=()):
+        self.rng = rng
+        self.filtro = set(filtro)
+        amostra = lambda coluna, *filtros: db.session.execute(
+            select(coluna).where(*filtros).order_by(func.random()).limit(AMOSTRA)).scalars().all()
+        self.ordens = amostra(OrdemDeServico.id_ordem_servico)
+        self.veiculos = amostra(Veiculo.id_veiculo)
+        self.mecanicos = amostra(Mecanico.id_mecanico)
+        self.servicos = amostra(Servico.id_servico)
+        self.pecas = amostra(Peca.id_peca, Peca.estoque_atual > 50)
+        if not (self.ordens and self.veiculos and self.mecanicos and self.servicos):
+            raise click.ClickException('base vazia: rode `flask semear` antes do benchmark')
+        self.urls = {'home': url_for('home'), 'ordens_criar': url_for('ordens_criar')}
+        self.urls.update({rota: url_for(rota) for rota in ROTAS_LISTAGEM})
+        self.urls_editar = [url_for('ordens_editar', id=i) for i in self.ordens]
+        self.baixadas = None
+
+    def _ordens_baixadas(self):
+        # amostradas na primeira vez: podem ter sido criadas pelo cenário ordens_criar
+        if self.baixadas is None:
+            ordens = db.session.execute(
+                select(OrdemDeServico.id_ordem_servico, OrdemDeServico.numero_os, OrdemDeServico.data_abertura,
+                       OrdemDeServico.id_veiculo, OrdemDeServico.id_mecanico)
+                .where(OrdemDeServico.estoque_baixado).order_by(func.random()).limit(AMOSTRA)).all()
+            db.session.remove()
+            with current_app.test_request_context():
+                self.baixadas = [(url_for('ordens_editar', id=o.id_ordem_servico), o) for o in ordens]
+            if not self.baixadas or not self.pecas:
+                raise click.ClickException('ordens_estoque edita ordens com estoque baixado: '
+                                           'rode antes o cenário ordens_criar')
+        return self.baixadas
+
+    def nomes(self):
+        return [n for n in CENARIOS if not self.filtro or n in self.filtro]
+
+    def montar(self, nome):
+        if nome == 'ordens_editar':
+            return 'GET', self.rng.choice(self.urls_editar), None
+        if nome == 'ordens_criar':
+            return 'POST', self.urls[nome], self._nova_ordem()
+        if nome == 'ordens_estoque':
+            url, ordem = self.rng.choice(self._ordens_baixadas())
+            return 'POST', url, self._novas_pecas(ordem)
+        return 'GET', self.urls[nome], None
+
+    def _nova_ordem(self):
+        rng = self.rng
+        formulario = [
+            ('numero_os', f'BENCH{uuid.uuid4().hex[:15]}'),
+            ('data_abertura', datetime.now().strftime('%Y-%m-%dT%H:%M')),
+            ('status', 'Aberta'),
+            ('id_veiculo', rng.choice(self.veiculos)),
+            ('id_mecanico', rng.choice(self.mecanicos)),
+        ]
+        for id_servico in rng.sample(self.servicos, min(2, len(self.servicos))):
+            formulario += [('servicos_ids[]', id_servico), ('servicos_qtd[]', 1)]
+        for id_peca in rng.sample(self.pecas, min(2, len(self.pecas))):
+            formulario += [('pecas_ids[]', id_peca), ('pecas_qtd[]', 1)]
+        return formulario
+
+    def _novas_pecas(self, ordem):
+        rng = self.rng
+        formulario = [
+            ('numero_os', ordem.numero_os),
+            ('data_abertura', ordem.data_abertura.strftime('%Y-%m-%d')),
+            ('status', 'Aberta'),
+            ('id_veiculo', ordem.id_veiculo),
+            ('id_mecanico', ordem.id_mecanico),
+            ('itens_enviados', '1'),
+            ('servicos_ids[]', self.servicos[0]), ('servicos_qtd[]', 1),
+        ]
+        disputadas = self.pecas[:PECAS_DISPUTADAS]
+        for id_peca in rng.sample(disputadas, rng.randint(1, len(disputadas))):
+            formulario += [('pecas_ids[]', id_peca), ('pecas_qtd[]', rng.randint(1, 3))]
+        return formulario
+
+
+def _falhou(metodo, status):
+    # os formulários respondem 200 com a mensagem de erro; sucesso é o redirect
+    return status >= 400 or (metodo == 'POST' and status != 302)
+
+
+#================================
+# Execução
+#================================
+
+def _engines(app):
+    replicas = app.extensions.get('replicas')
+    return [db.engine, *(replicas.engines if replicas else ())]
+
+
+def medir_cliente(app, cenarios, requisicoes, aquecimento):
+    for engine in _engines(app):
+        metricas.contar_statements(engine)
+    ultima = {}
+
+    def _registrar(sender, response, **extra):
+        ultima['statements'] = metricas.statements()
+
+    request_finished.connect(_registrar, app)
+    cliente = app.test_client()
+    resultados = {}
+    try:
+        for nome in cenarios.nomes():
+            medicao = resultados[nome] = Medicao()
+            for i in range(aquecimento + requisicoes):
+                metodo, caminho, formulario = cenarios.montar(nome)
+                comeco = relogio.perf_counter()
+                resposta = cliente.open(caminho, method=metodo, data=MultiDict(formulario or ()))
+                decorrido = relogio.perf_counter() - comeco
+                if i < aquecimento:
+                    continue
+                medicao.tempos.append(decorrido)
+                medicao.consultas.append(ultima.pop('statements', 0))
+                medicao.erros += _falhou(metodo, resposta.status_code)
+    finally:
+        request_finished.disconnect(_registrar, app)
+    return resultados
+
+
+def _aguardar_porta(porta, processo, limite=30):
+    fim = relogio.monotonic() + limite
+    while relogio.monotonic() < fim:
+        if processo.poll() is not None:
+            raise click.ClickException('o gunicorn terminou ao subir; veja a saída acima')
+        try:
+            socket.create_connection(('127.0.0.1', porta), timeout=0.5).close()
+            return
+        except OSError:
+            relogio.sleep(0.2)
+    raise click.ClickException(f'o gunicorn não respondeu na porta {porta}')
+
+
+def _requisitar(porta, metodo, caminho, formulario):
+    conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=60)
+    corpo = urlencode(formulario) if formulario else None
+    cabecalhos = {'Content-Type': 'application/x-www-form-urlencoded'} if corpo else {}
+    comeco = relogio.perf_counter()
+    conexao.request(metodo, caminho, body=corpo, headers=cabecalhos)
+    resposta = conexao.getresponse()
+    resposta.read()
+    decorrido = relogio.perf_counter() - comeco
+    conexao.close()
+    consultas = resposta.getheader('X-SQL-Queries')
+    return decorrido, int(consultas) if consultas is not None else None, _falhou(metodo, resposta.status)
+
+
+def medir_gunicorn(app, cenarios, requisicoes, aquecimento, workers, concorrencia, porta):
+    raiz = os.path.dirname(app.root_path)
+    ambiente = {**os.environ, 'CARREGAMENTO_ESTRITO': '1'}
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'run:app', '-b', f'127.0.0.1:{porta}', '-w', str(workers)],
+        cwd=raiz, env=ambiente)
+    resultados = {}
+    try:
+        _aguardar_porta(porta, processo)
+        with ThreadPoolExecutor(concorrencia) as executor:
+            for nome in cenarios.nomes():
+                medicao = resultados[nome] = Medicao()
+                # os formulários são montados aqui: o sorteio não é thread-safe
+                pedidos = [cenarios.montar(nome) for _ in range(aquecimento + requisicoes)]
+                list(executor.map(lambda p: _requisitar(porta, *p), pedidos[:aquecimento]))
+                for decorrido, consultas, falhou in executor.map(lambda p: _requisitar(porta, *p),
+                                                                 pedidos[aquecimento:]):
+                    medicao.tempos.append(decorrido)
+                    if consultas is not None:
+                        medicao.consultas.append(consultas)
+                    medicao.erros += falhou
+    finally:
+        processo.terminate()
+        processo.wait(timeout=30)
+    return resultados
+
+
+def _rss_pico_mb():
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def _exportar_no_processo(nome, formato):
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        inicial = _rss_pico_mb()
+        comeco = relogio.perf_counter()
+        tamanho = sum(len(parte.encode() if isinstance(parte, str) else parte)
+                      for parte in FORMATOS[formato](nome))
+        return relogio.perf_counter() - comeco, tamanho, _rss_pico_mb() - inicial
+
+
+def medir_exportacoes(app, nomes):
+    resultados = {}
+    for cenario in nomes:
+        nome, formato = EXPORTACOES_CENARIOS[cenario]
+        with app.app_context():
+            consulta = EXPORTACOES[nome][0]().order_by(None).subquery()
+            linhas = db.session.execute(select(func.count()).select_from(consulta)).scalar()
+            db.session.remove()
+        with ProcessPoolExecutor(1, mp_context=get_context('spawn')) as executor:
+            segundos, tamanho, rss = executor.submit(_exportar_no_processo, nome, formato).result()
+        resultados[cenario] = {'linhas': linhas, 'linhas_s': round(linhas / segundos),
+                               'mb': round(tamanho / 1e6, 1), 'rss_mb': round(rss, 1)}
+    return resultados
+
+
+def _csv_importacao(tipo, linhas):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    if tipo == 'clientes':
+        escritor.writerow(('nome', 'cpf', 'telefone', 'email', 'endereco'))
+        escritor.writerows((f'Bench {i}', f'BENCH{i:09d}', '0', f'bench{i}@bench.invalid', 'Rua Bench, 1')
+                           for i in range(linhas))
+    elif tipo == 'veiculos':
+        escritor.writerow(('placa', 'marca', 'modelo', 'ano', 'cpf_cliente'))
+        escritor.writerows((f'BN{i:06d}', 'Marca', 'Modelo', 2020, f'BENCH{i:09d}') for i in range(linhas))
+    else:
+        escritor.writerow(('nome_peca', 'preco_custo', 'preco_venda', 'estoque_atual'))
+        escritor.writerows((f'BENCH {i}', '10.00', '20.00', 5) for i in range(linhas))
+    buffer.seek(0)
+    return buffer
+
+
+def _limpar_importacao(tipo):
+    sem_sincronizar = {'synchronize_session': False}
+    if tipo in ('clientes', 'veiculos'):
+        db.session.execute(delete(Veiculo).where(Veiculo.placa.like('BN%'), func.length(Veiculo.placa) == 8),
+                           execution_options=sem_sincronizar)
+    if tipo == 'clientes':
+        db.session.execute(delete(Cliente).where(Cliente.cpf.like('BENCH%')), execution_options=sem_sincronizar)
+    if tipo == 'pecas':
+        db.session.execute(delete(Peca).where(Peca.nome_peca.like('BENCH %')), execution_options=sem_sincronizar)
+        catalogos.alterados(db.session, 'pecas')
+    db.session.commit()
+
+
+def medir_importacoes(app, nomes, linhas):
+    resultados = {}
+    with app.app_context():
+        for cenario in nomes:
+            tipo, metodo = IMPORTACOES_CENARIOS[cenario]
+            _limpar_importacao(tipo)
+            if tipo == 'veiculos' and not db.session.scalar(
+                    select(func.count()).where(Cliente.cpf.like('BENCH%'))):
+                importar(_csv_importacao('clientes', linhas), 'clientes')   # donos dos veículos
+            arquivo = _csv_importacao(tipo, linhas)
+            comeco = relogio.perf_counter()
+            relatorio = importar(arquivo, tipo, copiar=metodo == 'copy')
+            segundos = relogio.perf_counter() - comeco
+            resultados[cenario] = {'linhas': relatorio.lidos, 'linhas_s': round(relatorio.lidos / segundos),
+                                   'erros': len(relatorio.erros)}
+        for tipo in ('clientes', 'pecas'):
+            _limpar_importacao(tipo)
+        db.session.remove()
+    return resultados
+
+
+#================================
+# Relatório e baseline
+#================================
+
+def comparar(atual, baseline, tolerancia):
+    # [(cenário, motivo)] dos cenários que pioraram em relação à baseline
+    regressoes = []
+    for nome, dados in atual.items():
+        base = baseline.get(nome)
+        if not base:
+            continue
+        if base['p95_ms'] and dados['p95_ms'] > base['p95_ms'] * (1 + tolerancia):
+            regressoes.append((nome, f"p95 {base['p95_ms']} → {dados['p95_ms']} ms"))
+        if base.get('consultas') is not None and dados['consultas'] is not None \
+                and dados['consultas'] > base['consultas']:
+            regressoes.append((nome, f"consultas {base['consultas']} → {dados['consultas']}"))
+    return regressoes
+
+
+def comparar_vazao(atual, baseline, tolerancia):
+    # exportações e importações: linhas/s e, quando medido, pico de RSS
+    regressoes = []
+    for nome, dados in atual.items():
+        base = baseline.get(nome)
+        if not base:
+            continue
+        if dados['linhas_s'] < base['linhas_s'] * (1 - tolerancia):
+            regressoes.append((nome, f"linhas/s {base['linhas_s']} → {dados['linhas_s']}"))
+        # folga mínima de 5 MB: o pico de processos pequenos oscila
+        if 'rss_mb' in dados and dados['rss_mb'] > max(base['rss_mb'] * (1 + tolerancia), base['rss_mb'] + 5):
+            regressoes.append((nome, f"pico de RSS {base['rss_mb']} → {dados['rss_mb']} MB"))
+    return regressoes
+
+
+def _tabela(resumo, baseline):
+    linhas = [f"{'cenário':<22}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'SQL/req':>9}{'erros':>7}"]
+    for nome, dados in resumo.items():
+        consultas = '-' if dados['consultas'] is None else f"{dados['consultas']:g}"
+        linha = (f"{nome:<22}{dados['n']:>6}{dados['p50_ms']:>10.1f}{dados['p95_ms']:>10.1f}"
+                 f"{dados['p99_ms']:>10.1f}{consultas:>9}{dados['erros']:>7}")
+        base = baseline.get(nome)
+        if base and base['p95_ms']:
+            linha += f"   p95 {dados['p95_ms'] / base['p95_ms'] - 1:+.0%} vs baseline"
+        linhas.append(linha)
+    return '\n'.join(linhas)
+
+
+def _tabela_exportacoes(resumo, baseline):
+    linhas = [f"{'exportação':<26}{'linhas':>10}{'linhas/s':>11}{'MB':>8}{'RSS MB':>8}"]
+    for nome, dados in resumo.items():
+        linha = (f"{nome:<26}{dados['linhas']:>10}{dados['linhas_s']:>11}"
+                 f"{dados['mb']:>8.1f}{dados['rss_mb']:>8.1f}")
+        base = baseline.get(nome)
+        if base and base['linhas_s']:
+            linha += f"   linhas/s {dados['linhas_s'] / base['linhas_s'] - 1:+.0%} vs baseline"
+        linhas.append(linha)
+    return '\n'.join(linhas)
+
+
+def _tabela_importacoes(resumo, baseline):
+    linhas = [f"{'importação':<26}{'linhas':>10}{'linhas/s':>11}{'erros':>7}"]
+    for nome, dados in resumo.items():
+        linha = f"{nome:<26}{dados['linhas']:>10}{dados['linhas_s']:>11}{dados['erros']:>7}"
+        base = baseline.get(nome)
+        if base and base['linhas_s']:
+            linha += f"   linhas/s {dados['linhas_s'] / base['linhas_s'] - 1:+.0%} vs baseline"
+        linhas.append(linha)
+    return '\n'.join(linhas)
+
+
+def init_app(app):
+
+    @app.cli.command('desempenho')
+    @click.option('--modo', type=click.Choice(['cliente', 'gunicorn']), default='cliente', show_default=True)
+    @click.option('--requisicoes', default=50, show_default=True, help='Requisições medidas por cenário.')
+    @click.option('--aquecimento', default=5, show_default=True, help='Requisições descartadas por cenário.')
+    @click.option('--workers', default=2, show_default=True, help='Workers do gunicorn.')
+    @click.option('--concorrencia', default=4, show_default=True, help='Requisições simultâneas (gunicorn).')
+    @click.option('--porta', default=8765, show_default=True)
+    @click.option('--cenario', 'filtro', multiple=True, help='Roda só os cenários indicados.')
+    @click.option('--baseline', type=click.Path(exists=True, dir_okay=False), help='JSON para comparar.')
+    @click.option('--salvar', type=click.Path(dir_okay=False), help='Grava o resultado como baseline.')
+    @click.option('--tolerancia', default=0.2, show_default=True, help='Piora aceita no p95 (0.2 = 20%).')
+    @click.option('--semente', default=42, show_default=True)
+    @click.option('--exportacoes', is_flag=True, help='Mede também as exportações CSV/XLSX.')
+    @click.option('--importacoes', is_flag=True, help='Mede também a importação (INSERT e COPY).')
+    @click.option('--linhas-importacao', default=20000, show_default=True, help='Linhas por importação.')
+    def desempenho_cmd(modo, requisicoes, aquecimento, workers, concorrencia, porta, filtro,
+                       baseline, salvar, tolerancia, semente, exportacoes, importacoes, linhas_importacao):
+        """Mede latência (p50/p95/p99) e consultas por requisição das rotas principais."""
+        desconhecidos = set(filtro) - set(CENARIOS) - set(EXPORTACOES_CENARIOS) - set(IMPORTACOES_CENARIOS)
+        if desconhecidos:
+            raise click.BadParameter(', '.join(sorted(desconhecidos)), param_hint='--cenario')
+        with app.test_request_context():
+            cenarios = Cenarios(random.Random(semente), filtro)
+        db.session.remove()
+        nomes_exportacoes = [n for n in EXPORTACOES_CENARIOS if exportacoes or n in filtro]
+        nomes_importacoes = [n for n in IMPORTACOES_CENARIOS if importacoes or n in filtro]
+        if not copy_disponivel() and any(n.endswith('_copy') for n in nomes_importacoes):
+            click.echo('Aviso: COPY requer PostgreSQL com psycopg2; medindo só o INSERT.')
+            nomes_importacoes = [n for n in nomes_importacoes if not n.endswith('_copy')]
+
+        if modo == 'cliente':
+            resultados = medir_cliente(app, cenarios, requisicoes, aquecimento)
+        else:
+            resultados = medir_gunicorn(app, cenarios, requisicoes, aquecimento, workers, concorrencia, porta)
+        resumo = {nome: medicao.resumo() for nome, medicao in resultados.items()}
+        resumo_exportacoes = medir_exportacoes(app, nomes_exportacoes)
+        resumo_importacoes = medir_importacoes(app, nomes_importacoes, linhas_importacao)
+
+        referencia, referencia_exportacoes, referencia_importacoes = {}, {}, {}
+        if baseline:
+            with open(baseline, encoding='utf-8') as arquivo:
+                gravada = json.load(arquivo)
+            referencia = gravada['cenarios']
+            referencia_exportacoes = gravada.get('exportacoes', {})
+            referencia_importacoes = gravada.get('importacoes', {})
+            if gravada.get('modo') != modo:
+                click.echo(f"Aviso: a baseline foi medida no modo {gravada.get('modo')}, não em {modo}.")
+        if resumo:
+            click.echo(_tabela(resumo, referencia))
+        if resumo_exportacoes:
+            click.echo(_tabela_exportacoes(resumo_exportacoes, referencia_exportacoes))
+        if resumo_importacoes:
+            click.echo(_tabela_importacoes(resumo_importacoes, referencia_importacoes))
+
+        if salvar:
+            with open(salvar, 'w', encoding='utf-8') as arquivo:
+                json.dump({'modo': modo, 'data': datetime.now().isoformat(timespec='seconds'),
+                           'cenarios': resumo, 'exportacoes': resumo_exportacoes,
+                           'importacoes': resumo_importacoes},
+                          arquivo, ensure_ascii=False, indent=2)
+            click.echo(f'Baseline gravada em {salvar}')
+        if baseline:
+            regressoes = comparar(resumo, referencia, tolerancia)
+            regressoes += comparar_vazao(resumo_exportacoes, referencia_exportacoes, tolerancia)
+            regressoes += comparar_vazao(resumo_importacoes, referencia_importacoes, tolerancia)
+            for nome, motivo in regressoes:
+                click.echo(f'REGRESSÃO {nome}: {motivo}')
+            if regressoes:
+                raise SystemExit(1)
@@ -0,0 +1,92 @@
+from collections import defaultdict
+from sqlalchemy import select, update, func, case, or_
+from app import db
+from app.dashboard import dashboard_cache
+from app.models import Peca, PecaOrdemServico
+
+#================================
+# MOVIMENTAÇÃO DE ESTOQUE DE PEÇAS
+#================================
+
+# Toda movimentação (baixa, devolução ou o ajuste de uma OS editada) é um único
+# UPDATE condicional com a diferença por peça:
+#   UPDATE peca SET estoque_atual = estoque_atual + CASE id_peca WHEN .. END
+#   WHERE id_peca IN (SELECT id_peca .. ORDER BY id_peca FOR NO KEY UPDATE)
+#     AND estoque_atual + CASE id_peca WHEN .. END >= 0
+# O banco trava só as linhas das peças envolvidas, sempre em ordem de id_peca, até o
+# fim da transação da OS: edições concorrentes que mexem nas mesmas peças esperam
+# umas pelas outras em vez de se travarem (deadlock), e a condição impede saldo
+# negativo mesmo com vários workers gravando ao mesmo tempo — sem lock de tabela.
+# (NO KEY UPDATE, o mesmo lock do UPDATE, não conflita com o KEY SHARE que as FKs
+# das linhas da OS recém-gravadas já tomaram nessas peças.)
+# Só ordens com estoque_baixado (criadas por ordens_criar) movimentam estoque ao
+# serem editadas ou excluídas; as antigas e as da carga sintética nunca baixaram.
+
+
+class EstoqueInsuficiente(ValueError):
+    pass
+
+
+def abaixo_do_minimo():
+    # mesmo predicado do índice parcial ix_peca_reposicao (ver models.Peca)
+    return Peca.estoque_atual < Peca.estoque_minimo
+
+
+def quantidades(linhas):
+    # soma as quantidades por peça (a mesma peça pode aparecer em várias linhas)
+    total = defaultdict(int)
+    for linha in linhas:
+        total[linha.id_item] += linha.quantidade
+    return dict(total)
+
+
+def quantidades_da_ordem(id_ordem):
+    linhas = db.session.execute(
+        select(PecaOrdemServico.id_peca, func.sum(PecaOrdemServico.quantidade))
+        .where(PecaOrdemServico.id_ordem_servico == id_ordem,
+               PecaOrdemServico.id_peca.isnot(None))
+        .group_by(PecaOrdemServico.id_peca))
+    return {id_peca: int(qtd) for id_peca, qtd in linhas}
+
+
+def _por_peca(qtds):
+    return case(qtds, value=Peca.id_peca, else_=0)
+
+
+def movimentar(diferencas):
+    # soma `diferencas` ({id_peca: +entrada / -saída}) ao estoque num único UPDATE
+    diferencas = {id_peca: d for id_peca, d in diferencas.items() if d}
+    if not diferencas:
+        return
+    delta = _por_peca(diferencas)
+    travadas = (select(Peca.id_peca).where(Peca.id_peca.in_(sorted(diferencas)))
+                .order_by(Peca.id_peca).with_for_update(key_share=True))
+    resultado = db.session.execute(
+        update(Peca)
+        .where(Peca.id_peca.in_(travadas), or_(delta >= 0, Peca.estoque_atual + delta >= 0))
+        .values(estoque_atual=Peca.estoque_atual + delta)
+        .execution_options(synchronize_session=False))
+    # UPDATE em lote não dispara eventos do mapper: avisa o cache da dashboard
+    dashboard_cache.invalidar_na_sessao(db.session)
+    if resultado.rowcount != len(diferencas):
+        # caminho de erro: descobre quais peças faltaram para a mensagem
+        # (a transação será desfeita pela rota)
+        saldos = dict(db.session.execute(
+            select(Peca.id_peca, Peca.nome_peca).where(
+                Peca.id_peca.in_(sorted(diferencas)), Peca.estoque_atual + delta < 0)).all())
+        nomes = ', '.join(saldos.values()) or 'peça inexistente'
+        raise EstoqueInsuficiente(f"Estoque insuficiente: {nomes}.")
+
+
+def baixar(qtds):
+    movimentar({id_peca: -q for id_peca, q in qtds.items() if q > 0})
+
+
+def devolver(qtds):
+    movimentar({id_peca: q for id_peca, q in qtds.items() if q > 0})
+
+
+def ajustar(anteriores, novas):
+    # aplica só a diferença entre as quantidades antigas e as novas da OS
+    # (peças a mais na OS saem do estoque; as retiradas voltam)
+    movimentar({i: anteriores.get(i, 0) - novas.get(i, 0) for i in set(anteriores) | set(novas)})
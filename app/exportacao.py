@@ -0,0 +1,122 @@
+import csv
+import io
+import tempfile
+import openpyxl
+from sqlalchemy import select, literal, union_all
+from app import db
+from app.models import Cliente, Veiculo, Mecanico, Servico, Peca, OrdemDeServico, ItemOrdemServico, PecaOrdemServico
+
+#================================
+# EXPORTAÇÃO CSV/XLSX EM STREAMING
+#================================
+
+# As linhas saem do banco em lotes (yield_per => cursor no servidor no PostgreSQL)
+# e são escritas na resposta à medida que chegam: a memória fica constante
+# independente do tamanho da tabela.
+# No XLSX o openpyxl em modo write_only grava cada linha no XML temporário da
+# planilha (em disco); o .xlsx é um zip que só fecha depois da última linha, então
+# o download começa quando a consulta termina.
+
+LOTE = 1000
+BLOCO = 64 * 1024
+XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _ordens():
+    linhas = union_all(
+        select(ItemOrdemServico.id_ordem_servico.label('id_ordem'),
+               literal('servico').label('tipo'),
+               Servico.nome_servico.label('item'),
+               ItemOrdemServico.quantidade.label('quantidade'),
+               ItemOrdemServico.preco_unitario.label('preco_unitario'),
+               ItemOrdemServico.valor_total.label('valor_item'))
+        .join(Servico, Servico.id_servico == ItemOrdemServico.id_servico, isouter=True),
+        select(PecaOrdemServico.id_ordem_servico,
+               literal('peca'),
+               Peca.nome_peca,
+               PecaOrdemServico.quantidade,
+               PecaOrdemServico.preco_unitario,
+               PecaOrdemServico.valor_total)
+        .join(Peca, Peca.id_peca == PecaOrdemServico.id_peca, isouter=True),
+    ).subquery('linhas')
+    # uma linha por item da OS; ordens sem itens aparecem uma vez com colunas vazias
+    return (
+        select(OrdemDeServico.numero_os, OrdemDeServico.status,
+               OrdemDeServico.data_abertura, OrdemDeServico.data_conclusao,
+               OrdemDeServico.valor_total, Veiculo.placa, Mecanico.nome,
+               linhas.c.tipo, linhas.c.item, linhas.c.quantidade,
+               linhas.c.preco_unitario, linhas.c.valor_item)
+        .join(Veiculo, Veiculo.id_veiculo == OrdemDeServico.id_veiculo)
+        .join(Mecanico, Mecanico.id_mecanico == OrdemDeServico.id_mecanico)
+        .join(linhas, linhas.c.id_ordem == OrdemDeServico.id_ordem_servico, isouter=True)
+        .order_by(OrdemDeServico.id_ordem_servico)
+    )
+
+
+def _clientes():
+    return (
+        select(Cliente.id_cliente, Cliente.nome, Cliente.cpf, Cliente.telefone,
+               Cliente.email, Cliente.endereco, Cliente.data_cadastro)
+        .order_by(Cliente.id_cliente)
+    )
+
+
+def _pecas():
+    return (
+        select(Peca.id_peca, Peca.nome_peca, Peca.descricao, Peca.preco_custo,
+               Peca.preco_venda, Peca.estoque_minimo, Peca.estoque_atual)
+        .order_by(Peca.id_peca)
+    )
+
+
+# nome -> (consulta, cabeçalho)
+EXPORTACOES = {
+    'ordens': (_ordens, ('numero_os', 'status', 'data_abertura', 'data_conclusao', 'valor_total_os',
+                         'placa', 'mecanico', 'tipo_item', 'item', 'quantidade',
+                         'preco_unitario', 'valor_item')),
+    'clientes': (_clientes, ('id_cliente', 'nome', 'cpf', 'telefone', 'email', 'endereco', 'data_cadastro')),
+    'pecas': (_pecas, ('id_peca', 'nome_peca', 'descricao', 'preco_custo', 'preco_venda',
+                       'estoque_minimo', 'estoque_atual')),
+}
+
+
+def gerar_csv(nome, lote=LOTE):
+    consulta, cabecalho = EXPORTACOES[nome]
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    def despejar():
+        dados = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return dados
+
+    # BOM para o Excel reconhecer UTF-8
+    buffer.write('\ufeff')
+    escritor.writerow(cabecalho)
+    yield despejar()
+
+    resultado = db.session.execute(consulta().execution_options(yield_per=lote))
+    for parte in resultado.partitions():
+        escritor.writerows(parte)
+        yield despejar()
+
+
+def gravar_xlsx(nome, saida, lote=LOTE):
+    consulta, cabecalho = EXPORTACOES[nome]
+    livro = openpyxl.Workbook(write_only=True)
+    planilha = livro.create_sheet(nome)
+    planilha.append(cabecalho)
+    resultado = db.session.execute(consulta().execution_options(yield_per=lote))
+    for parte in resultado.partitions():
+        for linha in parte:
+            planilha.append(tuple(linha))
+    livro.save(saida)
+
+
+def gerar_xlsx(nome, lote=LOTE):
+    with tempfile.TemporaryFile() as arquivo:
+        gravar_xlsx(nome, arquivo, lote)
+        arquivo.seek(0)
+        for bloco in iter(lambda: arquivo.read(BLOCO), b''):
+            yield bloco
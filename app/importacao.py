@@ -0,0 +1,315 @@
+import csv
+import io
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+import click
+from sqlalchemy import select, insert, or_
+from sqlalchemy.exc import IntegrityError
+from app import db, catalogos
+from app.busca import busca_cache
+from app.dashboard import dashboard_cache
+from app.models import Cliente, Veiculo, Peca
+
+#================================
+# IMPORTAÇÃO EM LOTE (CSV)
+#================================
+
+# Cada lote de linhas é validado em memória, checado contra o banco com UMA
+# consulta por lote (cpf/email/placa já existentes) e gravado numa transação por
+# lote: no PostgreSQL (psycopg2) com COPY ... FROM STDIN, nos demais bancos com um
+# INSERT executemany. Linhas rejeitadas vão para o relatório de erros com o
+# número da linha no arquivo.
+
+LOTE = 500
+
+
+@dataclass
+class RelatorioImportacao:
+    tipo: str
+    inseridos: int = 0
+    lidos: int = 0
+    erros: list = field(default_factory=list)   # [(linha, mensagem)]
+
+    def erro(self, linha, mensagem):
+        self.erros.append((linha, mensagem))
+
+
+def _texto(valor, coluna, obrigatorio):
+    valor = (valor or '').strip()
+    if not valor:
+        if obrigatorio:
+            raise ValueError(f"'{coluna.key}' é obrigatório")
+        return None
+    limite = getattr(coluna.type, 'length', None)
+    if limite and len(valor) > limite:
+        raise ValueError(f"'{coluna.key}' excede {limite} caracteres")
+    return valor
+
+
+def _inteiro(valor, coluna, obrigatorio):
+    valor = (valor or '').strip()
+    if not valor:
+        if obrigatorio:
+            raise ValueError(f"'{coluna.key}' é obrigatório")
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        raise ValueError(f"'{coluna.key}' deve ser um número inteiro")
+
+
+def _decimal(valor, coluna, obrigatorio):
+    valor = (valor or '').strip().replace(',', '.')
+    if not valor:
+        if obrigatorio:
+            raise ValueError(f"'{coluna.key}' é obrigatório")
+        return None
+    try:
+        return Decimal(valor).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f"'{coluna.key}' deve ser um valor numérico")
+
+
+def _data(valor, coluna, obrigatorio):
+    valor = (valor or '').strip()
+    if not valor:
+        if obrigatorio:
+            raise ValueError(f"'{coluna.key}' é obrigatório")
+        return None
+    for formato in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            continue
+    raise ValueError(f"'{coluna.key}' deve estar em AAAA-MM-DD ou DD/MM/AAAA")
+
+
+class Importador:
+    modelo = None
+    campos = ()      # (coluna, conversor, obrigatorio)
+    unicos = ()      # colunas com UNIQUE no banco
+    catalogo = None  # nome em catalogos.CATALOGOS, se o modelo for um catálogo de referência
+
+    def converter(self, bruto):
+        return {col.key: conv(bruto.get(col.key), col, obrig) for col, conv, obrig in self.campos}
+
+    def preparar_lote(self, linhas, relatorio):
+        # hook para resolver referências do lote inteiro de uma vez
+        return linhas
+
+    def existentes(self, linhas):
+        # valores únicos do lote que já estão no banco — uma consulta só
+        if not self.unicos:
+            return {}
+        condicoes = [col.in_({l[col.key] for _, l in linhas}) for col in self.unicos]
+        achados = {col.key: set() for col in self.unicos}
+        for registro in db.session.execute(select(*self.unicos).where(or_(*condicoes))):
+            for col, valor in zip(self.unicos, registro):
+                achados[col.key].add(valor)
+        return achados
+
+
+class ImportadorClientes(Importador):
+    modelo = Cliente
+    campos = (
+        (Cliente.nome, _texto, True),
+        (Cliente.cpf, _texto, True),
+        (Cliente.telefone, _texto, True),
+        (Cliente.email, _texto, True),
+        (Cliente.endereco, _texto, True),
+        (Cliente.data_cadastro, _data, False),
+    )
+    unicos = (Cliente.cpf, Cliente.email)
+
+    def converter(self, bruto):
+        linha = super().converter(bruto)
+        linha['data_cadastro'] = linha['data_cadastro'] or date.today()
+        return linha
+
+
+class ImportadorVeiculos(Importador):
+    modelo = Veiculo
+    campos = (
+        (Veiculo.placa, _texto, True),
+        (Veiculo.marca, _texto, True),
+        (Veiculo.modelo, _texto, True),
+        (Veiculo.ano, _inteiro, True),
+        (Veiculo.cor, _texto, False),
+        (Veiculo.km_atual, _inteiro, False),
+        (Veiculo.id_cliente, _inteiro, False),
+    )
+    unicos = (Veiculo.placa,)
+
+    def converter(self, bruto):
+        # o dono pode vir por id_cliente ou por cpf_cliente
+        linha = super().converter(bruto)
+        cpf = (bruto.get('cpf_cliente') or '').strip()
+        if linha['id_cliente'] is None and not cpf:
+            raise ValueError("informe 'id_cliente' ou 'cpf_cliente'")
+        linha['_cpf_cliente'] = cpf or None
+        return linha
+
+    def preparar_lote(self, linhas, relatorio):
+        cpfs = {l['_cpf_cliente'] for _, l in linhas if l['_cpf_cliente']}
+        ids = {l['id_cliente'] for _, l in linhas if l['id_cliente'] is not None}
+        conhecidos = db.session.execute(
+            select(Cliente.id_cliente, Cliente.cpf)
+            .where(or_(Cliente.cpf.in_(cpfs), Cliente.id_cliente.in_(ids)))).all()
+        por_cpf = {cpf: id_cliente for id_cliente, cpf in conhecidos}
+        ids_validos = {id_cliente for id_cliente, _ in conhecidos}
+        prontas = []
+        for numero, linha in linhas:
+            cpf = linha.pop('_cpf_cliente')
+            if linha['id_cliente'] is None:
+                linha['id_cliente'] = por_cpf.get(cpf)
+            if linha['id_cliente'] not in ids_validos:
+                relatorio.erro(numero, 'cliente não encontrado')
+                continue
+            prontas.append((numero, linha))
+        return prontas
+
+
+class ImportadorPecas(Importador):
+    modelo = Peca
+    catalogo = 'pecas'
+    campos = (
+        (Peca.nome_peca, _texto, True),
+        (Peca.descricao, _texto, False),
+        (Peca.preco_custo, _decimal, True),
+        (Peca.preco_venda, _decimal, True),
+        (Peca.estoque_minimo, _inteiro, False),
+        (Peca.estoque_atual, _inteiro, True),
+    )
+
+
+IMPORTADORES = {
+    'clientes': ImportadorClientes,
+    'veiculos': ImportadorVeiculos,
+    'pecas': ImportadorPecas,
+}
+
+
+def _leitor(arquivo):
+    # aceita ',' ou ';' como separador (o Excel em pt-BR exporta com ';')
+    cabecalho = arquivo.readline()
+    separador = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+    campos = [c.strip().lower() for c in next(csv.reader([cabecalho], delimiter=separador))]
+    return csv.DictReader(arquivo, fieldnames=campos, delimiter=separador)
+
+
+def copy_disponivel():
+    return db.engine.dialect.name == 'postgresql' and db.engine.dialect.driver == 'psycopg2'
+
+
+def _copiar(modelo, linhas):
+    # COPY na conexão da sessão (mesma transação); None vira campo vazio = NULL no formato csv
+    tabela = modelo.__table__
+    preparador = db.engine.dialect.identifier_preparer
+    chaves = list(linhas[0])
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([linha[chave] for chave in chaves] for linha in linhas)
+    buffer.seek(0)
+    colunas = ', '.join(preparador.quote(tabela.c[chave].name) for chave in chaves)
+    cursor = db.session.connection().connection.driver_connection.cursor()
+    try:
+        cursor.copy_expert(f'COPY {preparador.format_table(tabela)} ({colunas}) FROM STDIN WITH (FORMAT csv)',
+                           buffer)
+    finally:
+        cursor.close()
+
+
+def _gravar_lote(importador, lote, relatorio, copiar=False):
+    lote = importador.preparar_lote(lote, relatorio)
+    if not lote:
+        return
+
+    achados = importador.existentes(lote)
+    vistos = {col.key: set() for col in importador.unicos}
+    validas = []
+    for numero, linha in lote:
+        repetido = None
+        for col in importador.unicos:
+            valor = linha[col.key]
+            if valor in achados[col.key]:
+                repetido = f"{col.key} '{valor}' já cadastrado"
+            elif valor in vistos[col.key]:
+                repetido = f"{col.key} '{valor}' repetido no arquivo"
+            if repetido:
+                break
+        if repetido:
+            relatorio.erro(numero, repetido)
+            continue
+        for col in importador.unicos:
+            vistos[col.key].add(linha[col.key])
+        validas.append((numero, linha))
+
+    if not validas:
+        return
+    try:
+        if copiar:
+            _copiar(importador.modelo, [linha for _, linha in validas])
+        else:
+            db.session.execute(insert(importador.modelo), [linha for _, linha in validas])
+        dashboard_cache.invalidar_na_sessao(db.session)
+        busca_cache.invalidar_na_sessao(db.session)
+        if importador.catalogo:
+            catalogos.alterados(db.session, importador.catalogo)
+        db.session.commit()
+        relatorio.inseridos += len(validas)
+    except (IntegrityError, db.engine.dialect.dbapi.IntegrityError) as e:
+        # conflito com uma escrita concorrente: o lote inteiro é desfeito
+        # (o COPY levanta a exceção do driver, sem o invólucro do SQLAlchemy)
+        db.session.rollback()
+        motivo = str(getattr(e, 'orig', e)).splitlines()[0]
+        for numero, _ in validas:
+            relatorio.erro(numero, f'lote rejeitado pelo banco: {motivo}')
+
+
+def importar(arquivo, tipo, lote=LOTE, copiar=None):
+    # `arquivo`: objeto de texto com o CSV (cabeçalho na primeira linha);
+    # copiar=None usa COPY sempre que o banco permitir
+    importador = IMPORTADORES[tipo]()
+    copiar = copy_disponivel() if copiar is None else copiar and copy_disponivel()
+    relatorio = RelatorioImportacao(tipo)
+    pendentes = []
+    for numero, bruto in enumerate(_leitor(arquivo), start=2):
+        if not any((v or '').strip() for v in bruto.values() if isinstance(v, str)):
+            continue  # linha em branco
+        relatorio.lidos += 1
+        try:
+            pendentes.append((numero, importador.converter(bruto)))
+        except ValueError as e:
+            relatorio.erro(numero, str(e))
+        if len(pendentes) >= lote:
+            _gravar_lote(importador, pendentes, relatorio, copiar)
+            pendentes = []
+    if pendentes:
+        _gravar_lote(importador, pendentes, relatorio, copiar)
+    relatorio.erros.sort()
+    return relatorio
+
+
+def init_app(app):
+
+    @app.cli.command('importar')
+    @click.argument('tipo', type=click.Choice(sorted(IMPORTADORES)))
+    @click.argument('arquivo', type=click.File('r', encoding='utf-8-sig'))
+    @click.option('--lote', default=LOTE, show_default=True, help='Linhas por transação.')
+    @click.option('--erros', type=click.File('w', encoding='utf-8'), help='Grava o relatório de erros em CSV.')
+    @click.option('--copy/--sem-copy', 'copiar', default=True, show_default=True,
+                  help='Grava com COPY no PostgreSQL (senão, INSERT em lote).')
+    def importar_cmd(tipo, arquivo, lote, erros, copiar):
+        """Importa clientes, veículos ou peças de um arquivo CSV."""
+        inicio = datetime.now()
+        relatorio = importar(arquivo, tipo, lote=lote, copiar=copiar)
+        segundos = max((datetime.now() - inicio).total_seconds(), 1e-6)
+        click.echo(f'{relatorio.lidos} linha(s) lida(s), {relatorio.inseridos} inserida(s), '
+                   f'{len(relatorio.erros)} com erro — {relatorio.lidos / segundos:.0f} linhas/s')
+        if erros:
+            escritor = csv.writer(erros)
+            escritor.writerow(('linha', 'erro'))
+            escritor.writerows(relatorio.erros)
+        else:
+            for numero, mensagem in relatorio.erros[:50]:
+                click.echo(f'  linha {numero}: {mensagem}')
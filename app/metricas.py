@@ -0,0 +1,195 @@
+import json
+import logging
+import os
+import re
+import time
+from flask import Response, request, has_request_context, before_render_template, template_rendered
+from flask.signals import request_started, request_finished
+from sqlalchemy import event
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Histogram
+    from prometheus_client import multiprocess
+except ImportError:  # opcional: sem ele não há /metrics, mas o log de SQL lento continua
+    prometheus_client = None
+
+#================================
+# MÉTRICAS POR REQUISIÇÃO E LOG DE SQL LENTO
+#================================
+
+# Eventos before/after_cursor_execute dos engines (primário e réplicas) medem cada
+# statement; os sinais do Flask medem a requisição e a renderização dos templates.
+# Por endpoint vão para histogramas do Prometheus (GET /metrics):
+#   oficina_requisicao_segundos   latência total
+#   oficina_sql_statements        statements emitidos na requisição
+#   oficina_sql_segundos          tempo gasto no banco na requisição
+#   oficina_template_segundos     tempo renderizando templates na requisição
+# Statements acima de SQL_LENTA_MS viram uma linha JSON no logger "oficina.sql_lenta",
+# com o SQL normalizado (sem literais) e a rota que o emitiu.
+# Com vários workers do gunicorn, defina PROMETHEUS_MULTIPROC_DIR (diretório vazio,
+# limpo a cada deploy) para que /metrics some os contadores de todos os workers.
+
+CHAVE = 'oficina.metricas'    # no environ, não em `g`: várias rotas abrem um app_context próprio
+
+log_sql_lenta = logging.getLogger('oficina.sql_lenta')
+
+if prometheus_client is not None:
+    REQUISICOES = Counter('oficina_requisicoes', 'Requisições atendidas',
+                          ('endpoint', 'metodo', 'status'))
+    LATENCIA = Histogram('oficina_requisicao_segundos', 'Latência total da requisição',
+                         ('endpoint', 'metodo'),
+                         buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10))
+    STATEMENTS = Histogram('oficina_sql_statements', 'Statements SQL por requisição',
+                           ('endpoint', 'metodo'),
+                           buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 250))
+    TEMPO_SQL = Histogram('oficina_sql_segundos', 'Tempo no banco por requisição',
+                          ('endpoint', 'metodo'),
+                          buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5))
+    TEMPO_TEMPLATE = Histogram('oficina_template_segundos', 'Tempo renderizando templates por requisição',
+                               ('endpoint', 'metodo'),
+                               buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1))
+
+_LITERAIS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),                       # strings
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),                    # números
+    (re.compile(r'%\(\w+\)s|%s|(?<![:\w]):[A-Za-z_]\w*|\$\?'), '?'),  # placeholders dos drivers
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)'), '(?, ...)'),    # IN (?, ?, ?) de qualquer tamanho
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def normalizar(sql):
+    # mesma forma para statements que só diferem nos valores
+    for padrao, troca in _LITERAIS:
+        sql = padrao.sub(troca, sql)
+    return sql.strip()
+
+
+def _medidas():
+    return request.environ.setdefault(CHAVE, {'inicio': time.perf_counter(), 'statements': 0,
+                                              'sql': 0.0, 'template': 0.0})
+
+
+def _rota():
+    if not has_request_context():
+        return None
+    return request.endpoint or request.path
+
+
+def _contar(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        _medidas()['statements'] += 1
+
+
+def contar_statements(engine):
+    # o contador de statements por requisição — o mesmo para /metrics, para o
+    # cabeçalho X-SQL-Queries do modo estrito (carregamento.py), para o benchmark e os testes
+    if not event.contains(engine, 'before_cursor_execute', _contar):
+        event.listen(engine, 'before_cursor_execute', _contar)
+
+
+def statements():
+    # statements emitidos até agora na requisição atual
+    return request.environ.get(CHAVE, {}).get('statements', 0)
+
+
+def _iniciar_cronometro(conn, cursor, statement, parameters, context, executemany):
+    context._oficina_inicio = time.perf_counter()
+
+
+def _parar_cronometro(conn, cursor, statement, parameters, context, executemany):
+    context._oficina_duracao = duracao = time.perf_counter() - context._oficina_inicio
+    if has_request_context():
+        medidas = _medidas()
+        medidas['sql'] += duracao
+        for observador in medidas.get('observadores', ()):
+            observador(statement, duracao)
+
+
+def cronometrar(engine):
+    # tempo de cada statement, somado por requisição e entregue aos observadores
+    # da requisição (observar_sql); um par de listeners por engine, quem quer que registre
+    if not event.contains(engine, 'after_cursor_execute', _parar_cronometro):
+        event.listen(engine, 'before_cursor_execute', _iniciar_cronometro)
+        event.listen(engine, 'after_cursor_execute', _parar_cronometro)
+
+
+def observar_sql(observador):
+    # observador(statement, segundos) para os statements do resto da requisição atual
+    # (perfil.py); requisições sem observador não pagam nada a mais
+    _medidas().setdefault('observadores', []).append(observador)
+
+
+def medir_engine(app, engine):
+    contar_statements(engine)
+    cronometrar(engine)
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _sql_lenta(conn, cursor, statement, parameters, context, executemany):
+        duracao = context._oficina_duracao
+        if duracao * 1000 >= app.config['SQL_LENTA_MS']:
+            log_sql_lenta.warning(json.dumps({
+                'duracao_ms': round(duracao * 1000, 1),
+                'rota': _rota(),
+                'metodo': request.method if has_request_context() else None,
+                'banco': engine.url.host or engine.url.database,
+                'executemany': executemany,
+                'sql': normalizar(statement),
+            }, ensure_ascii=False))
+
+
+def _inicio(sender, **extra):
+    _medidas()
+
+
+def _antes_template(sender, template, context, **extra):
+    _medidas()['template_inicio'] = time.perf_counter()
+
+
+def _depois_template(sender, template, context, **extra):
+    medidas = _medidas()
+    inicio = medidas.pop('template_inicio', None)
+    if inicio is not None:
+        medidas['template'] += time.perf_counter() - inicio
+
+
+def _fim(sender, response, **extra):
+    medidas = request.environ.get(CHAVE)
+    if medidas is None:
+        return
+    rotulos = (request.endpoint or 'desconhecido', request.method)
+    REQUISICOES.labels(*rotulos, str(response.status_code)).inc()
+    LATENCIA.labels(*rotulos).observe(time.perf_counter() - medidas['inicio'])
+    STATEMENTS.labels(*rotulos).observe(medidas['statements'])
+    TEMPO_SQL.labels(*rotulos).observe(medidas['sql'])
+    TEMPO_TEMPLATE.labels(*rotulos).observe(medidas['template'])
+
+
+def exportar():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registro = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = prometheus_client.REGISTRY
+    return Response(prometheus_client.generate_latest(registro),
+                    mimetype=prometheus_client.CONTENT_TYPE_LATEST)
+
+
+def init_app(app, engines):
+    if not app.config.get('METRICAS'):
+        return
+    if app.config.get('SQL_LENTA_ARQUIVO'):
+        arquivo = logging.FileHandler(app.config['SQL_LENTA_ARQUIVO'], encoding='utf-8')
+        arquivo.setFormatter(logging.Formatter('%(message)s'))
+        log_sql_lenta.addHandler(arquivo)
+    for engine in engines:
+        medir_engine(app, engine)
+    if prometheus_client is None:
+        app.logger.warning('prometheus_client não instalado: /metrics desativado')
+        return
+    request_started.connect(_inicio, app)
+    before_render_template.connect(_antes_template, app)
+    template_rendered.connect(_depois_template, app)
+    request_finished.connect(_fim, app)
+    app.add_url_rule('/metrics', 'metricas', exportar)
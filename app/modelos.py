@@ -0,0 +1,273 @@
+import base64
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+from urllib.parse import unquote
+import click
+from flask import current_app, request, render_template, send_file, abort, url_for
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # opcional: sem ele só há a variante .gz
+    brotli = None
+
+#================================
+# MODELOS 3D (build com hash de conteúdo)
+#================================
+
+# `flask modelos-build` gera em static/models_3d/dist um .glb por modelo:
+# - com o gltf-transform (via npx), malhas comprimidas (meshopt ou draco) e texturas
+#   reduzidas e convertidas (webp/ktx2/avif);
+# - sem ele, o .gltf e seus .bin/texturas são só empacotados num único .glb.
+# O nome leva o hash do conteúdo (car.3f9a1c2b7d4e.glb), acompanhado de .gz/.br
+# pré-comprimidos, e manifest.json mapeia modelo -> arquivo. /modelos/<arquivo>
+# serve com cache `immutable`, escolhe .br/.gz pelo Accept-Encoding e atende Range
+# (sempre sem compressão). O /sw.js é gerado do manifesto: o nome do cache muda só
+# quando algum modelo muda. Sem build, tudo continua apontando para os originais.
+
+MODELOS = {                     # nome -> arquivo de origem em static/models_3d
+    'car': 'car/car.glb',
+    'wrench': 'wrench/scene.gltf',
+    'user': 'user/scene.gltf',
+    'order': 'order/scene.gltf',
+    'engine': 'engine/engine.glb',
+    'crane': 'crane/crane.glb',
+    'worker': 'worker/worker.glb',
+}
+ORIGEM = 'models_3d'
+DESTINO = os.path.join('models_3d', 'dist')
+MANIFESTO = 'manifest.json'
+OTIMIZADOR = ('npx', '--yes', '@gltf-transform/cli', 'optimize')
+TEMPO_OTIMIZADOR = 600         # segundos por modelo
+UM_ANO = 31536000
+
+
+#================================
+# Build
+#================================
+
+def _glb(documento, binario):
+    # contêiner GLB 2.0: cabeçalho + chunk JSON + chunk BIN, alinhados em 4 bytes
+    texto = json.dumps(documento, separators=(',', ':')).encode()
+    texto += b' ' * (-len(texto) % 4)
+    binario = bytes(binario) + b'\0' * (-len(binario) % 4)
+    chunks = struct.pack('<II', len(texto), 0x4E4F534A) + texto
+    if binario:
+        chunks += struct.pack('<II', len(binario), 0x004E4942) + binario
+    return struct.pack('<III', 0x46546C67, 2, 12 + len(chunks)) + chunks
+
+
+def empacotar(caminho):
+    # .gltf + .bin + texturas -> um único .glb (buffers e imagens no chunk binário)
+    pasta = os.path.dirname(caminho)
+    with open(caminho, encoding='utf-8') as entrada:
+        documento = json.load(entrada)
+    binario = bytearray()
+
+    def ler(uri):
+        if uri.startswith('data:'):
+            return base64.b64decode(uri.split(',', 1)[1])
+        with open(os.path.join(pasta, unquote(uri)), 'rb') as arquivo:
+            return arquivo.read()
+
+    def anexar(dados):
+        binario.extend(b'\0' * (-len(binario) % 4))
+        inicio = len(binario)
+        binario.extend(dados)
+        return inicio
+
+    inicios = [anexar(ler(buffer['uri'])) for buffer in documento.get('buffers', [])]
+    vistas = documento.setdefault('bufferViews', [])
+    for vista in vistas:
+        vista['byteOffset'] = vista.get('byteOffset', 0) + inicios[vista['buffer']]
+        vista['buffer'] = 0
+    for imagem in documento.get('images', []):
+        uri = imagem.pop('uri', None)
+        if uri is None:
+            continue
+        dados = ler(uri)
+        imagem.setdefault('mimeType', mimetypes.guess_type(unquote(uri))[0] or 'image/png')
+        imagem['bufferView'] = len(vistas)
+        vistas.append({'buffer': 0, 'byteOffset': anexar(dados), 'byteLength': len(dados)})
+    documento['buffers'] = [{'byteLength': len(binario)}] if binario else []
+    return _glb(documento, binario)
+
+
+def otimizar(caminho, compressao, textura, tamanho):
+    # devolve os bytes do .glb otimizado, ou None se o gltf-transform não estiver disponível
+    if not shutil.which(OTIMIZADOR[0]):
+        return None
+    with tempfile.TemporaryDirectory() as temporario:
+        saida = os.path.join(temporario, 'modelo.glb')
+        comando = [*OTIMIZADOR, caminho, saida, '--compress', compressao,
+                   '--texture-compress', textura, '--texture-size', str(tamanho)]
+        try:
+            resultado = subprocess.run(comando, capture_output=True, text=True, timeout=TEMPO_OTIMIZADOR)
+        except subprocess.TimeoutExpired:
+            click.echo('  gltf-transform excedeu o tempo limite')
+            return None
+        if resultado.returncode != 0 or not os.path.exists(saida):
+            erro = (resultado.stderr or resultado.stdout).strip().splitlines()
+            click.echo(f"  gltf-transform falhou: {erro[-1] if erro else resultado.returncode}")
+            return None
+        with open(saida, 'rb') as arquivo:
+            return arquivo.read()
+
+
+def _gravar(caminho, dados):
+    temporario = caminho + '.tmp'
+    with open(temporario, 'wb') as saida:
+        saida.write(dados)
+    os.replace(temporario, caminho)
+
+
+def construir(static, otimizador=True, compressao='meshopt', textura='webp', tamanho=2048):
+    destino = os.path.join(static, DESTINO)
+    os.makedirs(destino, exist_ok=True)
+    modelos = {}
+    for nome, origem in MODELOS.items():
+        caminho = os.path.join(static, ORIGEM, origem)
+        dados = otimizar(caminho, compressao, textura, tamanho) if otimizador else None
+        processo = 'gltf-transform' if dados is not None else 'empacotado'
+        if dados is None:
+            # uma falha (ferramenta ausente, sem rede) vale para os demais modelos
+            otimizador = False
+            if caminho.endswith('.gltf'):
+                dados = empacotar(caminho)
+            else:
+                with open(caminho, 'rb') as arquivo:
+                    dados = arquivo.read()
+        resumo = hashlib.sha256(dados).hexdigest()[:12]
+        arquivo = f'{nome}.{resumo}.glb'
+        entrada = {'arquivo': arquivo, 'origem': origem, 'processo': processo, 'bytes': len(dados)}
+        _gravar(os.path.join(destino, arquivo), dados)
+        # variantes pré-comprimidas (determinísticas), só se compensarem
+        variantes = [('gzip', '.gz', lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variantes.append(('br', '.br', lambda d: brotli.compress(d, quality=11)))
+        for codificacao, extensao, comprimir in variantes:
+            comprimido = comprimir(dados)
+            if len(comprimido) < len(dados) * 0.95:
+                _gravar(os.path.join(destino, arquivo + extensao), comprimido)
+                entrada[codificacao] = len(comprimido)
+        modelos[nome] = entrada
+        tamanho_origem = _tamanho_origem(caminho)
+        click.echo(f'{nome}: {tamanho_origem / 1e6:.1f} MB -> {len(dados) / 1e6:.1f} MB ({processo})'
+                   + (f", gzip {entrada['gzip'] / 1e6:.1f} MB" if 'gzip' in entrada else ''))
+
+    versao = hashlib.sha256(json.dumps(modelos, sort_keys=True).encode()).hexdigest()[:12]
+    _gravar(os.path.join(destino, MANIFESTO),
+            json.dumps({'versao': versao, 'modelos': modelos}, indent=2, sort_keys=True).encode())
+    # remove as gerações anteriores
+    usados = {MANIFESTO} | {e['arquivo'] + ext for e in modelos.values() for ext in ('', '.gz', '.br')}
+    for nome in os.listdir(destino):
+        if nome not in usados:
+            os.remove(os.path.join(destino, nome))
+    return versao
+
+
+def _tamanho_origem(caminho):
+    # .gltf: soma a pasta do modelo (bin + texturas); .glb: o próprio arquivo
+    if not caminho.endswith('.gltf'):
+        return os.path.getsize(caminho)
+    pasta = os.path.dirname(caminho)
+    return sum(os.path.getsize(os.path.join(raiz, n)) for raiz, _, nomes in os.walk(pasta) for n in nomes)
+
+
+#================================
+# Manifesto em tempo de execução
+#================================
+
+class Manifesto:
+    # relido quando o arquivo muda (novo build sem reiniciar os workers)
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._marca = None
+        self.versao = None
+        self.modelos = {}
+
+    def atual(self):
+        try:
+            marca = os.stat(self.caminho).st_mtime_ns
+        except FileNotFoundError:
+            marca = None
+        if marca != self._marca:
+            self._marca = marca
+            if marca is None:
+                self.versao, self.modelos = None, {}
+            else:
+                with open(self.caminho, encoding='utf-8') as entrada:
+                    dados = json.load(entrada)
+                self.versao, self.modelos = dados['versao'], dados['modelos']
+        return self
+
+
+def _versao_originais(static):
+    # sem build: versão pelo tamanho/data dos originais
+    partes = []
+    for origem in MODELOS.values():
+        info = os.stat(os.path.join(static, ORIGEM, origem))
+        partes.append(f'{origem}:{info.st_size}:{info.st_mtime_ns}')
+    return hashlib.sha256('|'.join(partes).encode()).hexdigest()[:12]
+
+
+def init_app(app):
+    manifesto = Manifesto(os.path.join(app.static_folder, DESTINO, MANIFESTO))
+
+    @app.template_global()
+    def modelo_3d(nome):
+        entrada = manifesto.atual().modelos.get(nome)
+        if entrada:
+            return url_for('modelos_3d', arquivo=entrada['arquivo'])
+        return url_for('static', filename=f'{ORIGEM}/{MODELOS[nome]}')
+
+    @app.route('/modelos/<path:arquivo>')
+    def modelos_3d(arquivo):
+        caminho = safe_join(os.path.join(current_app.static_folder, DESTINO), arquivo)
+        if not arquivo.endswith('.glb') or caminho is None or not os.path.isfile(caminho):
+            abort(404)
+        codificacao = None
+        if 'Range' not in request.headers:
+            for candidata, extensao in (('br', '.br'), ('gzip', '.gz')):
+                if request.accept_encodings[candidata] and os.path.isfile(caminho + extensao):
+                    codificacao, caminho = candidata, caminho + extensao
+                    break
+        resposta = send_file(caminho, mimetype='model/gltf-binary', conditional=True,
+                             etag=f'{arquivo}-{codificacao or "identity"}', max_age=UM_ANO)
+        if codificacao:
+            resposta.headers['Content-Encoding'] = codificacao
+        resposta.headers['Vary'] = 'Accept-Encoding'
+        resposta.headers['Cache-Control'] = f'public, max-age={UM_ANO}, immutable'
+        return resposta
+
+    @app.route('/sw.js')
+    def service_worker():
+        # servido na raiz para que o escopo do SW seja '/'
+        atual = manifesto.atual()
+        urls = [modelo_3d(nome) for nome in MODELOS]
+        corpo = render_template('sw.js', urls=urls,
+                                versao=atual.versao or _versao_originais(current_app.static_folder),
+                                imutaveis=bool(atual.modelos))
+        return current_app.response_class(corpo, mimetype='application/javascript',
+                                          headers={'Cache-Control': 'no-cache'})
+
+    @app.cli.command('modelos-build')
+    @click.option('--otimizador/--sem-otimizador', default=True, show_default=True,
+                  help='Usa o gltf-transform (npx) para comprimir malhas e texturas.')
+    @click.option('--compressao', type=click.Choice(['meshopt', 'draco', 'quantize']), default='meshopt',
+                  show_default=True, help='Compressão das malhas.')
+    @click.option('--textura', type=click.Choice(['webp', 'ktx2', 'avif']), default='webp',
+                  show_default=True, help='Formato das texturas.')
+    @click.option('--tamanho', default=2048, show_default=True, help='Lado máximo das texturas (px).')
+    def modelos_build(otimizador, compressao, textura, tamanho):
+        """Gera os modelos 3D comprimidos, com hash no nome, e o manifesto."""
+        versao = construir(app.static_folder, otimizador, compressao, textura, tamanho)
+        click.echo(f'manifesto {versao} em static/{DESTINO}/{MANIFESTO}')
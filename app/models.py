@@ -1,6 +1,19 @@
 from datetime import datetime
+from sqlalchemy import event, DDL
 from . import db
 
+# a busca rápida (busca.py) e o autocompletar usam índices GIN de trigramas: a extensão precisa
+# existir antes das tabelas
+event.listen(db.metadata, 'before_create',
+             DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'))
+
+
+def indice_trigramas(nome, *colunas):
+    # índice GIN (gin_trgm_ops) para ILIKE '%termo%' e similaridade; só no PostgreSQL
+    return db.Index(nome, *colunas, postgresql_using='gin',
+                    postgresql_ops={c: 'gin_trgm_ops' for c in colunas}).ddl_if(dialect='postgresql')
+
+
 class Cliente(db.Model):
     __tablename__ = "cliente"
     id_cliente = db.Column(db.Integer, primary_key=True)
@@ -11,6 +24,13 @@ class Cliente(db.Model):
     endereco = db.Column(db.String(200), nullable=False)
     data_cadastro = db.Column(db.Date, nullable=False)
 
+    __table_args__ = (
+        indice_trigramas('ix_cliente_busca_trgm', 'nome', 'cpf', 'telefone', 'email'),
+        # ordenações da listagem (coluna + PK de desempate do cursor)
+        db.Index('ix_cliente_nome', 'nome', 'id_cliente'),
+        db.Index('ix_cliente_cadastro', 'data_cadastro', 'id_cliente'),
+    )
+
     veiculos = db.relationship("Veiculo", back_populates="cliente")
 
 class Veiculo(db.Model):
@@ -24,6 +44,11 @@ class Veiculo(db.Model):
     km_atual = db.Column(db.Integer)
     id_cliente = db.Column(db.Integer, db.ForeignKey("cliente.id_cliente"), nullable=False)
 
+    __table_args__ = (
+        indice_trigramas('ix_veiculo_busca_trgm', 'placa', 'modelo'),
+        db.Index('ix_veiculo_cliente', 'id_cliente'),
+    )
+
     cliente = db.relationship("Cliente", back_populates="veiculos")
     agendamentos = db.relationship("Agendamento", back_populates="veiculo")
     ordens = db.relationship("OrdemDeServico", back_populates="veiculo")
@@ -37,6 +62,10 @@ class Mecanico(db.Model):
     especialidade = db.Column(db.String(50))
     data_admissao = db.Column(db.Date, nullable=False)
 
+    __table_args__ = (
+        indice_trigramas('ix_mecanico_nome_trgm', 'nome'),
+    )
+
     agendamentos = db.relationship("Agendamento", back_populates="mecanico", cascade="all, delete-orphan")
     ordens = db.relationship("OrdemDeServico", back_populates="mecanico", cascade="all, delete-orphan")
 
@@ -49,11 +78,33 @@ class Agendamento(db.Model):
     observacoes = db.Column(db.String(200))
     id_veiculo = db.Column(db.Integer, db.ForeignKey("veiculo.id_veiculo"), nullable=False)
     id_mecanico = db.Column(db.Integer, db.ForeignKey("mecanico.id_mecanico"), nullable=False)
+    # tempo reservado na agenda do mecânico (ver agenda.py)
+    duracao_minutos = db.Column(db.Integer, nullable=False, default=60, server_default='60')
+
+    __table_args__ = (
+        db.Index('ix_agendamento_mecanico_data', 'id_mecanico', 'data_agendamento'),
+        db.Index('ix_agendamento_veiculo', 'id_veiculo'),
+        # próximos agendamentos da dashboard e listagem por data/hora
+        db.Index('ix_agendamento_data_hora', 'data_agendamento', 'hora_agendamento', 'id_agendamento'),
+        db.Index('ix_agendamento_status', 'status', 'id_agendamento'),
+    )
 
     veiculo = db.relationship("Veiculo", back_populates="agendamentos")
     mecanico = db.relationship("Mecanico", back_populates="agendamentos")
     ordens = db.relationship("OrdemDeServico", back_populates="agendamento")
 
+# rede de segurança contra agendamentos sobrepostos do mesmo mecânico (o app já
+# verifica antes de gravar, mas dois workers podem gravar ao mesmo tempo)
+event.listen(db.metadata, 'before_create',
+             DDL('CREATE EXTENSION IF NOT EXISTS btree_gist').execute_if(dialect='postgresql'))
+event.listen(Agendamento.__table__, 'after_create', DDL(
+    "ALTER TABLE agendamento ADD CONSTRAINT ex_agendamento_sobreposto "
+    "EXCLUDE USING gist (id_mecanico WITH =, tsrange("
+    "data_agendamento + hora_agendamento, "
+    "data_agendamento + hora_agendamento + duracao_minutos * interval '1 minute') WITH &&) "
+    "WHERE (status <> 'Cancelado')"
+).execute_if(dialect='postgresql'))
+
 class Servico(db.Model):
     __tablename__ = "servico"
     id_servico = db.Column(db.Integer, primary_key=True)
@@ -62,6 +113,10 @@ class Servico(db.Model):
     preco_base = db.Column(db.Numeric(10,2), nullable=False)
     tempo_estimado = db.Column(db.Integer)
 
+    __table_args__ = (
+        indice_trigramas('ix_servico_nome_trgm', 'nome_servico'),
+    )
+
     itens = db.relationship("ItemOrdemServico", back_populates="servico", cascade="all, delete-orphan")
 
 class Peca(db.Model):
@@ -74,6 +129,15 @@ class Peca(db.Model):
     estoque_minimo = db.Column(db.Integer)
     estoque_atual = db.Column(db.Integer, nullable=False)
 
+    # índice parcial só com as peças abaixo do mínimo: o relatório de reposição
+    # percorre apenas essas linhas, independente do tamanho do catálogo
+    __table_args__ = (
+        db.Index('ix_peca_reposicao', 'nome_peca', 'id_peca',
+                 postgresql_where=(estoque_atual < estoque_minimo),
+                 sqlite_where=(estoque_atual < estoque_minimo)),
+        indice_trigramas('ix_peca_nome_trgm', 'nome_peca'),
+    )
+
     pecas_os = db.relationship("PecaOrdemServico", back_populates="peca", cascade="all, delete-orphan")
 
 class OrdemDeServico(db.Model):
@@ -85,10 +149,25 @@ class OrdemDeServico(db.Model):
     status = db.Column(db.String(20), nullable=False)
     valor_total = db.Column(db.Numeric(10,2))
     observacoes = db.Column(db.String(200))
+    # as peças desta OS foram baixadas do estoque (ver estoque.py); ordens antigas e
+    # as da carga sintética não, e por isso não devolvem peças ao serem excluídas
+    estoque_baixado = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
     id_agendamento = db.Column(db.Integer, db.ForeignKey("agendamento.id_agendamento"))
     id_veiculo = db.Column(db.Integer, db.ForeignKey("veiculo.id_veiculo"), nullable=False)
     id_mecanico = db.Column(db.Integer, db.ForeignKey("mecanico.id_mecanico"), nullable=False)
 
+    __table_args__ = (
+        indice_trigramas('ix_ordem_busca_trgm', 'numero_os'),
+        # listagem, relatórios por período e a série mensal da dashboard
+        db.Index('ix_ordem_abertura', 'data_abertura', 'id_ordem_servico'),
+        # "ordens em andamento" da dashboard: status IN (...) ORDER BY data_abertura DESC
+        db.Index('ix_ordem_status_abertura', 'status', 'data_abertura'),
+        db.Index('ix_ordem_conclusao', 'data_conclusao'),
+        db.Index('ix_ordem_veiculo', 'id_veiculo'),
+        db.Index('ix_ordem_mecanico_abertura', 'id_mecanico', 'data_abertura'),
+        db.Index('ix_ordem_agendamento', 'id_agendamento'),
+    )
+
     agendamento = db.relationship("Agendamento", back_populates="ordens")
     veiculo = db.relationship("Veiculo", back_populates="ordens")
     mecanico = db.relationship("Mecanico", back_populates="ordens")
@@ -105,6 +184,11 @@ class ItemOrdemServico(db.Model):
     desconto = db.Column(db.Numeric(10,2))
     valor_total = db.Column(db.Numeric(10,2), nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_item_os_ordem', 'id_ordem_servico'),
+        db.Index('ix_item_os_servico', 'id_servico'),
+    )
+
     ordem = db.relationship("OrdemDeServico", back_populates="itens_servico")
     servico = db.relationship("Servico", back_populates="itens")
 
@@ -117,6 +201,55 @@ class PecaOrdemServico(db.Model):
     preco_unitario = db.Column(db.Numeric(10,2), nullable=False)
     valor_total = db.Column(db.Numeric(10,2), nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_peca_os_ordem', 'id_ordem_servico'),
+        db.Index('ix_peca_os_peca', 'id_peca'),
+    )
+
     ordem = db.relationship("OrdemDeServico", back_populates="pecas_os")
     peca = db.relationship("Peca", back_populates="pecas_os")
-    
\ No newline at end of file
+    
+class ResumoDiario(db.Model):
+    # agregados por dia e mecânico, mantidos a cada escrita em ordens/agendamentos (ver resumo.py)
+    __tablename__ = "resumo_diario"
+    dia = db.Column(db.Date, primary_key=True)
+    id_mecanico = db.Column(db.Integer, primary_key=True)
+    ordens_abertas = db.Column(db.Integer, nullable=False, default=0)
+    ordens_concluidas = db.Column(db.Integer, nullable=False, default=0)
+    receita = db.Column(db.Numeric(12,2), nullable=False, default=0)
+    agendamentos = db.Column(db.Integer, nullable=False, default=0)
+
+
+class VersaoCatalogo(db.Model):
+    # contador por catálogo (servicos, pecas, mecanicos), incrementado na mesma transação
+    # de cada escrita: os workers comparam a versão antes de reaproveitar o snapshot (ver catalogos.py)
+    __tablename__ = "versao_catalogo"
+    nome = db.Column(db.String(20), primary_key=True)
+    versao = db.Column(db.Integer, nullable=False, default=0)
+
+
+event.listen(VersaoCatalogo.__table__, 'after_create', DDL(
+    "INSERT INTO versao_catalogo (nome, versao) VALUES ('servicos', 0), ('pecas', 0), ('mecanicos', 0)"))
+
+
+class Tarefa(db.Model):
+    # fila de tarefas em segundo plano (ver tarefas.py); o worker reserva com FOR UPDATE SKIP LOCKED
+    __tablename__ = "tarefa"
+    id_tarefa = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)
+    parametros = db.Column(db.JSON, nullable=False, default=dict)
+    status = db.Column(db.String(20), nullable=False, default='pendente')
+    tentativas = db.Column(db.Integer, nullable=False, default=0)
+    max_tentativas = db.Column(db.Integer, nullable=False, default=3)
+    executar_apos = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    criada_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    iniciada_em = db.Column(db.DateTime)
+    batimento = db.Column(db.DateTime)          # renovado pelo worker enquanto a tarefa roda
+    concluida_em = db.Column(db.DateTime)
+    trabalhador = db.Column(db.String(100))
+    resultado = db.Column(db.JSON)
+    erro = db.Column(db.Text)
+
+    __table_args__ = (
+        db.Index('ix_tarefa_fila', 'status', 'executar_apos', 'id_tarefa'),
+    )
@@ -0,0 +1,189 @@
+import base64
+import json
+from datetime import date, datetime, time
+from flask import request, url_for, current_app
+from sqlalchemy import and_, or_, inspect
+
+#================================
+# PAGINAÇÃO POR CURSOR (KEYSET)
+#================================
+
+# Em vez de OFFSET, cada página começa logo após a chave de ordenação do último
+# item da página anterior: (col1, col2, ..., pk) > (v1, v2, ..., vpk).
+# Com índice nas colunas de ordenação o custo é o mesmo em qualquer página.
+
+POR_PAGINA_PADRAO = 50
+POR_PAGINA_MAX = 200
+
+
+def _serializar(valor):
+    if isinstance(valor, (datetime, date, time)):
+        return valor.isoformat()
+    if isinstance(valor, (int, float, str)) or valor is None:
+        return valor
+    return str(valor)
+
+
+def _desserializar(valor, coluna):
+    if valor is None:
+        return None
+    try:
+        tipo = coluna.type.python_type
+    except NotImplementedError:
+        return valor
+    if tipo is datetime:
+        return datetime.fromisoformat(valor)
+    if tipo is date:
+        return date.fromisoformat(valor)
+    if tipo is time:
+        return time.fromisoformat(valor)
+    return tipo(valor)
+
+
+def codificar_cursor(ordem, valores):
+    bruto = json.dumps({'o': ordem, 'v': [_serializar(v) for v in valores]}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor, ordem, colunas):
+    # cursor inválido ou de outra ordenação é ignorado (volta à primeira página)
+    if not cursor:
+        return None
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        dados = json.loads(bruto)
+        if dados.get('o') != ordem or len(dados['v']) != len(colunas):
+            return None
+        return [_desserializar(v, col) for v, (col, _) in zip(dados['v'], colunas)]
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def _filtro_apos(colunas, valores):
+    # expande a comparação de tupla respeitando a direção de cada coluna:
+    # (a > x) OR (a = x AND b > y) OR ...
+    condicoes = []
+    for i, (coluna, desc) in enumerate(colunas):
+        iguais = [c == v for (c, _), v in zip(colunas[:i], valores[:i])]
+        passo = coluna < valores[i] if desc else coluna > valores[i]
+        condicoes.append(and_(*iguais, passo))
+    return or_(*condicoes)
+
+
+def _ordenacao(colunas):
+    return [c.desc() if desc else c.asc() for c, desc in colunas]
+
+
+def _chave(item, colunas):
+    return [getattr(item, c.key) for c, _ in colunas]
+
+
+class Pagina:
+
+    def __init__(self, itens, ordem, por_pagina, colunas, tem_anterior, tem_proxima):
+        self.itens = itens
+        self.ordem = ordem
+        self.por_pagina = por_pagina
+        self.tem_anterior = tem_anterior and bool(itens)
+        self.tem_proxima = tem_proxima and bool(itens)
+        self._colunas = colunas
+
+    def __iter__(self):
+        return iter(self.itens)
+
+    def __len__(self):
+        return len(self.itens)
+
+    def _url(self, **params):
+        args = {k: v for k, v in request.args.items() if k not in ('apos', 'antes')}
+        args.update({k: v for k, v in params.items() if v is not None})
+        return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+    def url_proxima(self):
+        if not self.tem_proxima:
+            return None
+        return self._url(apos=codificar_cursor(self.ordem, _chave(self.itens[-1], self._colunas)))
+
+    def url_anterior(self):
+        if not self.tem_anterior:
+            return None
+        return self._url(antes=codificar_cursor(self.ordem, _chave(self.itens[0], self._colunas)))
+
+    def url_ordenar(self, chave):
+        # alterna asc/desc ao clicar de novo no mesmo cabeçalho
+        nova = f'-{chave}' if self.ordem == chave else chave
+        return self._url(ordem=nova)
+
+    def direcao(self, chave):
+        if self.ordem == chave:
+            return 'asc'
+        if self.ordem == f'-{chave}':
+            return 'desc'
+        return None
+
+
+def _com_desempate(query, colunas):
+    entidade = query.column_descriptions[0]['entity']
+    pk = getattr(entidade, inspect(entidade).primary_key[0].key)
+    if not any(c.key == pk.key for c, _ in colunas):
+        colunas = list(colunas) + [(pk, colunas[-1][1] if colunas else False)]
+    return colunas
+
+
+def _consulta_da_pagina(query, colunas, valores, por_pagina):
+    # uma linha a mais para saber se há próxima página
+    if valores is not None:
+        query = query.filter(_filtro_apos(colunas, valores))
+    return query.order_by(None).order_by(*_ordenacao(colunas)).limit(por_pagina + 1)
+
+
+def _colunas_da_ordem(ordenacoes, ordem, padrao):
+    ordem = ordem or padrao
+    chave = ordem.lstrip('-')
+    if chave not in ordenacoes:
+        ordem, chave = padrao, padrao.lstrip('-')
+    desc = ordem.startswith('-')
+    return ordem, [(c, desc) for c in ordenacoes[chave]]
+
+
+def paginar(query, colunas, ordem, apos=None, antes=None, por_pagina=POR_PAGINA_PADRAO):
+    # `colunas`: lista de (coluna, desc). A chave primária é acrescentada como
+    # desempate para que a ordem seja total e nenhuma linha se repita/suma.
+    colunas = _com_desempate(query, colunas)
+
+    voltando = False
+    valores = decodificar_cursor(apos, ordem, colunas)
+    if valores is None and antes:
+        valores = decodificar_cursor(antes, ordem, colunas)
+        voltando = valores is not None
+
+    # para voltar, percorre na ordem inversa e desinverte o resultado
+    efetivas = [(c, not d) for c, d in colunas] if voltando else colunas
+    linhas = _consulta_da_pagina(query, efetivas, valores, por_pagina).all()
+
+    sobra = len(linhas) > por_pagina
+    linhas = linhas[:por_pagina]
+    if voltando:
+        linhas.reverse()
+        return Pagina(linhas, ordem, por_pagina, colunas, tem_anterior=sobra, tem_proxima=True)
+    return Pagina(linhas, ordem, por_pagina, colunas, tem_anterior=valores is not None, tem_proxima=sobra)
+
+
+def paginar_listagem(query, ordenacoes, padrao):
+    # Lê ordem/cursor/tamanho de request.args. `ordenacoes` mapeia a chave aceita
+    # em ?ordem= para as colunas ordenadas; prefixo '-' inverte a direção.
+    ordem, colunas = _colunas_da_ordem(ordenacoes, request.args.get('ordem'), padrao)
+
+    maximo = current_app.config.get('LISTAGEM_MAX_POR_PAGINA', POR_PAGINA_MAX)
+    por_pagina = request.args.get('por_pagina', type=int) or current_app.config.get('LISTAGEM_POR_PAGINA', POR_PAGINA_PADRAO)
+    por_pagina = max(1, min(por_pagina, maximo))
+
+    return paginar(query, colunas, ordem,
+                   apos=request.args.get('apos'), antes=request.args.get('antes'),
+                   por_pagina=por_pagina)
+
+
+def consulta_da_listagem(query, ordenacoes, padrao, ordem=None, por_pagina=POR_PAGINA_PADRAO):
+    # o SELECT da primeira página, sem executar (planos.py confere o EXPLAIN)
+    _, colunas = _colunas_da_ordem(ordenacoes, ordem, padrao)
+    return _consulta_da_pagina(query, _com_desempate(query, colunas), None, por_pagina)
@@ -0,0 +1,277 @@
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from flask import request, render_template, abort, Response, after_this_request
+from app import metricas
+from app.metricas import normalizar
+
+#================================
+# PERFILADOR SOB DEMANDA (amostragem de pilhas)
+#================================
+
+# Uma requisição é perfilada quando traz o cabeçalho X-Perfil com o PERFIL_TOKEN
+# ou cai na amostragem (PERFIL_AMOSTRAGEM, fração de 0 a 1). Nesse caso uma thread
+# lê a pilha da thread da requisição a cada PERFIL_INTERVALO_MS (sys._current_frames)
+# e os statements SQL emitidos são somados por forma normalizada. O resultado vai
+# para PERFIL_DIR em JSON (pilhas no formato "collapsed" do flamegraph.pl/speedscope),
+# limitado a PERFIL_MAX_ARQUIVOS e PERFIL_DIAS.
+# Sem token nem amostragem nenhum gancho é registrado: custo zero. Com eles, uma
+# requisição não perfilada só passa pelo teste do before_request; o SQL vem do
+# cronômetro de metricas.py (observar_sql), sem listeners próprios por statement.
+# As páginas /sistema/perfis exigem o token no cabeçalho X-Perfil (nunca na URL,
+# que fica em logs de acesso, histórico e Referer).
+
+CHAVE = 'oficina.perfil'
+CABECALHO = 'X-Perfil'
+NAO_PERFILAR = {'static', 'perfis', 'perfil_ver', 'perfil_pilhas'}
+LARGURA_MINIMA = 0.005     # fração do total abaixo da qual o flamegraph omite o quadro
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _quadro(codigo):
+    arquivo = codigo.co_filename
+    if 'site-packages' + os.sep in arquivo:
+        arquivo = arquivo.rsplit('site-packages' + os.sep, 1)[1]
+    elif arquivo.startswith(RAIZ):
+        arquivo = os.path.relpath(arquivo, RAIZ)
+    return f'{codigo.co_name} ({arquivo}:{codigo.co_firstlineno})'
+
+
+class Amostrador(threading.Thread):
+
+    def __init__(self, alvo, intervalo):
+        super().__init__(name='perfil', daemon=True)
+        self.alvo = alvo
+        self.intervalo = intervalo
+        self.pilhas = Counter()
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.wait(self.intervalo):
+            quadro = sys._current_frames().get(self.alvo)
+            pilha = []
+            while quadro is not None:
+                pilha.append(_quadro(quadro.f_code))
+                quadro = quadro.f_back
+            if pilha:
+                self.pilhas[';'.join(reversed(pilha))] += 1
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+
+
+class Perfil:
+
+    def __init__(self, gatilho, intervalo):
+        self.gatilho = gatilho
+        self.inicio = datetime.now()
+        self.relogio = time.perf_counter()
+        self.status = None
+        self.sql = defaultdict(lambda: [0, 0.0])            # sql normalizado -> [vezes, segundos]
+        self.amostrador = Amostrador(threading.get_ident(), intervalo)
+        self.amostrador.start()
+
+    def registrar_sql(self, statement, segundos):
+        linha = self.sql[normalizar(statement)]
+        linha[0] += 1
+        linha[1] += segundos
+
+    def encerrar(self):
+        self.amostrador.parar()
+        duracao = time.perf_counter() - self.relogio
+        sql = sorted(self.sql.items(), key=lambda par: par[1][1], reverse=True)
+        return {
+            'status': self.status,
+            'gatilho': self.gatilho,
+            'inicio': self.inicio.isoformat(timespec='seconds'),
+            'duracao_ms': round(duracao * 1000, 1),
+            'intervalo_ms': round(self.amostrador.intervalo * 1000, 1),
+            'amostras': sum(self.amostrador.pilhas.values()),
+            'sql_statements': sum(vezes for vezes, _ in self.sql.values()),
+            'sql_ms': round(sum(s for _, s in self.sql.values()) * 1000, 1),
+            'sql': [{'sql': texto, 'vezes': vezes, 'total_ms': round(s * 1000, 1)}
+                    for texto, (vezes, s) in sql],
+            'pilhas': dict(self.amostrador.pilhas.most_common()),
+        }
+
+
+class Armazem:
+    # um JSON por perfil; o nome começa pelo horário, então a ordem alfabética é a cronológica
+
+    def __init__(self, diretorio, max_arquivos, dias):
+        self.diretorio = diretorio
+        self.max_arquivos = max_arquivos
+        self.dias = dias
+
+    def _arquivos(self):
+        if not os.path.isdir(self.diretorio):
+            return []
+        return sorted(n for n in os.listdir(self.diretorio) if n.endswith('.json'))
+
+    def gravar(self, dados):
+        os.makedirs(self.diretorio, exist_ok=True)
+        nome = f"{datetime.now():%Y%m%d-%H%M%S}-{dados['endpoint'] or 'desconhecido'}-{uuid.uuid4().hex[:6]}"
+        temporario = os.path.join(self.diretorio, nome + '.tmp')
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(dados, arquivo, ensure_ascii=False)
+        os.replace(temporario, os.path.join(self.diretorio, nome + '.json'))
+        self.podar()
+        return nome
+
+    def podar(self):
+        arquivos = self._arquivos()
+        limite = f"{datetime.now() - timedelta(days=self.dias):%Y%m%d-%H%M%S}"
+        antigos = [n for n in arquivos if n < limite]
+        recentes = arquivos[len(antigos):]
+        excedentes = recentes[:max(0, len(recentes) - self.max_arquivos)]
+        for nome in antigos + excedentes:
+            try:
+                os.remove(os.path.join(self.diretorio, nome))
+            except FileNotFoundError:   # outro worker já removeu
+                pass
+
+    def _abrir(self, arquivo):
+        try:
+            with open(os.path.join(self.diretorio, arquivo), encoding='utf-8') as entrada:
+                return json.load(entrada)
+        except FileNotFoundError:       # removido pela retenção enquanto listávamos
+            return None
+
+    def ler(self, nome):
+        # só nomes listados no diretório (nada de caminhos vindos da URL)
+        if nome + '.json' not in self._arquivos():
+            return None
+        return self._abrir(nome + '.json')
+
+    def listar(self, endpoint=None):
+        # (nome, dados sem as pilhas), mais recentes primeiro
+        perfis = []
+        for arquivo in reversed(self._arquivos()):
+            dados = self._abrir(arquivo)
+            if dados is None or (endpoint and dados['endpoint'] != endpoint):
+                continue
+            dados.pop('pilhas', None)
+            perfis.append((arquivo[:-5], dados))
+        return perfis
+
+
+def flamegraph(pilhas):
+    # retângulos (nível, início, largura, quadro, amostras) com início/largura em fração do total
+    raiz = {'valor': 0, 'filhos': {}}
+    for pilha, amostras in pilhas.items():
+        no = raiz
+        no['valor'] += amostras
+        for quadro in pilha.split(';'):
+            no = no['filhos'].setdefault(quadro, {'valor': 0, 'filhos': {}})
+            no['valor'] += amostras
+    total = raiz['valor']
+    retangulos = []
+    pendentes = [(raiz, 'total', 0, 0)]
+    while pendentes:
+        no, quadro, nivel, inicio = pendentes.pop()
+        retangulos.append((nivel, inicio / total, no['valor'] / total, quadro, no['valor']))
+        posicao = inicio
+        for nome, filho in sorted(no['filhos'].items()):
+            if filho['valor'] / total >= LARGURA_MINIMA:
+                pendentes.append((filho, nome, nivel + 1, posicao))
+            posicao += filho['valor']
+    return retangulos
+
+
+def funcoes_proprias(pilhas, limite=25):
+    # quadros no topo da pilha (tempo próprio), mais amostrados primeiro
+    proprias = Counter()
+    for pilha, amostras in pilhas.items():
+        proprias[pilha.rsplit(';', 1)[-1]] += amostras
+    return proprias.most_common(limite)
+
+
+def init_app(app, engines):
+    token = app.config.get('PERFIL_TOKEN') or ''
+    amostragem = app.config.get('PERFIL_AMOSTRAGEM') or 0.0
+    if not token and amostragem <= 0:
+        return
+    intervalo = app.config.get('PERFIL_INTERVALO_MS', 5) / 1000
+    armazem = Armazem(app.config.get('PERFIL_DIR') or os.path.join(app.instance_path, 'perfis'),
+                      app.config.get('PERFIL_MAX_ARQUIVOS', 200), app.config.get('PERFIL_DIAS', 7))
+
+    def _autorizado():
+        enviado = request.headers.get(CABECALHO) or ''
+        return bool(token) and hmac.compare_digest(enviado.encode(), token.encode())
+
+    for engine in engines:
+        metricas.cronometrar(engine)
+
+    @app.before_request
+    def _iniciar_perfil():
+        # o único gancho por requisição; o resto só é montado se ela for perfilada
+        if request.endpoint in NAO_PERFILAR:
+            return
+        if CABECALHO in request.headers and _autorizado():
+            gatilho = 'cabecalho'
+        elif amostragem > 0 and random.random() < amostragem:
+            gatilho = 'amostragem'
+        else:
+            return
+        perfil = Perfil(gatilho, intervalo)
+        metricas.observar_sql(perfil.registrar_sql)
+
+        @after_this_request
+        def _encerrar(resposta):
+            perfil.status = resposta.status_code
+            dados = {'endpoint': request.endpoint, 'metodo': request.method,
+                     'caminho': request.full_path.rstrip('?')}
+            if resposta.is_streamed:
+                # o corpo ainda vai ser gerado: encerra depois de enviado
+                resposta.call_on_close(lambda: _gravar(perfil, dados))
+            else:
+                _gravar(perfil, dados)
+            return resposta
+
+    def _gravar(perfil, dados):
+        try:
+            armazem.gravar({**dados, **perfil.encerrar()})
+        except Exception:
+            app.logger.exception('Falha ao gravar o perfil da requisição')
+
+    @app.route('/sistema/perfis')
+    def perfis():
+        if not _autorizado():
+            abort(404)
+        endpoint = request.args.get('rota') or None
+        todos = armazem.listar()
+        contagem = Counter(d['endpoint'] for _, d in todos)
+        lista = [(n, d) for n, d in todos if not endpoint or d['endpoint'] == endpoint]
+        return render_template('sistema/perfis.html', perfis=lista, endpoint=endpoint,
+                               endpoints=sorted(contagem.items()))
+
+    @app.route('/sistema/perfis/<nome>')
+    def perfil_ver(nome):
+        if not _autorizado():
+            abort(404)
+        dados = armazem.ler(nome)
+        if dados is None:
+            abort(404)
+        return render_template('sistema/perfil.html', nome=nome, perfil=dados,
+                               retangulos=flamegraph(dados['pilhas']) if dados['pilhas'] else [],
+                               proprias=funcoes_proprias(dados['pilhas']))
+
+    @app.route('/sistema/perfis/<nome>.folded')
+    def perfil_pilhas(nome):
+        # entrada direta do flamegraph.pl ou do speedscope
+        if not _autorizado():
+            abort(404)
+        dados = armazem.ler(nome)
+        if dados is None:
+            abort(404)
+        texto = ''.join(f'{pilha} {amostras}\n' for pilha, amostras in dados['pilhas'].items())
+        return Response(texto, mimetype='text/plain',
+                        headers={'Content-Disposition': f'attachment; filename={nome}.folded'})
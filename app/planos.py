@@ -0,0 +1,114 @@
+import json
+import re
+from datetime import date, timedelta
+import click
+from sqlalchemy import select, text
+from sqlalchemy.orm import with_parent
+from app import db, agenda, dashboard, resumo
+from app.carregamento import carregar
+from app.models import Cliente, Veiculo, Agendamento, OrdemDeServico
+from app.paginacao import consulta_da_listagem
+from app.precificacao import consultas_precos_praticados
+from app.relatorios import CONSULTAS, Periodo
+from app.routes import ORDENACOES
+
+#================================
+# VERIFICAÇÃO DOS PLANOS DE CONSULTA (EXPLAIN)
+#================================
+
+# Roda EXPLAIN nas consultas quentes da dashboard, das listagens e dos relatórios
+# e confere que cada uma usa um dos índices esperados (ver migrations/versions/
+# 0003_indices_consultas.py). Em tabelas quase vazias o PostgreSQL prefere
+# varrer a tabela; rode sobre uma base populada e com estatísticas (--analyze).
+# `flask verificar-indices` sai com código 1 se alguma consulta não usar índice,
+# para servir de teste de regressão no CI.
+
+
+def _listagem(endpoint, query):
+    # a primeira página na ordem padrão, com o carregamento da rota (CARREGAMENTOS)
+    return consulta_da_listagem(carregar(query, endpoint), *ORDENACOES[endpoint]).statement
+
+
+def _consultas():
+    # as consultas vêm dos mesmos construtores usados pelas rotas, dashboard,
+    # relatórios e resumo; os ids são só para montar o filtro
+    hoje = date.today()
+    mes = Periodo(hoje - timedelta(days=30), hoje)
+    servicos_da_os, pecas_da_os = consultas_precos_praticados(1)
+    # (descrição, índices aceitos, consulta)
+    return [
+        ('dashboard: próximos agendamentos', ('ix_agendamento_data_hora',),
+         dashboard.consulta_proximos_agendamentos(hoje)),
+        ('dashboard: ordens em andamento', ('ix_ordem_status_abertura', 'ix_ordem_abertura'),
+         dashboard.consulta_ordens_andamento()),
+        ('listagem de ordens (mais recentes)', ('ix_ordem_abertura',),
+         _listagem('ordens_listar', db.session.query(OrdemDeServico))),
+        ('listagem de agendamentos (por data)', ('ix_agendamento_data_hora',),
+         _listagem('agendamentos_listar', db.session.query(Agendamento))),
+        ('listagem de clientes (por nome)', ('ix_cliente_nome',),
+         _listagem('clientes_listar', db.session.query(Cliente))),
+        ('veículos do cliente', ('ix_veiculo_cliente',),
+         select(Veiculo).where(with_parent(Cliente(id_cliente=1), Cliente.veiculos))),
+        ('ordens do veículo', ('ix_ordem_veiculo',),
+         select(OrdemDeServico).where(with_parent(Veiculo(id_veiculo=1), Veiculo.ordens))),
+        ('serviços da OS', ('ix_item_os_ordem',), servicos_da_os),
+        ('peças da OS', ('ix_peca_os_ordem',), pecas_da_os),
+        ('agenda do mecânico no dia', ('ix_agendamento_mecanico_data',),
+         agenda.consulta_agenda_do_mecanico(1, hoje, hoje)),
+        ('relatórios: receita do último mês', ('ix_ordem_abertura', 'ix_ordem_status_abertura'),
+         CONSULTAS['mensal'](mes)),
+        ('resumo diário: ordens concluídas no período', ('ix_ordem_conclusao',),
+         resumo.consultas_do_periodo(mes.inicio, mes.fim)[1]),
+    ]
+
+
+def _indices_postgresql(conexao, sql):
+    plano = conexao.execute(text(f'EXPLAIN (FORMAT JSON) {sql}')).scalar()
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    usados, pendentes = set(), [plano[0]['Plan']]
+    while pendentes:
+        no = pendentes.pop()
+        if 'Index Name' in no:
+            usados.add(no['Index Name'])
+        pendentes.extend(no.get('Plans', ()))
+    return usados
+
+
+def _indices_sqlite(conexao, sql):
+    usados = set()
+    for linha in conexao.execute(text(f'EXPLAIN QUERY PLAN {sql}')):
+        usados.update(re.findall(r'USING (?:COVERING )?INDEX (\w+)', linha[-1]))
+    return usados
+
+
+def verificar(conexao):
+    # [(descrição, índices aceitos, índices usados, ok)]
+    dialeto = conexao.dialect
+    planejar = _indices_postgresql if dialeto.name == 'postgresql' else _indices_sqlite
+    resultados = []
+    for descricao, aceitos, consulta in _consultas():
+        sql = str(consulta.compile(dialect=dialeto, compile_kwargs={'literal_binds': True}))
+        usados = planejar(conexao, sql)
+        resultados.append((descricao, aceitos, usados, bool(usados & set(aceitos))))
+    return resultados
+
+
+def init_app(app):
+
+    @app.cli.command('verificar-indices')
+    @click.option('--analyze', is_flag=True, help='Atualiza as estatísticas (ANALYZE) antes do EXPLAIN.')
+    def verificar_indices_cmd(analyze):
+        """Confere pelo EXPLAIN que as consultas quentes usam os índices esperados."""
+        with db.engine.connect() as conexao:
+            if analyze:
+                conexao.execute(text('ANALYZE'))
+            resultados = verificar(conexao)
+        falhas = 0
+        for descricao, aceitos, usados, ok in resultados:
+            falhas += not ok
+            click.echo(f"[{'ok' if ok else 'FALHOU'}] {descricao}: "
+                       f"usa {', '.join(sorted(usados)) or 'nenhum índice'} "
+                       f"(esperado {' ou '.join(aceitos)})")
+        if falhas:
+            raise SystemExit(f'{falhas} consulta(s) sem o índice esperado')
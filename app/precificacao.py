@@ -0,0 +1,122 @@
+from dataclasses import dataclass
+from decimal import Decimal
+from sqlalchemy import select, insert, delete
+from app import db, catalogos
+from app.models import ItemOrdemServico, PecaOrdemServico
+from app.relatorios import relatorios_cache
+from app.analise import analise_cache
+
+#================================
+# PRECIFICAÇÃO DAS LINHAS DA OS
+#================================
+
+# Resolve os preços de todos os serviços/peças da ordem pelos snapshots de
+# catalogos.py (sem SELECT enquanto a versão do catálogo não mudar) e grava as
+# linhas com um INSERT em lote.
+
+CENTAVOS = Decimal('0.01')
+
+
+@dataclass(frozen=True)
+class Linha:
+    id_item: int            # id_servico ou id_peca
+    quantidade: int
+    preco_unitario: Decimal
+    valor_total: Decimal
+
+
+@dataclass(frozen=True)
+class LinhasOrdem:
+    servicos: tuple = ()
+    pecas: tuple = ()
+
+    @property
+    def total(self):
+        return sum((l.valor_total for l in self.servicos + self.pecas), Decimal('0.00'))
+
+
+def ler_linhas(form, campo_ids, campo_qtd):
+    # pares (id, quantidade) dos campos repetidos do formulário; ignora linhas vazias
+    ids = form.getlist(campo_ids)
+    qtds = form.getlist(campo_qtd)
+    pares = []
+    for i, id_item in enumerate(ids):
+        if not id_item:
+            continue
+        qtd = qtds[i] if i < len(qtds) and qtds[i] else 1
+        pares.append((int(id_item), int(qtd)))
+    return pares
+
+
+def _precos(catalogo, ids):
+    if not ids:
+        return {}
+    por_id = catalogo().por_id
+    return {i: Decimal(por_id[i].preco) for i in ids if i in por_id}
+
+
+def _montar(pares, precos, fixos, rotulo):
+    linhas = []
+    for id_item, quantidade in pares:
+        if quantidade <= 0:
+            raise ValueError(f"Quantidade inválida para {rotulo} {id_item}.")
+        preco = fixos.get(id_item, precos.get(id_item))
+        if preco is None:
+            raise ValueError(f"{rotulo} {id_item} não encontrado(a).")
+        preco = Decimal(preco).quantize(CENTAVOS)
+        linhas.append(Linha(id_item, quantidade, preco, (preco * quantidade).quantize(CENTAVOS)))
+    return tuple(linhas)
+
+
+def precificar(servicos, pecas, precos_servicos=None, precos_pecas=None):
+    # `servicos`/`pecas`: listas de (id, quantidade).
+    # `precos_*`: preços já praticados na OS (edição) — têm prioridade sobre o catálogo,
+    # para que editar uma ordem não reprecifique linhas antigas.
+    precos_servicos = precos_servicos or {}
+    precos_pecas = precos_pecas or {}
+    faltam_s = {i for i, _ in servicos if i not in precos_servicos}
+    faltam_p = {i for i, _ in pecas if i not in precos_pecas}
+    catalogo_s = _precos(catalogos.servicos, faltam_s)
+    catalogo_p = _precos(catalogos.pecas, faltam_p)
+    return LinhasOrdem(
+        servicos=_montar(servicos, catalogo_s, precos_servicos, 'Serviço'),
+        pecas=_montar(pecas, catalogo_p, precos_pecas, 'Peça'),
+    )
+
+
+def consultas_precos_praticados(id_ordem):
+    return (select(ItemOrdemServico.id_servico, ItemOrdemServico.preco_unitario)
+            .where(ItemOrdemServico.id_ordem_servico == id_ordem),
+            select(PecaOrdemServico.id_peca, PecaOrdemServico.preco_unitario)
+            .where(PecaOrdemServico.id_ordem_servico == id_ordem))
+
+
+def precos_praticados(id_ordem):
+    # preço unitário atual de cada serviço/peça já lançado na OS
+    servicos, pecas = consultas_precos_praticados(id_ordem)
+    return dict(db.session.execute(servicos).all()), dict(db.session.execute(pecas).all())
+
+
+def gravar_linhas(id_ordem, linhas, substituir=False):
+    # grava as linhas da OS em lote; com `substituir`, apaga as anteriores antes
+    if substituir:
+        db.session.execute(delete(ItemOrdemServico).where(ItemOrdemServico.id_ordem_servico == id_ordem),
+                           execution_options={'synchronize_session': False})
+        db.session.execute(delete(PecaOrdemServico).where(PecaOrdemServico.id_ordem_servico == id_ordem),
+                           execution_options={'synchronize_session': False})
+    if linhas.servicos:
+        db.session.execute(insert(ItemOrdemServico), [
+            {'id_ordem_servico': id_ordem, 'id_servico': l.id_item, 'quantidade': l.quantidade,
+             'preco_unitario': l.preco_unitario, 'valor_total': l.valor_total}
+            for l in linhas.servicos
+        ])
+    if linhas.pecas:
+        db.session.execute(insert(PecaOrdemServico), [
+            {'id_ordem_servico': id_ordem, 'id_peca': l.id_item, 'quantidade': l.quantidade,
+             'preco_unitario': l.preco_unitario, 'valor_total': l.valor_total}
+            for l in linhas.pecas
+        ])
+    # INSERT/DELETE em lote não disparam eventos do mapper
+    relatorios_cache.invalidar_na_sessao(db.session)
+    analise_cache.invalidar_na_sessao(db.session)
+    return linhas.total
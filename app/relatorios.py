@@ -0,0 +1,174 @@
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, func, extract, literal, union_all, case
+from app import db
+from app.cache import SnapshotCache, invalidar_em_escritas
+from app.models import Mecanico, Servico, Peca, OrdemDeServico, ItemOrdemServico, PecaOrdemServico
+
+#================================
+# RELATÓRIOS DE FATURAMENTO
+#================================
+
+# Toda a agregação é feita no banco (GROUP BY + funções de janela); o Python só
+# recebe as linhas já somadas. Os resultados ficam em cache por (relatório, período)
+# até a próxima escrita em ordens, linhas de OS ou nos cadastros referenciados.
+
+relatorios_cache = SnapshotCache('relatorios', ttl=300, max_itens=64)
+invalidar_em_escritas(relatorios_cache,
+                      (OrdemDeServico, ItemOrdemServico, PecaOrdemServico, Mecanico, Servico, Peca))
+
+
+@dataclass(frozen=True)
+class Periodo:
+    inicio: date
+    fim: date
+
+    @classmethod
+    def ler(cls, inicio=None, fim=None, hoje=None):
+        # padrão: últimos 12 meses até hoje; datas inválidas caem no padrão
+        hoje = hoje or datetime.now().date()
+        fim = _data(fim) or hoje
+        inicio = _data(inicio) or date(fim.year - 1, fim.month, 1)
+        if inicio > fim:
+            inicio, fim = fim, inicio
+        return cls(inicio, fim)
+
+    def filtro(self, coluna):
+        # intervalo semiaberto [inicio, fim + 1 dia) — usa índice em data_abertura
+        return (coluna >= datetime.combine(self.inicio, datetime.min.time()),
+                coluna < datetime.combine(self.fim + timedelta(days=1), datetime.min.time()))
+
+
+def _data(valor):
+    if not valor:
+        return None
+    if isinstance(valor, date):
+        return valor
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        return None
+
+
+def _linhas_da_ordem():
+    # serviços e peças de todas as OS como um único conjunto (id_ordem, tipo, valor)
+    return union_all(
+        select(ItemOrdemServico.id_ordem_servico.label('id_ordem'),
+               literal('servico').label('tipo'),
+               ItemOrdemServico.valor_total.label('valor')),
+        select(PecaOrdemServico.id_ordem_servico,
+               literal('peca'),
+               PecaOrdemServico.valor_total),
+    ).subquery('linhas')
+
+
+def _dicts(resultado):
+    return tuple(dict(linha._mapping) for linha in resultado)
+
+
+def consulta_receita_por_mes(periodo):
+    linhas = _linhas_da_ordem()
+    ano = extract('year', OrdemDeServico.data_abertura)
+    mes = extract('month', OrdemDeServico.data_abertura)
+    total = func.sum(linhas.c.valor)
+    consulta = (
+        select(
+            ano.label('ano'),
+            mes.label('mes'),
+            func.count(func.distinct(OrdemDeServico.id_ordem_servico)).label('ordens'),
+            func.sum(case((linhas.c.tipo == 'servico', linhas.c.valor), else_=0)).label('servicos'),
+            func.sum(case((linhas.c.tipo == 'peca', linhas.c.valor), else_=0)).label('pecas'),
+            total.label('total'),
+            func.sum(total).over(order_by=(ano, mes)).label('acumulado'),
+        )
+        .select_from(linhas)
+        .join(OrdemDeServico, OrdemDeServico.id_ordem_servico == linhas.c.id_ordem)
+        .where(*periodo.filtro(OrdemDeServico.data_abertura))
+        .group_by(ano, mes)
+        .order_by(ano, mes)
+    )
+    return consulta
+
+
+def consulta_receita_por_mecanico(periodo):
+    linhas = _linhas_da_ordem()
+    total = func.sum(linhas.c.valor)
+    consulta = (
+        select(
+            Mecanico.id_mecanico,
+            Mecanico.nome,
+            func.count(func.distinct(OrdemDeServico.id_ordem_servico)).label('ordens'),
+            total.label('total'),
+            (total * 100.0 / func.nullif(func.sum(total).over(), 0)).label('participacao'),
+            func.rank().over(order_by=total.desc()).label('posicao'),
+        )
+        .select_from(linhas)
+        .join(OrdemDeServico, OrdemDeServico.id_ordem_servico == linhas.c.id_ordem)
+        .join(Mecanico, Mecanico.id_mecanico == OrdemDeServico.id_mecanico)
+        .where(*periodo.filtro(OrdemDeServico.data_abertura))
+        .group_by(Mecanico.id_mecanico, Mecanico.nome)
+        .order_by(total.desc())
+    )
+    return consulta
+
+
+def consulta_receita_por_servico(periodo):
+    total = func.sum(ItemOrdemServico.valor_total)
+    consulta = (
+        select(
+            Servico.id_servico,
+            Servico.nome_servico,
+            func.sum(ItemOrdemServico.quantidade).label('quantidade'),
+            total.label('total'),
+            (total * 100.0 / func.nullif(func.sum(total).over(), 0)).label('participacao'),
+            func.rank().over(order_by=total.desc()).label('posicao'),
+        )
+        .join(OrdemDeServico, OrdemDeServico.id_ordem_servico == ItemOrdemServico.id_ordem_servico)
+        .join(Servico, Servico.id_servico == ItemOrdemServico.id_servico)
+        .where(*periodo.filtro(OrdemDeServico.data_abertura))
+        .group_by(Servico.id_servico, Servico.nome_servico)
+        .order_by(total.desc())
+    )
+    return consulta
+
+
+def consulta_receita_por_peca(periodo):
+    total = func.sum(PecaOrdemServico.valor_total)
+    custo = func.sum(PecaOrdemServico.quantidade * Peca.preco_custo)
+    consulta = (
+        select(
+            Peca.id_peca,
+            Peca.nome_peca,
+            func.sum(PecaOrdemServico.quantidade).label('quantidade'),
+            total.label('total'),
+            custo.label('custo'),
+            (total - custo).label('margem'),
+            func.rank().over(order_by=total.desc()).label('posicao'),
+        )
+        .join(OrdemDeServico, OrdemDeServico.id_ordem_servico == PecaOrdemServico.id_ordem_servico)
+        .join(Peca, Peca.id_peca == PecaOrdemServico.id_peca)
+        .where(*periodo.filtro(OrdemDeServico.data_abertura))
+        .group_by(Peca.id_peca, Peca.nome_peca)
+        .order_by(total.desc())
+    )
+    return consulta
+
+
+# consultas separadas da execução: planos.py confere o EXPLAIN das mesmas
+CONSULTAS = {
+    'mensal': consulta_receita_por_mes,
+    'mecanicos': consulta_receita_por_mecanico,
+    'servicos': consulta_receita_por_servico,
+    'pecas': consulta_receita_por_peca,
+}
+
+
+def _relatorio(consulta):
+    return lambda periodo: _dicts(db.session.execute(consulta(periodo)))
+
+
+RELATORIOS = {nome: _relatorio(consulta) for nome, consulta in CONSULTAS.items()}
+
+
+def gerar(nome, periodo):
+    return relatorios_cache.get_or_set((nome, periodo), lambda: RELATORIOS[nome](periodo))
@@ -0,0 +1,182 @@
+import itertools
+import threading
+import time
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DBAPIError
+
+#================================
+# RÉPLICAS DE LEITURA
+#================================
+
+# Rotas somente leitura (dashboard, listagens, relatórios, API) fazem os SELECTs
+# numa réplica configurada em DATABASE_REPLICA_URLS; o resto vai para o primário.
+# - Cada requisição escolhe uma réplica (rodízio) e fica nela até o fim.
+# - Depois de uma requisição que gravou algo (commit com flush ou UPDATE/DELETE/
+#   INSERT pela sessão, qualquer que seja o método HTTP, como as exclusões por
+#   GET) o navegador fica preso ao primário por REPLICA_ADERENCIA segundos, para
+#   que o redirect mostre o que acabou de gravar.
+# - A réplica é testada na primeira consulta da requisição, no máximo uma vez a
+#   cada REPLICA_VERIFICACAO segundos por worker; se não responder, fica fora por
+#   REPLICA_PAUSA segundos e a requisição usa o primário. Uma conexão perdida no
+#   meio de uma consulta também a tira do rodízio (a requisição em curso falha).
+# - Os caches (cache.py) não guardam o que foi calculado numa réplica nos
+#   REPLICA_ADERENCIA segundos após uma invalidação (a réplica pode estar atrasada).
+# - Escritas, flush e consultas fora de requisição (CLI) sempre vão ao primário.
+# Para testar localmente basta apontar DATABASE_REPLICA_URLS para uma cópia do
+# arquivo SQLite (ou um segundo PostgreSQL).
+
+ROTAS_LEITURA = {
+    'home', 'relatorios',
+    'clientes_listar', 'veiculos_listar', 'mecanicos_listar', 'servicos_listar',
+    'pecas_listar', 'pecas_reposicao', 'agendamentos_listar', 'ordens_listar',
+}
+BLUEPRINTS_LEITURA = {'api'}
+CHAVE_ADERENCIA = 'primario_ate'
+CHAVE_ESCRITA = 'replicas.escrita'
+
+
+class Replicas:
+
+    def __init__(self, engines, pausa, verificacao, logger):
+        self.engines = engines
+        self.pausa = pausa
+        self.verificacao = verificacao
+        self.logger = logger
+        self._fora_ate = {}
+        self._ok_ate = {}
+        self._rodizio = itertools.count()
+        self._lock = threading.Lock()
+        for engine in engines:
+            event.listen(engine, 'handle_error', self._erro)
+
+    def candidatas(self):
+        agora = time.monotonic()
+        with self._lock:
+            ativas = [e for e in self.engines if self._fora_ate.get(e, 0) <= agora]
+            if not ativas:
+                return []
+            inicio = next(self._rodizio) % len(ativas)
+        return ativas[inicio:] + ativas[:inicio]
+
+    def disponivel(self, engine):
+        agora = time.monotonic()
+        with self._lock:
+            if self._ok_ate.get(engine, 0) > agora:
+                return True
+        try:
+            with engine.connect():
+                pass
+        except DBAPIError:
+            self.tirar(engine)
+            return False
+        with self._lock:
+            self._ok_ate[engine] = agora + self.verificacao
+        return True
+
+    def tirar(self, engine):
+        self.logger.warning('Réplica %s indisponível; usando o primário', engine.url.host or engine.url.database)
+        with self._lock:
+            self._fora_ate[engine] = time.monotonic() + self.pausa
+            self._ok_ate.pop(engine, None)
+
+    def _erro(self, contexto):
+        # queda da conexão (ou falha ao abrir uma) fora da verificação; o pre-ping
+        # do pool já reconecta sozinho
+        if contexto.is_pre_ping:
+            return
+        if contexto.is_disconnect or contexto.connection is None:
+            self.tirar(contexto.engine)
+
+    def escolher(self):
+        for engine in self.candidatas():
+            if self.disponivel(engine):
+                return engine
+        return None
+
+    def stats(self):
+        agora = time.monotonic()
+        with self._lock:
+            return [{'url': e.url.render_as_string(hide_password=True),
+                     'fora_por_s': round(max(self._fora_ate.get(e, 0) - agora, 0), 1)}
+                    for e in self.engines]
+
+
+def _rota_de_leitura():
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.endpoint in ROTAS_LEITURA or request.blueprint in BLUEPRINTS_LEITURA:
+        return session.get(CHAVE_ADERENCIA, 0) < time.time()
+    return False
+
+
+def replica_da_requisicao():
+    # engine da réplica desta requisição, ou None para usar o primário
+    if not has_request_context():
+        return None
+    if 'replica' not in g:
+        replicas = current_app.extensions.get('replicas')
+        g.replica = replicas.escolher() if replicas and _rota_de_leitura() else None
+    return g.replica
+
+
+def atraso_da_replica():
+    # segundos em que a réplica usada nesta requisição pode não ter as últimas escritas
+    if has_request_context() and g.get('replica') is not None:
+        return current_app.config.get('REPLICA_ADERENCIA', 5)
+    return 0
+
+
+class SessaoRoteada(Session):
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and getattr(clause, 'is_select', False):
+            replica = replica_da_requisicao()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(SessaoRoteada, 'after_flush')
+def _flush(sessao, contexto):
+    sessao.info[CHAVE_ESCRITA] = True
+
+
+@event.listens_for(SessaoRoteada, 'do_orm_execute')
+def _dml(estado):
+    if estado.is_insert or estado.is_update or estado.is_delete:
+        estado.session.info[CHAVE_ESCRITA] = True
+
+
+@event.listens_for(SessaoRoteada, 'after_commit')
+def _commit(sessao):
+    # no environ e não em g: as exclusões abrem outro app_context (e outro g)
+    if sessao.info.pop(CHAVE_ESCRITA, False) and has_request_context():
+        request.environ[CHAVE_ESCRITA] = True
+
+
+@event.listens_for(SessaoRoteada, 'after_rollback')
+def _rollback(sessao):
+    sessao.info.pop(CHAVE_ESCRITA, None)
+
+
+def init_app(app):
+    from app import conexoes
+
+    urls = [u.strip() for u in (app.config.get('DATABASE_REPLICA_URLS') or '').split(',') if u.strip()]
+    if not urls:
+        return
+    engines = []
+    for url in urls:
+        engine = create_engine(url, **conexoes.opcoes_engine({**app.config, 'SQLALCHEMY_DATABASE_URI': url}))
+        conexoes.init_app(app, engine)
+        engines.append(engine)
+    app.extensions['replicas'] = Replicas(engines, app.config.get('REPLICA_PAUSA', 30),
+                                          app.config.get('REPLICA_VERIFICACAO', 5), app.logger)
+
+    @app.after_request
+    def _aderir_ao_primario(resposta):
+        if request.environ.get(CHAVE_ESCRITA):
+            session[CHAVE_ADERENCIA] = time.time() + app.config.get('REPLICA_ADERENCIA', 5)
+        return resposta
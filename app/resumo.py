@@ -0,0 +1,237 @@
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+import click
+from flask import current_app, has_app_context
+from sqlalchemy import event, select, delete, insert, func, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from app import db
+from app.models import Agendamento, OrdemDeServico, ResumoDiario
+
+#================================
+# RESUMO DIÁRIO (ROLLUP) DE ORDENS E AGENDAMENTOS
+#================================
+
+# resumo_diario guarda, por (dia, mecânico): ordens abertas, ordens concluídas,
+# receita (valor_total das ordens abertas no dia) e agendamentos.
+# A cada flush que mexe em OrdemDeServico/Agendamento, a contribuição antiga de cada
+# objeto é descontada e a nova somada, e só essas diferenças são aplicadas na mesma
+# transação com INSERT ... ON CONFLICT (dia, id_mecanico) DO UPDATE SET col = col + excluded.col.
+# Assim duas transações que mexem no mesmo (dia, mecânico) não se atropelam: a segunda
+# espera o commit da primeira e soma por cima (linhas em ordem de chave, sem deadlock).
+# Ligado por RESUMO_DIARIO=1, depois de rodar `flask resumo-backfill`.
+
+_PENDENTE = 'resumo_diario_pendente'
+COLUNAS = ('ordens_abertas', 'ordens_concluidas', 'receita', 'agendamentos')
+
+
+def ativo():
+    return has_app_context() and current_app.config.get('RESUMO_DIARIO', False)
+
+
+def _dia(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return date.fromisoformat(str(valor)[:10])
+
+
+def _valor(obj, atributo, anterior):
+    if not anterior:
+        return getattr(obj, atributo)
+    historico = get_history(obj, atributo)
+    if historico.deleted:
+        return historico.deleted[0]
+    if historico.unchanged:
+        return historico.unchanged[0]
+    return None
+
+
+def _contribuicao(obj, anterior=False):
+    # quanto o objeto soma no resumo: {(dia, id_mecanico): {coluna: valor}}
+    mecanico = _valor(obj, 'id_mecanico', anterior)
+    parcelas = defaultdict(dict)
+    if mecanico is None:
+        return parcelas
+    if isinstance(obj, Agendamento):
+        dia = _dia(_valor(obj, 'data_agendamento', anterior))
+        if dia is not None:
+            parcelas[(dia, mecanico)]['agendamentos'] = 1
+        return parcelas
+    abertura = _dia(_valor(obj, 'data_abertura', anterior))
+    if abertura is not None:
+        parcelas[(abertura, mecanico)].update(ordens_abertas=1,
+                                              receita=_valor(obj, 'valor_total', anterior) or 0)
+    conclusao = _dia(_valor(obj, 'data_conclusao', anterior))
+    if conclusao is not None:
+        parcelas[(conclusao, mecanico)]['ordens_concluidas'] = 1
+    return parcelas
+
+
+def _somar(diferencas, parcelas, sinal):
+    for chave, valores in parcelas.items():
+        linha = diferencas.setdefault(chave, dict.fromkeys(COLUNAS, 0))
+        for coluna, valor in valores.items():
+            linha[coluna] += sinal * valor
+
+
+def aplicar(conexao, diferencas):
+    # soma as diferenças nas linhas do resumo, criando as que faltarem
+    linhas = [{'dia': dia, 'id_mecanico': mecanico, **valores}
+              for (dia, mecanico), valores in sorted(diferencas.items()) if any(valores.values())]
+    if not linhas:
+        return
+    dialeto = postgresql if conexao.dialect.name == 'postgresql' else sqlite
+    comando = dialeto.insert(ResumoDiario)
+    conexao.execute(comando.on_conflict_do_update(
+        index_elements=[ResumoDiario.dia, ResumoDiario.id_mecanico],
+        set_={c: getattr(ResumoDiario, c) + getattr(comando.excluded, c) for c in COLUNAS}), linhas)
+
+
+def _filtro_mecanico(coluna, mecanicos):
+    return [coluna.in_(sorted(mecanicos))] if mecanicos is not None else []
+
+
+def consultas_do_periodo(inicio, fim, mecanicos=None):
+    # ordens abertas (com receita), ordens concluídas e agendamentos por (dia, mecânico)
+    # em [inicio, fim]; planos.py confere o EXPLAIN das mesmas
+    de = datetime.combine(inicio, time.min)
+    ate = datetime.combine(fim + timedelta(days=1), time.min)
+
+    dia_abertura = func.date(OrdemDeServico.data_abertura)
+    abertas = (
+        select(dia_abertura, OrdemDeServico.id_mecanico, func.count(),
+               func.coalesce(func.sum(OrdemDeServico.valor_total), 0))
+        .where(OrdemDeServico.data_abertura >= de, OrdemDeServico.data_abertura < ate,
+               *_filtro_mecanico(OrdemDeServico.id_mecanico, mecanicos))
+        .group_by(dia_abertura, OrdemDeServico.id_mecanico))
+
+    dia_conclusao = func.date(OrdemDeServico.data_conclusao)
+    concluidas = (
+        select(dia_conclusao, OrdemDeServico.id_mecanico, func.count())
+        .where(OrdemDeServico.data_conclusao >= de, OrdemDeServico.data_conclusao < ate,
+               *_filtro_mecanico(OrdemDeServico.id_mecanico, mecanicos))
+        .group_by(dia_conclusao, OrdemDeServico.id_mecanico))
+
+    agendamentos = (
+        select(Agendamento.data_agendamento, Agendamento.id_mecanico, func.count())
+        .where(Agendamento.data_agendamento >= inicio, Agendamento.data_agendamento <= fim,
+               *_filtro_mecanico(Agendamento.id_mecanico, mecanicos))
+        .group_by(Agendamento.data_agendamento, Agendamento.id_mecanico))
+    return abertas, concluidas, agendamentos
+
+
+def recalcular(conexao, inicio, fim, mecanicos=None):
+    # apaga e recalcula o resumo dos dias [inicio, fim] (opcionalmente só de alguns mecânicos)
+    abertas, concluidas, agendamentos = consultas_do_periodo(inicio, fim, mecanicos)
+    linhas = defaultdict(lambda: {'ordens_abertas': 0, 'ordens_concluidas': 0, 'receita': 0, 'agendamentos': 0})
+
+    for dia, mecanico, total, receita in conexao.execute(abertas):
+        linha = linhas[(_dia(dia), mecanico)]
+        linha['ordens_abertas'] = total
+        linha['receita'] = receita
+
+    for dia, mecanico, total in conexao.execute(concluidas):
+        linhas[(_dia(dia), mecanico)]['ordens_concluidas'] = total
+
+    for dia, mecanico, total in conexao.execute(agendamentos):
+        linhas[(_dia(dia), mecanico)]['agendamentos'] = total
+
+    conexao.execute(delete(ResumoDiario).where(
+        ResumoDiario.dia >= inicio, ResumoDiario.dia <= fim,
+        *_filtro_mecanico(ResumoDiario.id_mecanico, mecanicos)))
+    if linhas:
+        conexao.execute(insert(ResumoDiario), [
+            {'dia': dia, 'id_mecanico': mecanico, **valores}
+            for (dia, mecanico), valores in linhas.items()
+        ])
+    return len(linhas)
+
+
+# o valor antigo precisa estar carregado no momento da alteração para ser descontado
+for _atributo in (OrdemDeServico.id_mecanico, OrdemDeServico.data_abertura, OrdemDeServico.data_conclusao,
+                  OrdemDeServico.valor_total, Agendamento.id_mecanico, Agendamento.data_agendamento):
+    event.listen(_atributo, 'set', lambda *args: None, active_history=True)
+
+
+@event.listens_for(Session, 'before_flush')
+def _antes_do_flush(sessao, contexto, instancias):
+    if not ativo():
+        return
+    pendente = sessao.info.setdefault(_PENDENTE, {'diferencas': {}, 'objetos': []})
+    for obj in sessao.new:
+        if isinstance(obj, (OrdemDeServico, Agendamento)):
+            pendente['objetos'].append(obj)
+    for obj in sessao.dirty:
+        if isinstance(obj, (OrdemDeServico, Agendamento)) and sessao.is_modified(obj):
+            _somar(pendente['diferencas'], _contribuicao(obj, anterior=True), -1)
+            pendente['objetos'].append(obj)
+    for obj in sessao.deleted:
+        if isinstance(obj, (OrdemDeServico, Agendamento)):
+            _somar(pendente['diferencas'], _contribuicao(obj, anterior=True), -1)
+
+
+@event.listens_for(Session, 'after_flush')
+def _depois_do_flush(sessao, contexto):
+    pendente = sessao.info.pop(_PENDENTE, None)
+    if not pendente:
+        return
+    diferencas = pendente['diferencas']
+    for obj in pendente['objetos']:
+        if not inspect(obj).was_deleted:
+            _somar(diferencas, _contribuicao(obj), 1)
+    aplicar(sessao.connection(), diferencas)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _flush_desfeito(sessao, transacao):
+    # flush que falhou antes do after_flush: as diferenças iriam para o próximo
+    sessao.info.pop(_PENDENTE, None)
+
+
+def recalcular_periodo(inicio=None, fim=None, dias_por_lote=31, eco=None):
+    # recalcula [inicio, fim] em transações de `dias_por_lote` dias (padrão: todo o
+    # intervalo com dados); devolve as linhas gravadas, ou None se não houver dados
+    limites = db.session.execute(select(
+        select(func.min(OrdemDeServico.data_abertura)).scalar_subquery(),
+        select(func.max(OrdemDeServico.data_abertura)).scalar_subquery(),
+        select(func.max(OrdemDeServico.data_conclusao)).scalar_subquery(),
+        select(func.min(Agendamento.data_agendamento)).scalar_subquery(),
+        select(func.max(Agendamento.data_agendamento)).scalar_subquery(),
+    )).one()
+    datas = [_dia(d) for d in limites if d is not None]
+    if not datas and not (inicio and fim):
+        return None
+    inicio = _dia(inicio) if inicio else min(datas)
+    fim = _dia(fim) if fim else max(datas)
+
+    dia = inicio
+    total = 0
+    while dia <= fim:
+        ultimo = min(dia + timedelta(days=dias_por_lote - 1), fim)
+        total += recalcular(db.session.connection(), dia, ultimo)
+        db.session.commit()
+        if eco:
+            eco(f'{dia} a {ultimo}: ok')
+        dia = ultimo + timedelta(days=1)
+    return total
+
+
+def init_app(app):
+
+    @app.cli.command('resumo-backfill')
+    @click.option('--inicio', help='Primeiro dia (AAAA-MM-DD); padrão: data mais antiga no banco.')
+    @click.option('--fim', help='Último dia (AAAA-MM-DD); padrão: data mais recente no banco.')
+    @click.option('--dias-por-lote', default=31, show_default=True, help='Dias recalculados por transação.')
+    def resumo_backfill(inicio, fim, dias_por_lote):
+        """Cria (se preciso) e recalcula a tabela resumo_diario."""
+        ResumoDiario.__table__.create(db.engine, checkfirst=True)
+        total = recalcular_periodo(inicio, fim, dias_por_lote, eco=click.echo)
+        if total is None:
+            click.echo('Nenhuma ordem ou agendamento para resumir.')
+            return
+        click.echo(f'{total} linha(s) de resumo gravadas.')
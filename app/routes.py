@@ -1,137 +1,126 @@
-from flask import render_template, request, redirect, url_for, flash, current_app, send_from_directory
+from flask import render_template, request, redirect, url_for, flash, current_app, jsonify, abort, Response, stream_with_context
 from app import db
 from app.models import Cliente, Veiculo, Mecanico, Servico, Peca, Agendamento, OrdemDeServico, ItemOrdemServico, PecaOrdemServico
+from app.paginacao import paginar_listagem
+from app.carregamento import carregar
+from app import estoque, agenda, conexoes, catalogos
+from app.precificacao import ler_linhas, precificar, precos_praticados, gravar_linhas
+from app.analise import AnaliseCarga, analisar_em_cache
+from app.relatorios import RELATORIOS, Periodo, gerar as gerar_relatorio
+from app.autocompletar import (FONTES as FONTES_AUTOCOMPLETAR, LIMITE as LIMITE_AUTOCOMPLETAR,
+                              buscar as buscar_opcoes, selecionado, selecionados_das_linhas)
+from app.busca import buscar, LIMITE as LIMITE_BUSCA
+from app.importacao import IMPORTADORES, importar
+from app.exportacao import EXPORTACOES, XLSX, gerar_csv, gerar_xlsx
+from app.dashboard import DashboardStats, estatisticas_em_cache, dashboard_cache
 from datetime import datetime
-from sqlalchemy.orm import joinedload
-from sqlalchemy import cast, Date, extract
+import io
 
 #================================
 # ROTAS DA APLICAÇÃO
 #================================
 
+# ordenações aceitas em ?ordem= por listagem e a padrão (planos.py confere o
+# EXPLAIN da padrão)
+ORDENACOES = {
+    'clientes_listar': ({
+        'nome': (Cliente.nome,),
+        'cpf': (Cliente.cpf,),
+        'cadastro': (Cliente.data_cadastro,),
+    }, 'nome'),
+    'veiculos_listar': ({
+        'placa': (Veiculo.placa,),
+        'modelo': (Veiculo.modelo,),
+        'marca': (Veiculo.marca,),
+        'ano': (Veiculo.ano,),
+    }, 'placa'),
+    'mecanicos_listar': ({
+        'nome': (Mecanico.nome,),
+        'admissao': (Mecanico.data_admissao,),
+    }, 'nome'),
+    'servicos_listar': ({
+        'nome': (Servico.nome_servico,),
+        'preco': (Servico.preco_base,),
+    }, 'nome'),
+    'pecas_listar': ({
+        'nome': (Peca.nome_peca,),
+        'preco': (Peca.preco_venda,),
+        'estoque': (Peca.estoque_atual,),
+    }, 'nome'),
+    'pecas_reposicao': ({
+        'nome': (Peca.nome_peca,),
+    }, 'nome'),
+    'agendamentos_listar': ({
+        'data': (Agendamento.data_agendamento, Agendamento.hora_agendamento),
+        'status': (Agendamento.status,),
+    }, '-data'),
+    'ordens_listar': ({
+        'abertura': (OrdemDeServico.data_abertura,),
+        'numero': (OrdemDeServico.numero_os,),
+        'status': (OrdemDeServico.status,),
+    }, '-abertura'),
+}
+
+
 def init_app(app):
 
-    @app.route('/sw.js')
-    def service_worker():
-        # serve the static/sw.js at site root so the SW scope can be '/'
-        return send_from_directory(current_app.static_folder, 'sw.js')
+    dashboard_cache.configurar(ttl=app.config.get('DASHBOARD_CACHE_TTL'),
+                               max_itens=app.config.get('DASHBOARD_CACHE_MAX'))
 
     @app.route('/')
     @app.route('/dashboard')
     def home():
         try:
-            hoje = datetime.now().date()
-
-            # Próximos agendamentos (data >= hoje)
-            proximos_agendamentos = db.session.query(Agendamento).options(
-                joinedload(Agendamento.veiculo).joinedload(Veiculo.cliente),
-                joinedload(Agendamento.mecanico)
-            ).filter(
-                Agendamento.data_agendamento >= hoje
-            ).order_by(
-                Agendamento.data_agendamento, Agendamento.hora_agendamento
-            ).limit(5).all()
-
-            # Ordens em andamento (status relevantes)
-            ordens_andamento = db.session.query(OrdemDeServico).options(
-                joinedload(OrdemDeServico.veiculo).joinedload(Veiculo.cliente),
-                joinedload(OrdemDeServico.mecanico)
-            ).filter(
-                OrdemDeServico.status.in_(['Em Andamento', 'Pendente'])
-            ).order_by(
-                OrdemDeServico.data_abertura.desc()
-            ).limit(5).all()
-
-            # contagens para os cards
-            c = db.session.query(Cliente).count()
-            v = db.session.query(Veiculo).count()
-            m = db.session.query(Mecanico).count()
-            s = db.session.query(Servico).count()
-            p = db.session.query(Peca).count()
-            a = db.session.query(Agendamento).count()
-            o = db.session.query(OrdemDeServico).count()
-
-            # Séries mensais (últimos 6 meses) — contagem de ordens e agendamentos
-            months = []
-            orders_series = []
-            agend_series = []
-            today = datetime.now().date()
-
-            # Estabelece o mês final como o maior entre hoje e as últimas datas presentes no banco
-            latest_ordem = db.session.query(OrdemDeServico).order_by(OrdemDeServico.data_abertura.desc()).first()
-            latest_agend = db.session.query(Agendamento).order_by(Agendamento.data_agendamento.desc()).first()
-
-            end_date = today
-            if latest_ordem and latest_ordem.data_abertura:
-                d = latest_ordem.data_abertura
-                if isinstance(d, datetime):
-                    d = d.date()
-                if d > end_date:
-                    end_date = d
-            if latest_agend and latest_agend.data_agendamento:
-                d = latest_agend.data_agendamento
-                if isinstance(d, datetime):
-                    d = d.date()
-                if d > end_date:
-                    end_date = d
-
-            year = end_date.year
-            month = end_date.month
-
-            def month_start_end(y, m):
-                start = datetime(y, m, 1).date()
-                if m == 12:
-                    end = datetime(y + 1, 1, 1).date()
-                else:
-                    end = datetime(y, m + 1, 1).date()
-                return start, end
-
-            # gerar últimos 6 meses (do mais antigo ao mais recente)
-            for i in range(5, -1, -1):
-                ym = month - i
-                yy = year
-                # ajustar ano/mês quando menor que 1
-                while ym <= 0:
-                    ym += 12
-                    yy -= 1
-                start, end = month_start_end(yy, ym)
-                label = f"{start.strftime('%b %Y')}"
-                months.append(label)
-
-                # contar ordens usando year/month (mais resiliente a tipos datetime/timestamp)
-                orders_count = db.session.query(OrdemDeServico).filter(
-                    extract('year', OrdemDeServico.data_abertura) == yy,
-                    extract('month', OrdemDeServico.data_abertura) == ym
-                ).count()
-
-                agend_count = db.session.query(Agendamento).filter(
-                    extract('year', Agendamento.data_agendamento) == yy,
-                    extract('month', Agendamento.data_agendamento) == ym
-                ).count()
-
-                orders_series.append(orders_count)
-                agend_series.append(agend_count)
-
-            # DEBUG: logar meses e séries para confirmar o que será renderizado
-            print("DEBUG dashboard months:", months)
-            print("DEBUG orders_series:", orders_series)
-            print("DEBUG agend_series:", agend_series)
- 
-            return render_template('dashboard.html',
-                                    clientes=c, veiculos=v, mecanicos=m,
-                                    servicos=s, pecas=p, agendamentos=a, ordens=o,
-                                    proximos_agendamentos=proximos_agendamentos,
-                                    ordens_andamento=ordens_andamento,
-                                    months_labels=months,
-                                    orders_series=orders_series,
-                                    agend_series=agend_series)
-        except Exception as e:
-            print("Erro na dashboard:", e)
-            return render_template('dashboard.html',
-                                    clientes=0, veiculos=0, mecanicos=0,
-                                    servicos=0, pecas=0, agendamentos=0, ordens=0,
-                                    proximos_agendamentos=[], ordens_andamento=[],
-                                    months_labels=[], orders_series=[], agend_series=[])
+            # contagens, séries mensais (últimos 6 meses) e as duas listas, servidas
+            # do cache em memória até a próxima escrita nos modelos ou o fim do TTL
+            painel = estatisticas_em_cache(datetime.now().date())
+            return render_template('dashboard.html', **painel.contexto())
+        except Exception:
+            current_app.logger.exception('Erro na dashboard')
+            return render_template('dashboard.html', **DashboardStats().contexto())
+
+    @app.route('/dashboard/cache')
+    def dashboard_cache_stats():
+        # contadores de hit/miss do snapshot da dashboard (deste worker)
+        return jsonify(dashboard_cache.stats())
+
+    @app.route('/sistema/catalogos')
+    def catalogos_stats():
+        # versão e recargas dos snapshots de catálogos deste worker
+        return jsonify([c.stats() for c in catalogos.CATALOGOS.values()])
+
+    @app.route('/sistema/pool')
+    def pool_stats():
+        # conexões em uso e espera por conexão no pool deste worker
+        dados = conexoes.estatisticas(db.engine)
+        replicas = current_app.extensions.get('replicas')
+        if replicas:
+            dados['replicas'] = [{**r, **conexoes.estatisticas(e)}
+                                 for r, e in zip(replicas.stats(), replicas.engines)]
+        return jsonify(dados)
+
+    #================================
+    # BUSCA RÁPIDA
+    #================================
+
+    @app.route('/busca')
+    def busca():
+        tipos = request.args.get('tipos')
+        resultados = buscar(request.args.get('q'),
+                            tipos=tipos.split(',') if tipos else None,
+                            limite=request.args.get('limite', LIMITE_BUSCA, type=int))
+        return jsonify({'q': request.args.get('q', ''), 'resultados': resultados})
+
+    #================================
+    # AUTOCOMPLETAR
+    #================================
+
+    @app.route('/autocompletar/<tipo>')
+    def autocompletar(tipo):
+        if tipo not in FONTES_AUTOCOMPLETAR:
+            abort(404)
+        return jsonify(buscar_opcoes(tipo, request.args.get('q'),
+                                     limite=request.args.get('limite', LIMITE_AUTOCOMPLETAR, type=int)))
 
     #================================
     # CLIENTES
@@ -139,8 +128,8 @@ def init_app(app):
 
     @app.route('/clientes')
     def clientes_listar():
-        clientes = Cliente.query.order_by(Cliente.nome).all()
-        return render_template('cliente/listar.html', clientes=clientes)
+        pagina = paginar_listagem(carregar(Cliente.query), *ORDENACOES['clientes_listar'])
+        return render_template('cliente/listar.html', clientes=pagina.itens, pagina=pagina)
 
     @app.route('/clientes/criar', methods=['GET', 'POST'])
     def clientes_criar():
@@ -168,7 +157,7 @@ def init_app(app):
 
     @app.route('/clientes/editar/<int:id>', methods=['GET', 'POST'])
     def clientes_editar(id):
-        cliente = Cliente.query.get_or_404(id)
+        cliente = carregar(Cliente.query).get_or_404(id)
         if request.method == 'POST':
             cliente.nome = request.form.get('nome')
             cliente.cpf = request.form.get('cpf')
@@ -214,14 +203,11 @@ def init_app(app):
 
     @app.route('/veiculos')
     def veiculos_listar():
-        veiculos = Veiculo.query.order_by(Veiculo.placa).all()
-        return render_template('veiculo/listar.html', veiculos=veiculos)
+        pagina = paginar_listagem(carregar(Veiculo.query), *ORDENACOES['veiculos_listar'])
+        return render_template('veiculo/listar.html', veiculos=pagina.itens, pagina=pagina)
 
     @app.route('/veiculos/criar', methods=['GET', 'POST'])
     def veiculos_criar():
-        with app.app_context():
-            clientes = db.session.query(Cliente).all()
-            
         if request.method == 'POST':
             try:
                 with app.app_context():
@@ -242,11 +228,11 @@ def init_app(app):
                 db.session.rollback()
                 flash(f"Erro ao cadastrar veículo: {str(e)}", "danger")
         
-        return render_template('veiculo/criar.html', clientes=clientes)
+        return render_template('veiculo/criar.html')
 
     @app.route('/veiculos/editar/<int:id>', methods=['GET', 'POST'])
     def veiculos_editar(id):
-        veiculo = Veiculo.query.get_or_404(id)
+        veiculo = carregar(Veiculo.query).get_or_404(id)
         if request.method == 'POST':
             veiculo.placa = request.form.get('placa')
             veiculo.marca = request.form.get('marca')
@@ -263,8 +249,8 @@ def init_app(app):
                 current_app.logger.exception('Erro ao atualizar veículo')
                 flash('Erro ao salvar.', 'danger')
             return redirect(url_for('veiculos_listar'))
-        clientes = Cliente.query.order_by(Cliente.nome).all()
-        return render_template('veiculo/editar.html', veiculo=veiculo, clientes=clientes)
+        selecionados = {'id_cliente': selecionado('clientes', veiculo.id_cliente)}
+        return render_template('veiculo/editar.html', veiculo=veiculo, selecionados=selecionados)
 
     @app.route('/veiculos/excluir/<int:id>')
     def veiculos_excluir(id):
@@ -289,9 +275,8 @@ def init_app(app):
 
     @app.route('/mecanicos')
     def mecanicos_listar():
-        with app.app_context():
-            mecanicos = db.session.query(Mecanico).all()
-        return render_template('mecanico/listar.html', mecanicos=mecanicos)
+        pagina = paginar_listagem(carregar(db.session.query(Mecanico)), *ORDENACOES['mecanicos_listar'])
+        return render_template('mecanico/listar.html', mecanicos=pagina.itens, pagina=pagina)
 
     @app.route('/mecanicos/criar', methods=['GET', 'POST'])
     def mecanicos_criar():
@@ -318,7 +303,7 @@ def init_app(app):
     @app.route('/mecanicos/editar/<int:id>', methods=['GET', 'POST'])
     def mecanicos_editar(id):
         # carregar objeto diretamente (GET ou POST)
-        mecanico = Mecanico.query.get_or_404(id)
+        mecanico = carregar(Mecanico.query).get_or_404(id)
 
         if request.method == 'POST':
             try:
@@ -363,9 +348,8 @@ def init_app(app):
 
     @app.route('/servicos')
     def servicos_listar():
-        with app.app_context():
-            servicos = db.session.query(Servico).all()
-        return render_template('servico/listar.html', servicos=servicos)
+        pagina = paginar_listagem(carregar(db.session.query(Servico)), *ORDENACOES['servicos_listar'])
+        return render_template('servico/listar.html', servicos=pagina.itens, pagina=pagina)
 
     @app.route('/servicos/criar', methods=['GET', 'POST'])
     def servicos_criar():
@@ -390,7 +374,7 @@ def init_app(app):
 
     @app.route('/servicos/editar/<int:id>', methods=['GET', 'POST'])
     def servicos_editar(id):
-        servico = Servico.query.get_or_404(id)
+        servico = carregar(Servico.query).get_or_404(id)
 
         if request.method == 'POST':
             try:
@@ -434,8 +418,14 @@ def init_app(app):
     @app.route('/pecas')
     def pecas_listar():
         # lista sempre atualizada direto do DB
-        pecas = Peca.query.order_by(Peca.nome_peca).all()
-        return render_template('peca/listar.html', pecas=pecas)
+        pagina = paginar_listagem(carregar(Peca.query), *ORDENACOES['pecas_listar'])
+        return render_template('peca/listar.html', pecas=pagina.itens, pagina=pagina)
+
+    @app.route('/pecas/reposicao')
+    def pecas_reposicao():
+        # só as peças abaixo do estoque mínimo (índice parcial ix_peca_reposicao)
+        pagina = paginar_listagem(carregar(Peca.query.filter(estoque.abaixo_do_minimo())), *ORDENACOES['pecas_reposicao'])
+        return render_template('peca/reposicao.html', pecas=pagina.itens, pagina=pagina)
 
     @app.route('/pecas/criar', methods=['GET', 'POST'])
     def pecas_criar():
@@ -462,7 +452,7 @@ def init_app(app):
 
     @app.route('/pecas/editar/<int:id>', methods=['GET', 'POST'])
     def pecas_editar(id):
-        peca = Peca.query.get_or_404(id)
+        peca = carregar(Peca.query).get_or_404(id)
 
         if request.method == 'POST':
             try:
@@ -511,15 +501,11 @@ def init_app(app):
 
     @app.route('/agendamentos')
     def agendamentos_listar():
-        agendamentos = Agendamento.query.order_by(Agendamento.data_agendamento.desc(), Agendamento.hora_agendamento.desc()).all()
-        return render_template('agendamento/listar.html', agendamentos=agendamentos)
+        pagina = paginar_listagem(carregar(Agendamento.query), *ORDENACOES['agendamentos_listar'])
+        return render_template('agendamento/listar.html', agendamentos=pagina.itens, pagina=pagina)
 
     @app.route('/agendamentos/criar', methods=['GET', 'POST'])
     def agendamentos_criar():
-        with app.app_context():
-            veiculos = db.session.query(Veiculo).all()
-            mecanicos = db.session.query(Mecanico).all()
-            
         if request.method == 'POST':
             try:
                 with app.app_context():
@@ -529,8 +515,11 @@ def init_app(app):
                         status=request.form['status'],
                         observacoes=request.form.get('observacoes'),
                         id_veiculo=int(request.form['id_veiculo']),
-                        id_mecanico=int(request.form['id_mecanico'])
+                        id_mecanico=int(request.form['id_mecanico']),
+                        duracao_minutos=request.form.get('duracao_minutos', type=int) or agenda.duracao_padrao()
                     )
+                    # recusa horário já ocupado para o mecânico
+                    agenda.validar(agendamento)
                     db.session.add(agendamento)
                     db.session.commit()
                 flash("Agendamento criado com sucesso!", "success")
@@ -539,13 +528,11 @@ def init_app(app):
                 db.session.rollback()
                 flash(f"Erro ao criar agendamento: {str(e)}", "danger")
         
-        return render_template('agendamento/criar.html', veiculos=veiculos, mecanicos=mecanicos)
+        return render_template('agendamento/criar.html', duracao_padrao=agenda.duracao_padrao())
 
     @app.route('/agendamentos/editar/<int:id>', methods=['GET', 'POST'])
     def agendamentos_editar(id):
-        agendamento = Agendamento.query.get_or_404(id)
-        veiculos = Veiculo.query.order_by(Veiculo.placa).all()
-        mecanicos = Mecanico.query.order_by(Mecanico.nome).all()
+        agendamento = carregar(Agendamento.query).get_or_404(id)
 
         if request.method == 'POST':
             try:
@@ -565,7 +552,9 @@ def init_app(app):
                 agendamento.observacoes = request.form.get('observacoes') or None
                 agendamento.id_veiculo = int(request.form.get('id_veiculo')) if request.form.get('id_veiculo') else None
                 agendamento.id_mecanico = int(request.form.get('id_mecanico')) if request.form.get('id_mecanico') else None
+                agendamento.duracao_minutos = request.form.get('duracao_minutos', type=int) or agendamento.duracao_minutos
 
+                agenda.validar(agendamento)
                 db.session.commit()
                 flash("Agendamento atualizado com sucesso.", "success")
                 return redirect(url_for('agendamentos_listar'))
@@ -574,7 +563,11 @@ def init_app(app):
                 current_app.logger.exception("Erro ao atualizar agendamento")
                 flash(f"Erro ao atualizar agendamento: {e}", "danger")
 
-        return render_template('agendamento/editar.html', agendamento=agendamento, veiculos=veiculos, mecanicos=mecanicos)
+        selecionados = {
+            'id_veiculo': selecionado('veiculos', agendamento.id_veiculo),
+            'id_mecanico': selecionado('mecanicos', agendamento.id_mecanico),
+        }
+        return render_template('agendamento/editar.html', agendamento=agendamento, selecionados=selecionados)
 
     @app.route('/agendamentos/excluir/<int:id>')
     def agendamentos_excluir(id):
@@ -593,32 +586,36 @@ def init_app(app):
         
         return redirect(url_for('agendamentos_listar'))
 
+    @app.route('/agenda/proximo-horario')
+    def agenda_proximo_horario():
+        # primeiro horário livre de um mecânico (?mecanico=) ou de qualquer um com a especialidade (?especialidade=)
+        a_partir = request.args.get('a_partir')
+        try:
+            a_partir = datetime.fromisoformat(a_partir) if a_partir else None
+        except ValueError:
+            abort(400)
+        achado = agenda.proximo_horario(id_mecanico=request.args.get('mecanico', type=int),
+                                        especialidade=request.args.get('especialidade'),
+                                        duracao=request.args.get('duracao', type=int),
+                                        a_partir=a_partir)
+        if achado is None:
+            return jsonify({'encontrado': False})
+        id_mecanico, inicio = achado
+        return jsonify({'encontrado': True, 'mecanico': selecionado('mecanicos', id_mecanico),
+                        'data': inicio.date().isoformat(), 'hora': inicio.strftime('%H:%M')})
+
     #================================
     # ORDENS DE SERVIÇO
     #================================
 
     @app.route('/ordens')
     def ordens_listar():
-        with app.app_context():
-            # CORREÇÃO: Usar joinedload para veículo e mecânico
-            ordens = db.session.query(OrdemDeServico).options(
-                joinedload(OrdemDeServico.veiculo),
-                joinedload(OrdemDeServico.mecanico)
-            ).all()
-        return render_template('ordem_de_servico/listar.html', ordens=ordens)
+        # veículo e mecânico vêm no mesmo SELECT (ver CARREGAMENTOS)
+        pagina = paginar_listagem(carregar(db.session.query(OrdemDeServico)), *ORDENACOES['ordens_listar'])
+        return render_template('ordem_de_servico/listar.html', ordens=pagina.itens, pagina=pagina)
 
     @app.route('/ordens/criar', methods=['GET', 'POST'])
     def ordens_criar():
-        with app.app_context():
-            veiculos = db.session.query(Veiculo).all()
-            mecanicos = db.session.query(Mecanico).all()
-            # CORREÇÃO: Carregar agendamentos com veiculo
-            agendamentos = db.session.query(Agendamento).options(
-                joinedload(Agendamento.veiculo)
-            ).all()
-            servicos = db.session.query(Servico).all()
-            pecas = db.session.query(Peca).all()
-            
         if request.method == 'POST':
             try:
                 with app.app_context():
@@ -634,49 +631,15 @@ def init_app(app):
                     db.session.add(ordem)
                     db.session.flush()  # Para obter o ID sem commit
                     
-                    valor_total = 0
-                    
-                    # Processar serviços
-                    servicos_ids = request.form.getlist('servicos_ids[]')
-                    servicos_qtd = request.form.getlist('servicos_qtd[]')
-                    
-                    for i, servico_id in enumerate(servicos_ids):
-                        if servico_id:  # Só processa se foi selecionado um serviço
-                            servico = db.session.query(Servico).get(int(servico_id))
-                            quantidade = int(servicos_qtd[i])
-                            preco_unitario = servico.preco_base
-                            total_item = preco_unitario * quantidade
-                            
-                            item = ItemOrdemServico(
-                                id_ordem_servico=ordem.id_ordem_servico,
-                                id_servico=servico.id_servico,
-                                quantidade=quantidade,
-                                preco_unitario=preco_unitario,
-                                valor_total=total_item
-                            )
-                            db.session.add(item)
-                            valor_total += total_item
-                    
-                    # Processar peças
-                    pecas_ids = request.form.getlist('pecas_ids[]')
-                    pecas_qtd = request.form.getlist('pecas_qtd[]')
-                    
-                    for i, peca_id in enumerate(pecas_ids):
-                        if peca_id:  # Só processa se foi selecionada uma peça
-                            peca = db.session.query(Peca).get(int(peca_id))
-                            quantidade = int(pecas_qtd[i])
-                            preco_unitario = peca.preco_venda
-                            total_item = preco_unitario * quantidade
-                            
-                            item_peca = PecaOrdemServico(
-                                id_ordem_servico=ordem.id_ordem_servico,
-                                id_peca=peca.id_peca,
-                                quantidade=quantidade,
-                                preco_unitario=preco_unitario,
-                                valor_total=total_item
-                            )
-                            db.session.add(item_peca)
-                            valor_total += total_item
+                    # preços resolvidos com um SELECT ... IN por tabela e linhas gravadas em lote
+                    linhas = precificar(
+                        ler_linhas(request.form, 'servicos_ids[]', 'servicos_qtd[]'),
+                        ler_linhas(request.form, 'pecas_ids[]', 'pecas_qtd[]'),
+                    )
+                    valor_total = gravar_linhas(ordem.id_ordem_servico, linhas)
+                    # baixa do estoque das peças na mesma transação da OS
+                    estoque.baixar(estoque.quantidades(linhas.pecas))
+                    ordem.estoque_baixado = True
                     
                     # Atualizar valor total da OS
                     ordem.valor_total = valor_total
@@ -689,22 +652,14 @@ def init_app(app):
                 db.session.rollback()
                 flash(f"Erro ao criar ordem de serviço: {str(e)}", "danger")
         
-        return render_template('ordem_de_servico/criar.html',
-                            veiculos=veiculos, mecanicos=mecanicos, 
-                            agendamentos=agendamentos, servicos=servicos, pecas=pecas)
+        return render_template('ordem_de_servico/criar.html')
 
     @app.route('/ordens/editar/<int:id>', methods=['GET', 'POST'])
     def ordens_editar(id):
-        os_obj = OrdemDeServico.query.get_or_404(id)
+        os_obj = carregar(OrdemDeServico.query).get_or_404(id)
 
-        servicos = Servico.query.order_by(Servico.nome_servico).all()
-        pecas = Peca.query.order_by(Peca.nome_peca).all()
-        agendamentos = Agendamento.query.order_by(Agendamento.data_agendamento).all()
-        veiculos = Veiculo.query.order_by(Veiculo.placa).all()
-        mecanicos = Mecanico.query.order_by(Mecanico.nome).all()
-
-        itens_servico = ItemOrdemServico.query.filter_by(id_ordem_servico=id).all()
-        itens_peca = PecaOrdemServico.query.filter_by(id_ordem_servico=id).all()
+        itens_servico = carregar(ItemOrdemServico.query).filter_by(id_ordem_servico=id).all()
+        itens_peca = carregar(PecaOrdemServico.query).filter_by(id_ordem_servico=id).all()
 
         def parse_date(val):
             if not val:
@@ -750,6 +705,19 @@ def init_app(app):
                 os_obj.id_veiculo = int(request.form.get('id_veiculo')) if request.form.get('id_veiculo') else None
                 os_obj.id_mecanico = int(request.form.get('id_mecanico')) if request.form.get('id_mecanico') else None
 
+                # linhas de serviços/peças: linhas já existentes mantêm o preço praticado
+                if request.form.get('itens_enviados'):
+                    precos_s, precos_p = precos_praticados(os_obj.id_ordem_servico)
+                    pecas_antes = estoque.quantidades_da_ordem(os_obj.id_ordem_servico)
+                    linhas = precificar(
+                        ler_linhas(request.form, 'servicos_ids[]', 'servicos_qtd[]'),
+                        ler_linhas(request.form, 'pecas_ids[]', 'pecas_qtd[]'),
+                        precos_servicos=precos_s, precos_pecas=precos_p,
+                    )
+                    os_obj.valor_total = gravar_linhas(os_obj.id_ordem_servico, linhas, substituir=True)
+                    if os_obj.estoque_baixado:
+                        estoque.ajustar(pecas_antes, estoque.quantidades(linhas.pecas))
+
                 # se houver campos de hora separados, parse_time pode ser usado
                 # Ex: hora_inicio = request.form.get('hora_inicio'); os_obj.hora_inicio = parse_time(hora_inicio)
 
@@ -761,15 +729,17 @@ def init_app(app):
                 current_app.logger.exception('Erro ao atualizar ordem de serviço')
                 flash(f'Erro ao atualizar OS: {e}', 'danger')
 
+        # rótulos só das opções já escolhidas; o resto é buscado pelo autocompletar
+        selecionados = {
+            'id_agendamento': selecionado('agendamentos', os_obj.id_agendamento),
+            'id_veiculo': selecionado('veiculos', os_obj.id_veiculo),
+            'id_mecanico': selecionado('mecanicos', os_obj.id_mecanico),
+        }
         return render_template('ordem_de_servico/editar.html',
                                os=os_obj,
-                               servicos=servicos,
-                               pecas=pecas,
-                               agendamentos=agendamentos,
-                               veiculos=veiculos,
-                               mecanicos=mecanicos,
-                               itens_servico=itens_servico,
-                               itens_peca=itens_peca)
+                               selecionados=selecionados,
+                               linhas_servico=selecionados_das_linhas('servicos', itens_servico, 'id_servico'),
+                               linhas_peca=selecionados_das_linhas('pecas', itens_peca, 'id_peca'))
 
     @app.route('/ordens/excluir/<int:id>')
     def ordens_excluir(id):
@@ -777,6 +747,9 @@ def init_app(app):
             with app.app_context():
                 ordem = db.session.query(OrdemDeServico).get(id)
                 if ordem:
+                    # peças da OS voltam para o estoque (só se saíram dele)
+                    if ordem.estoque_baixado:
+                        estoque.devolver(estoque.quantidades_da_ordem(id))
                     db.session.delete(ordem)
                     db.session.commit()
                     flash("Ordem de serviço removida com sucesso!", "danger")
@@ -788,11 +761,63 @@ def init_app(app):
         
         return redirect(url_for('ordens_listar'))
 
+    #================================
+    # EXPORTAÇÃO
+    #================================
+
+    @app.route('/exportar/<nome>.csv')
+    def exportar_csv(nome):
+        if nome not in EXPORTACOES:
+            abort(404)
+        resposta = Response(stream_with_context(gerar_csv(nome)), mimetype='text/csv')
+        resposta.headers['Content-Disposition'] = f'attachment; filename={nome}_{datetime.now():%Y%m%d}.csv'
+        return resposta
+
+    @app.route('/exportar/<nome>.xlsx')
+    def exportar_xlsx(nome):
+        if nome not in EXPORTACOES:
+            abort(404)
+        resposta = Response(stream_with_context(gerar_xlsx(nome)), mimetype=XLSX)
+        resposta.headers['Content-Disposition'] = f'attachment; filename={nome}_{datetime.now():%Y%m%d}.xlsx'
+        return resposta
+
+    #================================
+    # IMPORTAÇÃO
+    #================================
+
+    @app.route('/importar', methods=['GET', 'POST'])
+    def importar_csv():
+        relatorio = None
+        if request.method == 'POST':
+            tipo = request.form.get('tipo')
+            arquivo = request.files.get('arquivo')
+            if tipo not in IMPORTADORES or not arquivo or not arquivo.filename:
+                flash("Selecione o tipo e o arquivo CSV.", "danger")
+            else:
+                try:
+                    texto = io.TextIOWrapper(arquivo.stream, encoding='utf-8-sig')
+                    relatorio = importar(texto, tipo)
+                    categoria = 'warning' if relatorio.erros else 'success'
+                    flash(f"{relatorio.inseridos} de {relatorio.lidos} linha(s) importada(s).", categoria)
+                except Exception as e:
+                    db.session.rollback()
+                    current_app.logger.exception('Erro ao importar CSV')
+                    flash(f"Erro ao importar arquivo: {e}", "danger")
+        return render_template('importar.html', tipos=sorted(IMPORTADORES), relatorio=relatorio)
+
     #================================
     # RELATÓRIOS
     #================================
 
     @app.route('/relatorios')
     def relatorios():
-        # placeholder simples — substitua por lógica real quando tiver
-        return render_template('relatorios.html')
\ No newline at end of file
+        periodo = Periodo.ler(request.args.get('inicio'), request.args.get('fim'))
+        try:
+            dados = {nome: gerar_relatorio(nome, periodo) for nome in RELATORIOS}
+            carga = analisar_em_cache(periodo)
+        except Exception:
+            current_app.logger.exception('Erro ao gerar relatórios')
+            flash('Erro ao gerar relatórios.', 'danger')
+            dados = {nome: () for nome in RELATORIOS}
+            carga = AnaliseCarga()
+        return render_template('relatorios.html', periodo=periodo, carga=carga, **dados)
\ No newline at end of file
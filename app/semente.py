@@ -0,0 +1,280 @@
+import random
+import time as relogio
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+import click
+from sqlalchemy import select, insert, func, text
+from app import db, catalogos
+from app.models import (Cliente, Veiculo, Mecanico, Servico, Peca, Agendamento,
+                        OrdemDeServico, ItemOrdemServico, PecaOrdemServico)
+
+#================================
+# DADOS SINTÉTICOS EM VOLUME DE PRODUÇÃO
+#================================
+
+# `flask semear` gera clientes, veículos, agendamentos e ordens com linhas de
+# serviços e peças, em INSERTs executemany de `--lote` linhas por transação.
+# As chaves são atribuídas aqui (a partir do maior id já existente) para ligar
+# as tabelas sem ler nada de volta; no fim as sequences do PostgreSQL são
+# ajustadas. Com a mesma --semente o resultado é sempre o mesmo.
+# - Os agendamentos não se sobrepõem (respeitam ex_agendamento_sobreposto):
+#   cada mecânico recebe horários consecutivos de 1h dentro do expediente.
+# - Ordens com mais de 30 dias estão concluídas; as recentes ficam em aberto.
+
+NOMES = ('Ana', 'Bruno', 'Carla', 'Diego', 'Eduarda', 'Felipe', 'Gabriela', 'Henrique', 'Isabela',
+         'João', 'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael', 'Sofia', 'Tiago',
+         'Vanessa', 'William')
+SOBRENOMES = ('Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Ferreira', 'Costa',
+              'Rodrigues', 'Almeida', 'Nascimento', 'Carvalho', 'Gomes', 'Martins', 'Rocha')
+MODELOS = (('Fiat', 'Uno'), ('Fiat', 'Argo'), ('Volkswagen', 'Gol'), ('Volkswagen', 'Polo'),
+           ('Chevrolet', 'Onix'), ('Chevrolet', 'Prisma'), ('Ford', 'Ka'), ('Hyundai', 'HB20'),
+           ('Toyota', 'Corolla'), ('Honda', 'Civic'), ('Renault', 'Sandero'), ('Jeep', 'Renegade'))
+CORES = ('Branco', 'Preto', 'Prata', 'Cinza', 'Vermelho', 'Azul')
+ESPECIALIDADES = ('Motor', 'Suspensão', 'Freios', 'Elétrica', 'Injeção', 'Funilaria', None)
+SERVICOS = ('Troca de óleo', 'Alinhamento', 'Balanceamento', 'Revisão', 'Troca de pastilhas',
+            'Troca de embreagem', 'Diagnóstico eletrônico', 'Limpeza de bicos', 'Troca de correia',
+            'Higienização do ar')
+PECAS = ('Filtro de óleo', 'Filtro de ar', 'Pastilha de freio', 'Disco de freio', 'Correia dentada',
+         'Vela de ignição', 'Amortecedor', 'Bateria', 'Lâmpada', 'Palheta')
+STATUS_ABERTOS = ('Aberta', 'Em Andamento', 'Pendente')
+CONCLUIDA = 'Concluída'
+HORARIOS_POR_DIA = 10    # 08:00 às 17:00, 1h cada
+ANOS = 3
+
+
+def _cpf(n):
+    digitos = f'{n:011d}'
+    return f'{digitos[:3]}.{digitos[3:6]}.{digitos[6:9]}-{digitos[9:]}'
+
+
+def _placa(n):
+    # padrão Mercosul AAA9A99, único por n
+    letras = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    n, d2 = divmod(n, 100)
+    n, l4 = divmod(n, 26)
+    n, d1 = divmod(n, 10)
+    n, l3 = divmod(n, 26)
+    n, l2 = divmod(n, 26)
+    l1 = n % 26
+    return f'{letras[l1]}{letras[l2]}{letras[l3]}{d1}{letras[l4]}{d2:02d}'
+
+
+def _preco(rng, minimo, maximo):
+    return Decimal(rng.randint(minimo * 100, maximo * 100)) / 100
+
+
+class Semeador:
+
+    def __init__(self, semente, lote):
+        self.rng = random.Random(semente)
+        self.lote = lote
+        self.hoje = date.today()
+
+    def _proximo_id(self, coluna):
+        return (db.session.execute(select(func.max(coluna))).scalar() or 0) + 1
+
+    def _gravar(self, modelo, linhas):
+        if linhas:
+            db.session.execute(insert(modelo.__table__), linhas)
+
+    def _em_lotes(self, modelo, total, gerar):
+        # gerar(id) -> linha; grava de `lote` em `lote` linhas
+        inicio = self._proximo_id(modelo.__mapper__.primary_key[0])
+        pendentes = []
+        for id_ in range(inicio, inicio + total):
+            pendentes.append(gerar(id_))
+            if len(pendentes) >= self.lote:
+                self._gravar(modelo, pendentes)
+                db.session.commit()
+                pendentes = []
+        self._gravar(modelo, pendentes)
+        db.session.commit()
+        return list(range(inicio, inicio + total))
+
+    #================================
+    # Cadastros
+    #================================
+
+    def catalogo(self, mecanicos, servicos, pecas):
+        rng = self.rng
+        self.mecanicos = self._em_lotes(Mecanico, mecanicos, lambda i: {
+            'id_mecanico': i, 'nome': f'{rng.choice(NOMES)} {rng.choice(SOBRENOMES)}',
+            'cpf': _cpf(900_000_000 + i), 'telefone': f'(11) 9{i:08d}'[:20],
+            'especialidade': rng.choice(ESPECIALIDADES),
+            'data_admissao': self.hoje - timedelta(days=rng.randint(30, 3650)),
+        })
+        self.precos_servico = {}
+        def servico(i):
+            preco = _preco(rng, 50, 900)
+            self.precos_servico[i] = preco
+            return {'id_servico': i, 'nome_servico': f'{SERVICOS[i % len(SERVICOS)]} {i}',
+                    'preco_base': preco, 'tempo_estimado': rng.choice((30, 60, 90, 120, 240))}
+        self._em_lotes(Servico, servicos, servico)
+        self.precos_peca = {}
+        def peca(i):
+            custo = _preco(rng, 5, 600)
+            self.precos_peca[i] = (custo * Decimal('1.6')).quantize(Decimal('0.01'))
+            return {'id_peca': i, 'nome_peca': f'{PECAS[i % len(PECAS)]} {i}', 'preco_custo': custo,
+                    'preco_venda': self.precos_peca[i], 'estoque_minimo': rng.randint(5, 20),
+                    'estoque_atual': rng.randint(0, 300)}
+        self._em_lotes(Peca, pecas, peca)
+        # inserts do Core: os workers em execução precisam recarregar os catálogos
+        catalogos.alterados(db.session, 'mecanicos', 'servicos', 'pecas')
+        db.session.commit()
+
+    def clientes(self, total):
+        rng = self.rng
+        self.ids_clientes = self._em_lotes(Cliente, total, lambda i: {
+            'id_cliente': i, 'nome': f'{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}',
+            'cpf': _cpf(i), 'telefone': f'(11) 9{i % 100_000_000:08d}', 'email': f'cliente{i}@exemplo.com.br',
+            'endereco': f'Rua {rng.choice(SOBRENOMES)}, {rng.randint(1, 3000)}',
+            'data_cadastro': self.hoje - timedelta(days=rng.randint(0, 365 * ANOS)),
+        })
+
+    def veiculos(self, total):
+        rng = self.rng
+        def veiculo(i):
+            marca, modelo = rng.choice(MODELOS)
+            return {'id_veiculo': i, 'placa': _placa(i), 'marca': marca, 'modelo': modelo,
+                    'ano': rng.randint(2000, self.hoje.year), 'cor': rng.choice(CORES),
+                    'km_atual': rng.randint(0, 250_000), 'id_cliente': rng.choice(self.ids_clientes)}
+        self.ids_veiculos = self._em_lotes(Veiculo, total, veiculo)
+
+    #================================
+    # Agenda e ordens
+    #================================
+
+    def agendamentos(self, total):
+        # horário j do mecânico m: dia j // HORARIOS_POR_DIA, hora 8 + j % HORARIOS_POR_DIA
+        rng = self.rng
+        por_mecanico = -(-total // len(self.mecanicos))
+        dias = -(-por_mecanico // HORARIOS_POR_DIA)
+        primeiro_dia = self.hoje - timedelta(days=int(dias * 0.9))
+        self.agenda = {}    # id -> (id_veiculo, id_mecanico, data)
+        def agendamento(i):
+            n = i - self._primeiro_agendamento
+            mecanico = self.mecanicos[n % len(self.mecanicos)]
+            j = n // len(self.mecanicos)
+            dia = primeiro_dia + timedelta(days=j // HORARIOS_POR_DIA)
+            veiculo = rng.choice(self.ids_veiculos)
+            self.agenda[i] = (veiculo, mecanico, dia)
+            if dia >= self.hoje:
+                status = 'Pendente'
+            else:
+                status = 'Cancelado' if rng.random() < 0.05 else 'Confirmado'
+            return {'id_agendamento': i, 'data_agendamento': dia,
+                    'hora_agendamento': time(8 + j % HORARIOS_POR_DIA), 'status': status,
+                    'observacoes': None, 'id_veiculo': veiculo, 'id_mecanico': mecanico,
+                    'duracao_minutos': 60}
+        self._primeiro_agendamento = self._proximo_id(Agendamento.id_agendamento)
+        self._em_lotes(Agendamento, total, agendamento)
+
+    def ordens(self, total):
+        rng = self.rng
+        agendados = [i for i, (_, _, dia) in self.agenda.items() if dia < self.hoje]
+        rng.shuffle(agendados)
+        ids_servicos, ids_pecas = list(self.precos_servico), list(self.precos_peca)
+        proximo_item = self._proximo_id(ItemOrdemServico.id_item_os)
+        proxima_peca = self._proximo_id(PecaOrdemServico.id_peca_os)
+        inicio = self._proximo_id(OrdemDeServico.id_ordem_servico)
+        limite_aberta = datetime.combine(self.hoje - timedelta(days=30), time())
+
+        ordens, itens, pecas = [], [], []
+        for n, id_ordem in enumerate(range(inicio, inicio + total)):
+            id_agendamento = agendados[n] if n < len(agendados) and rng.random() < 0.8 else None
+            if id_agendamento:
+                id_veiculo, id_mecanico, dia = self.agenda[id_agendamento]
+            else:
+                id_veiculo, id_mecanico = rng.choice(self.ids_veiculos), rng.choice(self.mecanicos)
+                dia = self.hoje - timedelta(days=rng.randint(0, 365 * ANOS))
+            abertura = datetime.combine(dia, time(rng.randint(8, 17), rng.choice((0, 15, 30, 45))))
+            if abertura < limite_aberta:
+                status, conclusao = CONCLUIDA, abertura + timedelta(hours=rng.randint(1, 120))
+            else:
+                status, conclusao = rng.choice(STATUS_ABERTOS), None
+
+            valor = Decimal(0)
+            for _ in range(rng.randint(1, 3)):
+                id_servico, qtd = rng.choice(ids_servicos), rng.randint(1, 2)
+                preco = self.precos_servico[id_servico]
+                itens.append({'id_item_os': proximo_item, 'id_ordem_servico': id_ordem, 'id_servico': id_servico,
+                              'quantidade': qtd, 'preco_unitario': preco, 'desconto': None,
+                              'valor_total': preco * qtd})
+                proximo_item += 1
+                valor += preco * qtd
+            for _ in range(rng.randint(0, 3)):
+                id_peca, qtd = rng.choice(ids_pecas), rng.randint(1, 4)
+                preco = self.precos_peca[id_peca]
+                pecas.append({'id_peca_os': proxima_peca, 'id_ordem_servico': id_ordem, 'id_peca': id_peca,
+                              'quantidade': qtd, 'preco_unitario': preco, 'valor_total': preco * qtd})
+                proxima_peca += 1
+                valor += preco * qtd
+            ordens.append({'id_ordem_servico': id_ordem, 'numero_os': f'S{id_ordem:09d}',
+                           'data_abertura': abertura, 'data_conclusao': conclusao, 'status': status,
+                           'valor_total': valor, 'observacoes': None, 'id_agendamento': id_agendamento,
+                           'id_veiculo': id_veiculo, 'id_mecanico': id_mecanico})
+
+            if len(ordens) >= self.lote:
+                self._gravar_ordens(ordens, itens, pecas)
+                ordens, itens, pecas = [], [], []
+        self._gravar_ordens(ordens, itens, pecas)
+
+    def _gravar_ordens(self, ordens, itens, pecas):
+        self._gravar(OrdemDeServico, ordens)
+        self._gravar(ItemOrdemServico, itens)
+        self._gravar(PecaOrdemServico, pecas)
+        db.session.commit()
+
+    def ajustar_sequencias(self):
+        # as chaves foram gravadas explicitamente: avança as sequences do PostgreSQL
+        if db.engine.dialect.name != 'postgresql':
+            return
+        for modelo in (Cliente, Veiculo, Mecanico, Servico, Peca, Agendamento,
+                       OrdemDeServico, ItemOrdemServico, PecaOrdemServico):
+            tabela = modelo.__table__.name
+            pk = modelo.__mapper__.primary_key[0].name
+            db.session.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{tabela}', '{pk}'), "
+                f"COALESCE((SELECT MAX({pk}) FROM {tabela}), 1))"))
+        db.session.commit()
+
+
+def semear(clientes, veiculos, ordens, agendamentos=None, mecanicos=50, servicos=80, pecas=2000,
+           semente=42, lote=5000, eco=click.echo):
+    semeador = Semeador(semente, lote)
+    etapas = (
+        ('catálogo', lambda: semeador.catalogo(mecanicos, servicos, pecas), mecanicos + servicos + pecas),
+        ('clientes', lambda: semeador.clientes(clientes), clientes),
+        ('veículos', lambda: semeador.veiculos(veiculos), veiculos),
+        ('agendamentos', lambda: semeador.agendamentos(agendamentos), agendamentos),
+        ('ordens', lambda: semeador.ordens(ordens), ordens),
+    )
+    for nome, executar, quantidade in etapas:
+        comeco = relogio.perf_counter()
+        executar()
+        segundos = max(relogio.perf_counter() - comeco, 1e-6)
+        eco(f'{nome}: {quantidade} em {segundos:.1f}s ({quantidade / segundos:.0f}/s)')
+    semeador.ajustar_sequencias()
+
+
+def init_app(app):
+
+    @app.cli.command('semear')
+    @click.option('--clientes', default=100_000, show_default=True)
+    @click.option('--veiculos', default=200_000, show_default=True)
+    @click.option('--ordens', default=1_000_000, show_default=True, help='Ordens (com 1-3 serviços e 0-3 peças cada).')
+    @click.option('--agendamentos', type=int, help='Padrão: metade das ordens.')
+    @click.option('--mecanicos', default=50, show_default=True)
+    @click.option('--servicos', default=80, show_default=True)
+    @click.option('--pecas', default=2000, show_default=True)
+    @click.option('--semente', default=42, show_default=True, help='Semente do gerador aleatório.')
+    @click.option('--lote', default=5000, show_default=True, help='Linhas por INSERT/transação.')
+    def semear_cmd(clientes, veiculos, ordens, agendamentos, mecanicos, servicos, pecas, semente, lote):
+        """Popula o banco com dados sintéticos em volume de produção."""
+        if veiculos and not clientes:
+            raise click.UsageError('veículos precisam de clientes')
+        if (ordens or agendamentos) and not (veiculos and mecanicos):
+            raise click.UsageError('ordens e agendamentos precisam de veículos e mecânicos')
+        semear(clientes, veiculos, ordens, agendamentos if agendamentos is not None else ordens // 2,
+               mecanicos, servicos, pecas, semente, lote)
+        click.echo('Pronto. Rode `flask resumo-backfill` se RESUMO_DIARIO=1 e ANALYZE no PostgreSQL.')
@@ -0,0 +1,101 @@
+// Campos com autocompletar: <div class="autocompletar" data-url="..."> com um
+// <input type="hidden"> (valor enviado), um <input type="text"> (o que o usuário digita)
+// e uma lista de sugestões. Ao escolher uma opção, o hidden recebe o id (e os demais
+// campos da opção, como preço e tempo, em data-*) e dispara "change".
+(function() {
+    const ATRASO = 200;
+    const MENSAGEM = 'Selecione uma opção da lista';
+
+    function iniciarCampo(raiz) {
+        if (raiz.dataset.iniciado) return;
+        raiz.dataset.iniciado = '1';
+
+        const oculto = raiz.querySelector('input[type=hidden]');
+        const texto = raiz.querySelector('input[type=text]');
+        const lista = raiz.querySelector('.list-group');
+        let timer = null, controle = null, itens = [], ativo = -1;
+
+        function esconder() { lista.classList.add('d-none'); lista.innerHTML = ''; itens = []; ativo = -1; }
+
+        function marcar(indice) {
+            ativo = indice;
+            Array.from(lista.children).forEach((el, i) => el.classList.toggle('active', i === indice));
+        }
+
+        function limparExtras() {
+            Object.keys(oculto.dataset).forEach(k => delete oculto.dataset[k]);
+        }
+
+        function escolher(item) {
+            oculto.value = item.id;
+            limparExtras();
+            Object.entries(item).forEach(([k, v]) => {
+                if (k !== 'id' && k !== 'texto' && v !== null) oculto.dataset[k] = v;
+            });
+            texto.value = item.texto;
+            texto.setCustomValidity('');
+            esconder();
+            oculto.dispatchEvent(new Event('change', { bubbles: true }));
+        }
+
+        function mostrar(resultado) {
+            lista.innerHTML = '';
+            itens = resultado;
+            ativo = -1;
+            if (!itens.length) {
+                const vazio = document.createElement('div');
+                vazio.className = 'list-group-item text-muted small';
+                vazio.textContent = 'Nada encontrado';
+                lista.append(vazio);
+            }
+            itens.forEach((item, i) => {
+                const el = document.createElement('button');
+                el.type = 'button';
+                el.className = 'list-group-item list-group-item-action py-1';
+                el.textContent = item.texto;
+                el.addEventListener('mousedown', e => { e.preventDefault(); escolher(item); });
+                el.addEventListener('mouseenter', () => marcar(i));
+                lista.append(el);
+            });
+            lista.classList.remove('d-none');
+        }
+
+        function buscar(q) {
+            clearTimeout(timer);
+            timer = setTimeout(function() {
+                if (controle) controle.abort();
+                controle = new AbortController();
+                fetch(raiz.dataset.url + '?q=' + encodeURIComponent(q), { signal: controle.signal })
+                    .then(r => r.json())
+                    .then(mostrar)
+                    .catch(() => {});
+            }, ATRASO);
+        }
+
+        texto.addEventListener('input', function() {
+            if (oculto.value) {
+                oculto.value = '';
+                limparExtras();
+                oculto.dispatchEvent(new Event('change', { bubbles: true }));
+            }
+            texto.setCustomValidity(texto.value.trim() ? MENSAGEM : '');
+            buscar(texto.value.trim());
+        });
+        texto.addEventListener('focus', () => buscar(oculto.value ? '' : texto.value.trim()));
+        texto.addEventListener('blur', () => setTimeout(esconder, 150));
+        texto.addEventListener('keydown', function(e) {
+            if (lista.classList.contains('d-none') || !itens.length) return;
+            if (e.key === 'ArrowDown') { e.preventDefault(); marcar(Math.min(ativo + 1, itens.length - 1)); }
+            else if (e.key === 'ArrowUp') { e.preventDefault(); marcar(Math.max(ativo - 1, 0)); }
+            else if (e.key === 'Enter' && ativo >= 0) { e.preventDefault(); escolher(itens[ativo]); }
+            else if (e.key === 'Escape') { esconder(); }
+        });
+    }
+
+    function iniciar(raiz) {
+        (raiz || document).querySelectorAll('.autocompletar').forEach(iniciarCampo);
+    }
+
+    window.Autocompletar = { iniciar: iniciar };
+    document.addEventListener('DOMContentLoaded', () => iniciar());
+})();
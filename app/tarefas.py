@@ -0,0 +1,431 @@
+import glob
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+from typing import Callable, Optional
+import click
+from flask import current_app, request, jsonify, render_template, redirect, url_for, abort, flash, send_file
+from sqlalchemy import select, update, delete, func
+from app import db
+from app.analise import analisar
+from app.exportacao import EXPORTACOES, XLSX, gerar_csv, gravar_xlsx
+from app.models import Tarefa
+from app.relatorios import Periodo, RELATORIOS, gerar as gerar_relatorio
+from app.resumo import recalcular_periodo
+
+#================================
+# TAREFAS EM SEGUNDO PLANO
+#================================
+
+# A fila é a própria tabela `tarefa`, sem broker externo. A web só grava a linha
+# (`enfileirar`, na transação da requisição) e responde; `flask tarefas-worker`
+# reserva a próxima tarefa com UPDATE ... WHERE id = (SELECT ... FOR UPDATE SKIP LOCKED),
+# de modo que vários workers nunca pegam a mesma linha nem esperam uns pelos outros.
+# - Tarefas de E/S (exportações, resumo) rodam num pool de threads; as de CPU
+#   (relatórios com a análise de carga) num pool de processos (spawn), cada um
+#   com seu próprio app e conexões.
+# - Falhas voltam para a fila com espera exponencial (TAREFAS_ESPERA * 2^n) até
+#   max_tentativas. Se um processo do pool morrer, o pool é recriado na próxima
+#   tarefa de CPU (que volta à fila sem gastar tentativa).
+# - Enquanto uma tarefa roda, o worker renova a coluna `batimento` a cada
+#   TAREFAS_BATIMENTO segundos; sem batimento há mais de TAREFAS_TIMEOUT o worker
+#   é dado como morto e a tarefa volta à fila. Cada worker só finaliza tarefas que
+#   ainda estão em 'executando' em seu nome, então uma tarefa devolvida à fila e
+#   reservada por outro não é sobrescrita pelo worker original.
+# - Arquivos gerados ficam em TAREFAS_DIR e são apagados com a tarefa após TAREFAS_DIAS.
+# Acompanhe pelo GET /tarefas/<id> (JSON) ou pela página /tarefas.
+
+PENDENTE, EXECUTANDO, CONCLUIDA, FALHOU = 'pendente', 'executando', 'concluida', 'falhou'
+LIMITE_ERRO = 4000      # caracteres do traceback guardados em `erro`
+MANUTENCAO = 60         # segundos entre recuperações/limpezas no loop do worker
+
+
+@dataclass(frozen=True)
+class TipoTarefa:
+    nome: str
+    funcao: Callable
+    cpu: bool = False
+    parametros: tuple = ()                  # aceitos pelo formulário / JSON
+    validar: Optional[Callable] = None      # levanta ValueError antes de enfileirar
+
+
+TIPOS = {}
+
+
+def tarefa(nome, cpu=False, parametros=(), validar=None):
+    def registrar(funcao):
+        TIPOS[nome] = TipoTarefa(nome, funcao, cpu, parametros, validar)
+        return funcao
+    return registrar
+
+
+def enfileirar(tipo, max_tentativas=None, **parametros):
+    # só adiciona à sessão: o worker enxerga a tarefa quando quem a criou fizer commit
+    if tipo not in TIPOS:
+        raise ValueError(f'Tipo de tarefa desconhecido: {tipo}')
+    if TIPOS[tipo].validar:
+        TIPOS[tipo].validar(**parametros)
+    nova = Tarefa(tipo=tipo, parametros=parametros,
+                  max_tentativas=max_tentativas or current_app.config['TAREFAS_TENTATIVAS'])
+    db.session.add(nova)
+    db.session.flush()
+    return nova
+
+
+def _diretorio():
+    return current_app.config.get('TAREFAS_DIR') or os.path.join(current_app.instance_path, 'tarefas')
+
+
+def _arquivo(id_tarefa, extensao):
+    os.makedirs(_diretorio(), exist_ok=True)
+    return os.path.join(_diretorio(), f'{id_tarefa}.{extensao}')
+
+
+def situacao(t):
+    dados = {
+        'id': t.id_tarefa, 'tipo': t.tipo, 'parametros': t.parametros, 'status': t.status,
+        'tentativas': t.tentativas, 'max_tentativas': t.max_tentativas,
+        'criada_em': t.criada_em.isoformat(), 'executar_apos': t.executar_apos.isoformat(),
+        'iniciada_em': t.iniciada_em and t.iniciada_em.isoformat(),
+        'concluida_em': t.concluida_em and t.concluida_em.isoformat(),
+        'resultado': t.resultado, 'erro': t.erro,
+    }
+    if t.status == CONCLUIDA and (t.resultado or {}).get('arquivo'):
+        dados['url_resultado'] = url_for('tarefas_resultado', id=t.id_tarefa)
+    return dados
+
+
+#================================
+# Tipos de tarefa
+#================================
+
+def _validar_periodo(inicio=None, fim=None):
+    for valor in (inicio, fim):
+        if valor:
+            datetime.strptime(valor, '%Y-%m-%d')
+
+
+@tarefa('relatorios', cpu=True, parametros=('inicio', 'fim'), validar=_validar_periodo)
+def gerar_relatorios(id_tarefa, inicio=None, fim=None):
+    # mesma página de /relatorios, gravada em HTML
+    periodo = Periodo.ler(inicio, fim)
+    dados = {nome: gerar_relatorio(nome, periodo) for nome in RELATORIOS}
+    carga = analisar(periodo)
+    with current_app.test_request_context('/relatorios'):
+        html = render_template('relatorios.html', periodo=periodo, carga=carga, **dados)
+    caminho = _arquivo(id_tarefa, 'html')
+    with open(caminho, 'w', encoding='utf-8') as saida:
+        saida.write(html)
+    return {'arquivo': os.path.basename(caminho),
+            'inicio': periodo.inicio.isoformat(), 'fim': periodo.fim.isoformat()}
+
+
+def _validar_exportacao(nome=None, formato='csv'):
+    if nome not in EXPORTACOES:
+        raise ValueError(f'Exportação desconhecida: {nome}')
+    if formato not in ('csv', 'xlsx'):
+        raise ValueError(f'Formato desconhecido: {formato}')
+
+
+@tarefa('exportar', parametros=('nome', 'formato'), validar=_validar_exportacao)
+def exportar(id_tarefa, nome, formato='csv'):
+    caminho = _arquivo(id_tarefa, formato)
+    if formato == 'xlsx':
+        with open(caminho, 'wb') as saida:
+            gravar_xlsx(nome, saida)
+    else:
+        with open(caminho, 'w', encoding='utf-8', newline='') as saida:
+            for parte in gerar_csv(nome):
+                saida.write(parte)
+    return {'arquivo': os.path.basename(caminho), 'bytes': os.path.getsize(caminho)}
+
+
+@tarefa('resumo', parametros=('inicio', 'fim'), validar=_validar_periodo)
+def recalcular_resumo(id_tarefa, inicio=None, fim=None):
+    return {'linhas': recalcular_periodo(inicio or None, fim or None) or 0}
+
+
+#================================
+# Worker
+#================================
+
+_app_do_processo = None
+
+
+def _iniciar_processo():
+    # cada processo do pool monta o próprio app (engine e pool de conexões próprios);
+    # Ctrl+C fica com o processo principal, que espera as tarefas em andamento
+    global _app_do_processo
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from app import create_app
+    _app_do_processo = create_app()
+
+
+def _executar(app, tipo, id_tarefa, parametros):
+    with app.app_context():
+        return TIPOS[tipo].funcao(id_tarefa, **parametros)
+
+
+def _executar_no_processo(tipo, id_tarefa, parametros):
+    return _executar(_app_do_processo, tipo, id_tarefa, parametros)
+
+
+class Trabalhador:
+
+    def __init__(self, app, threads, processos, intervalo):
+        self.app = app
+        self.nome = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'[-100:]
+        self.intervalo = intervalo
+        self.threads = ThreadPoolExecutor(threads, thread_name_prefix='tarefa')
+        self.max_processos = processos
+        self.processos = self._pool_de_processos(processos) if processos else None
+        self.vagas = {False: threads, True: processos}
+        self.em_execucao = {}                   # futuro -> (id_tarefa, no processo?)
+        self.parar = threading.Event()
+
+    @staticmethod
+    def _pool_de_processos(processos):
+        return ProcessPoolExecutor(processos, mp_context=get_context('spawn'), initializer=_iniciar_processo)
+
+    def _no_processo(self, tipo):
+        # sem pool de processos, as tarefas de CPU também vão para as threads
+        return TIPOS[tipo].cpu and self.processos is not None
+
+    def _tipos_com_vaga(self):
+        return [nome for nome in TIPOS if self.vagas[self._no_processo(nome)] > 0]
+
+    def reservar(self, tipos):
+        agora = datetime.utcnow()
+        proxima = (select(Tarefa.id_tarefa)
+                   .where(Tarefa.status == PENDENTE, Tarefa.executar_apos <= agora, Tarefa.tipo.in_(tipos))
+                   .order_by(Tarefa.executar_apos, Tarefa.id_tarefa)
+                   .limit(1)
+                   .with_for_update(skip_locked=True)
+                   .scalar_subquery())
+        linha = db.session.execute(
+            update(Tarefa).where(Tarefa.id_tarefa == proxima)
+            .values(status=EXECUTANDO, tentativas=Tarefa.tentativas + 1, iniciada_em=agora,
+                    batimento=agora, trabalhador=self.nome)
+            .returning(Tarefa.id_tarefa, Tarefa.tipo, Tarefa.parametros),
+            execution_options={'synchronize_session': False}).first()
+        db.session.commit()
+        return linha
+
+    def iniciar(self, id_tarefa, tipo, parametros):
+        no_processo = self._no_processo(tipo)
+        if no_processo:
+            try:
+                futuro = self.processos.submit(_executar_no_processo, tipo, id_tarefa, parametros)
+            except BrokenProcessPool:
+                # um processo do pool morreu (falta de memória, kill): as tarefas que
+                # estavam nele falham em finalizar(); esta nem começou e volta à fila
+                self.app.logger.warning('pool de processos quebrado; recriando (tarefa %s volta à fila)', id_tarefa)
+                self.processos.shutdown(wait=False)
+                self.processos = self._pool_de_processos(self.max_processos)
+                self.devolver(id_tarefa)
+                return
+        else:
+            futuro = self.threads.submit(_executar, self.app, tipo, id_tarefa, parametros)
+        self.vagas[no_processo] -= 1
+        self.em_execucao[futuro] = (id_tarefa, no_processo)
+
+    def _minhas(self, *ids):
+        # tarefas que continuam reservadas por este worker
+        return (Tarefa.id_tarefa.in_(ids), Tarefa.trabalhador == self.nome, Tarefa.status == EXECUTANDO)
+
+    def devolver(self, id_tarefa):
+        # reservada mas não iniciada: volta à fila sem gastar a tentativa
+        db.session.execute(update(Tarefa).where(*self._minhas(id_tarefa))
+                           .values(status=PENDENTE, tentativas=Tarefa.tentativas - 1,
+                                   executar_apos=datetime.utcnow(), batimento=None),
+                           execution_options={'synchronize_session': False})
+        db.session.commit()
+
+    def bater(self):
+        ids = [i for i, _ in self.em_execucao.values()]
+        if ids:
+            db.session.execute(update(Tarefa).where(*self._minhas(*ids)).values(batimento=datetime.utcnow()),
+                               execution_options={'synchronize_session': False})
+            db.session.commit()
+
+    def finalizar(self, futuro):
+        id_tarefa, no_processo = self.em_execucao.pop(futuro)
+        self.vagas[no_processo] += 1
+        erro = futuro.exception()
+        if erro is None:
+            alteradas = db.session.execute(
+                update(Tarefa).where(*self._minhas(id_tarefa))
+                .values(status=CONCLUIDA, concluida_em=datetime.utcnow(), resultado=futuro.result(), erro=None),
+                execution_options={'synchronize_session': False}).rowcount
+            db.session.commit()
+            if not alteradas:
+                self.app.logger.warning('tarefa %s concluída, mas já não pertencia a este worker', id_tarefa)
+            return
+        atual = db.session.scalars(select(Tarefa).where(*self._minhas(id_tarefa)).with_for_update()).first()
+        if atual is None:
+            db.session.rollback()
+            self.app.logger.warning('tarefa %s falhou, mas já não pertencia a este worker: %s', id_tarefa, erro)
+            return
+        atual.erro = ''.join(traceback.format_exception(erro))[-LIMITE_ERRO:]
+        if atual.tentativas < atual.max_tentativas:
+            espera = self.app.config['TAREFAS_ESPERA'] * 2 ** (atual.tentativas - 1)
+            atual.status = PENDENTE
+            atual.executar_apos = datetime.utcnow() + timedelta(seconds=espera)
+        else:
+            atual.status = FALHOU
+            atual.concluida_em = datetime.utcnow()
+        db.session.commit()
+        self.app.logger.warning('tarefa %s (%s) falhou: %s', id_tarefa, atual.tipo, erro)
+
+    def recuperar(self):
+        # 'executando' sem batimento há mais de TAREFAS_TIMEOUT: o worker que reservou morreu
+        agora = datetime.utcnow()
+        presas = (Tarefa.status == EXECUTANDO,
+                  func.coalesce(Tarefa.batimento, Tarefa.iniciada_em)
+                  < agora - timedelta(seconds=self.app.config['TAREFAS_TIMEOUT']),
+                  Tarefa.id_tarefa.notin_([i for i, _ in self.em_execucao.values()]))
+        motivo = 'tempo esgotado: o worker que reservou a tarefa parou de responder'
+        db.session.execute(update(Tarefa).where(*presas, Tarefa.tentativas >= Tarefa.max_tentativas)
+                           .values(status=FALHOU, concluida_em=agora, erro=motivo),
+                           execution_options={'synchronize_session': False})
+        db.session.execute(update(Tarefa).where(*presas)
+                           .values(status=PENDENTE, executar_apos=agora, erro=motivo),
+                           execution_options={'synchronize_session': False})
+        db.session.commit()
+
+    def limpar(self):
+        limite = datetime.utcnow() - timedelta(days=self.app.config['TAREFAS_DIAS'])
+        antigas = db.session.scalars(select(Tarefa.id_tarefa).where(
+            Tarefa.status.in_([CONCLUIDA, FALHOU]), Tarefa.concluida_em < limite)).all()
+        if not antigas:
+            return
+        for id_tarefa in antigas:
+            for caminho in glob.glob(os.path.join(_diretorio(), f'{id_tarefa}.*')):
+                os.remove(caminho)
+        db.session.execute(delete(Tarefa).where(Tarefa.id_tarefa.in_(antigas)))
+        db.session.commit()
+
+    def rodar(self):
+        manutencao = batimento = 0
+        while not self.parar.is_set() or self.em_execucao:
+            if time.monotonic() >= batimento:
+                self.bater()
+                batimento = time.monotonic() + self.app.config['TAREFAS_BATIMENTO']
+            if time.monotonic() >= manutencao:
+                self.recuperar()
+                self.limpar()
+                manutencao = time.monotonic() + MANUTENCAO
+            reservada = None
+            tipos = self._tipos_com_vaga()
+            if tipos and not self.parar.is_set():
+                reservada = self.reservar(tipos)
+                if reservada:
+                    self.iniciar(*reservada)
+            if self.em_execucao:
+                # com uma tarefa recém-reservada, só colhe as prontas e tenta reservar outra
+                prontos, _ = wait(list(self.em_execucao), timeout=0 if reservada else self.intervalo,
+                                  return_when=FIRST_COMPLETED)
+                for futuro in prontos:
+                    self.finalizar(futuro)
+            elif not reservada:
+                self.parar.wait(self.intervalo)
+        self.threads.shutdown()
+        if self.processos:
+            self.processos.shutdown()
+
+
+def init_app(app):
+
+    @app.route('/tarefas')
+    def tarefas_listar():
+        recentes = db.session.scalars(select(Tarefa).order_by(Tarefa.id_tarefa.desc()).limit(50)).all()
+        ativas = any(t.status in (PENDENTE, EXECUTANDO) for t in recentes)
+        return render_template('tarefas/listar.html', tarefas=recentes, ativas=ativas,
+                               exportacoes=sorted(EXPORTACOES))
+
+    @app.route('/tarefas/<tipo>', methods=['POST'])
+    def tarefas_enfileirar(tipo):
+        if tipo not in TIPOS:
+            abort(404)
+        entrada = request.get_json(silent=True) or request.form
+        parametros = {p: entrada[p] for p in TIPOS[tipo].parametros if entrada.get(p)}
+        quer_json = request.is_json or request.accept_mimetypes.best == 'application/json'
+        try:
+            nova = enfileirar(tipo, **parametros)
+            db.session.commit()
+        except ValueError as e:
+            db.session.rollback()
+            if quer_json:
+                return jsonify({'erro': str(e)}), 400
+            flash(str(e), 'danger')
+            return redirect(url_for('tarefas_listar'))
+        if quer_json:
+            resposta = jsonify(situacao(nova))
+            resposta.headers['Location'] = url_for('tarefas_situacao', id=nova.id_tarefa)
+            return resposta, 202
+        flash(f'Tarefa #{nova.id_tarefa} ({tipo}) enfileirada.', 'success')
+        return redirect(url_for('tarefas_listar'))
+
+    @app.route('/tarefas/<int:id>')
+    def tarefas_situacao(id):
+        return jsonify(situacao(db.get_or_404(Tarefa, id)))
+
+    @app.route('/tarefas/<int:id>/resultado')
+    def tarefas_resultado(id):
+        t = db.get_or_404(Tarefa, id)
+        arquivo = (t.resultado or {}).get('arquivo')
+        caminho = os.path.join(_diretorio(), arquivo) if arquivo else None
+        if t.status != CONCLUIDA or not caminho or not os.path.exists(caminho):
+            abort(404)
+        extensao = os.path.splitext(arquivo)[1]
+        if extensao in ('.csv', '.xlsx'):
+            nome = f"{t.parametros.get('nome', 'exportacao')}_{t.concluida_em:%Y%m%d}{extensao}"
+            return send_file(caminho, mimetype='text/csv' if extensao == '.csv' else XLSX,
+                             as_attachment=True, download_name=nome)
+        return send_file(caminho, mimetype='text/html')
+
+    @app.cli.command('tarefas-worker')
+    @click.option('--threads', type=int, help='Tarefas de E/S simultâneas (padrão: TAREFAS_THREADS).')
+    @click.option('--processos', type=int,
+                  help='Processos para tarefas de CPU; 0 = rodar nas threads (padrão: TAREFAS_PROCESSOS).')
+    def tarefas_worker(threads, processos):
+        """Executa as tarefas da fila até receber SIGTERM/Ctrl+C."""
+        config = current_app.config
+        trabalhador = Trabalhador(current_app._get_current_object(),
+                                  threads if threads is not None else config['TAREFAS_THREADS'],
+                                  processos if processos is not None else config['TAREFAS_PROCESSOS'],
+                                  config['TAREFAS_INTERVALO'])
+
+        def _encerrar(sinal, quadro):
+            click.echo('encerrando: aguardando as tarefas em andamento...')
+            trabalhador.parar.set()
+
+        signal.signal(signal.SIGTERM, _encerrar)
+        signal.signal(signal.SIGINT, _encerrar)
+        click.echo(f'worker {trabalhador.nome}: tipos {", ".join(sorted(TIPOS))}')
+        trabalhador.rodar()
+
+    @app.cli.command('tarefas-enfileirar')
+    @click.argument('tipo', type=click.Choice(sorted(TIPOS)))
+    @click.argument('parametros', nargs=-1)
+    def tarefas_enfileirar_cmd(tipo, parametros):
+        """Enfileira uma tarefa (parâmetros como chave=valor), p. ex. pelo cron."""
+        try:
+            valores = dict(p.split('=', 1) for p in parametros)
+            desconhecidos = set(valores) - set(TIPOS[tipo].parametros)
+            if desconhecidos:
+                raise ValueError(f"parâmetro(s) não aceito(s) por {tipo}: {', '.join(sorted(desconhecidos))}")
+            nova = enfileirar(tipo, **valores)
+        except ValueError as e:
+            raise click.UsageError(str(e))
+        db.session.commit()
+        click.echo(f'tarefa {nova.id_tarefa} enfileirada')
@@ -0,0 +1,55 @@
+// gerado por /sw.js a partir de static/models_3d/dist/manifest.json (flask modelos-build);
+// o nome do cache só muda quando algum modelo muda.
+const CACHE_PREFIX = 'models-';
+const CACHE_NAME = CACHE_PREFIX + {{ versao|tojson }};
+const MODEL_URLS = {{ urls|tojson }};
+// com build, as URLs levam o hash do conteúdo: o que está no cache nunca fica velho
+const IMMUTABLE = {{ imutaveis|tojson }};
+
+// nada é baixado na instalação: cada modelo entra no cache na primeira vez em que uma página o pede
+self.addEventListener('install', event => {
+  event.waitUntil(self.skipWaiting());
+});
+
+// activate - apaga os caches de versões anteriores dos modelos
+self.addEventListener('activate', event => {
+  event.waitUntil(
+    caches.keys().then(keys =>
+      Promise.all(keys.filter(k => k.startsWith(CACHE_PREFIX) && k !== CACHE_NAME).map(k => caches.delete(k)))
+    ).then(() => self.clients.claim())
+  );
+});
+
+function fromNetwork(request) {
+  return fetch(request).then(resp => {
+    // só respostas completas (nada de 206 de Range nem erros)
+    if (resp.status === 200) {
+      const copy = resp.clone();
+      caches.open(CACHE_NAME).then(cache => cache.put(request.url, copy));
+    }
+    return resp;
+  });
+}
+
+// intercept fetch for model urls: cache-first; sem build, atualiza o cache em segundo plano
+self.addEventListener('fetch', event => {
+  try {
+    const reqUrl = new URL(event.request.url);
+    if (event.request.method !== 'GET' || event.request.headers.has('range') || !MODEL_URLS.includes(reqUrl.pathname)) {
+      return;
+    }
+    event.respondWith(
+      caches.match(event.request.url, { cacheName: CACHE_NAME }).then(cached => {
+        if (cached) {
+          if (!IMMUTABLE) {
+            event.waitUntil(fromNetwork(event.request).catch(() => {}));
+          }
+          return cached;
+        }
+        return fromNetwork(event.request);
+      })
+    );
+  } catch (e) {
+    // ignore non-HTTP requests.
+  }
+});
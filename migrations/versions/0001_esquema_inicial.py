@@ -0,0 +1,118 @@
+"""esquema inicial (tabelas de documents/schema_v1.sql)
+
+Bancos criados antes das migrações já têm estas tabelas: marque-os com
+`flask db stamp 0001_esquema_inicial` e depois rode `flask db upgrade`.
+
+Revision ID: 0001_esquema_inicial
+Revises:
+Create Date: 2026-10-18 14:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_esquema_inicial'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'cliente',
+        sa.Column('id_cliente', sa.Integer(), primary_key=True),
+        sa.Column('nome', sa.String(50), nullable=False),
+        sa.Column('cpf', sa.String(14), nullable=False, unique=True),
+        sa.Column('telefone', sa.String(20), nullable=False),
+        sa.Column('email', sa.String(150), nullable=False, unique=True),
+        sa.Column('endereco', sa.String(200), nullable=False),
+        sa.Column('data_cadastro', sa.Date(), nullable=False),
+    )
+    op.create_table(
+        'mecanico',
+        sa.Column('id_mecanico', sa.Integer(), primary_key=True),
+        sa.Column('nome', sa.String(50), nullable=False),
+        sa.Column('cpf', sa.String(14), nullable=False, unique=True),
+        sa.Column('telefone', sa.String(20), nullable=False),
+        sa.Column('especialidade', sa.String(50)),
+        sa.Column('data_admissao', sa.Date(), nullable=False),
+    )
+    op.create_table(
+        'servico',
+        sa.Column('id_servico', sa.Integer(), primary_key=True),
+        sa.Column('nome_servico', sa.String(50), nullable=False),
+        sa.Column('descricao', sa.String(200)),
+        sa.Column('preco_base', sa.Numeric(10, 2), nullable=False),
+        sa.Column('tempo_estimado', sa.Integer()),
+    )
+    op.create_table(
+        'peca',
+        sa.Column('id_peca', sa.Integer(), primary_key=True),
+        sa.Column('nome_peca', sa.String(50), nullable=False),
+        sa.Column('descricao', sa.String(200)),
+        sa.Column('preco_custo', sa.Numeric(10, 2), nullable=False),
+        sa.Column('preco_venda', sa.Numeric(10, 2), nullable=False),
+        sa.Column('estoque_minimo', sa.Integer()),
+        sa.Column('estoque_atual', sa.Integer(), nullable=False),
+    )
+    op.create_table(
+        'veiculo',
+        sa.Column('id_veiculo', sa.Integer(), primary_key=True),
+        sa.Column('placa', sa.String(8), nullable=False, unique=True),
+        sa.Column('marca', sa.String(50), nullable=False),
+        sa.Column('modelo', sa.String(50), nullable=False),
+        sa.Column('ano', sa.Integer(), nullable=False),
+        sa.Column('cor', sa.String(30)),
+        sa.Column('km_atual', sa.Integer()),
+        sa.Column('id_cliente', sa.Integer(), sa.ForeignKey('cliente.id_cliente'), nullable=False),
+    )
+    op.create_table(
+        'agendamento',
+        sa.Column('id_agendamento', sa.Integer(), primary_key=True),
+        sa.Column('data_agendamento', sa.Date(), nullable=False),
+        sa.Column('hora_agendamento', sa.Time(), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False),
+        sa.Column('observacoes', sa.String(200)),
+        sa.Column('id_veiculo', sa.Integer(), sa.ForeignKey('veiculo.id_veiculo'), nullable=False),
+        sa.Column('id_mecanico', sa.Integer(), sa.ForeignKey('mecanico.id_mecanico'), nullable=False),
+    )
+    op.create_table(
+        'ordem_de_servico',
+        sa.Column('id_ordem_servico', sa.Integer(), primary_key=True),
+        sa.Column('numero_os', sa.String(20), nullable=False, unique=True),
+        sa.Column('data_abertura', sa.DateTime(), nullable=False),
+        sa.Column('data_conclusao', sa.DateTime()),
+        sa.Column('status', sa.String(20), nullable=False),
+        sa.Column('valor_total', sa.Numeric(10, 2)),
+        sa.Column('observacoes', sa.String(200)),
+        sa.Column('id_agendamento', sa.Integer(), sa.ForeignKey('agendamento.id_agendamento')),
+        sa.Column('id_veiculo', sa.Integer(), sa.ForeignKey('veiculo.id_veiculo'), nullable=False),
+        sa.Column('id_mecanico', sa.Integer(), sa.ForeignKey('mecanico.id_mecanico'), nullable=False),
+    )
+    op.create_table(
+        'item_ordem_servico',
+        sa.Column('id_item_os', sa.Integer(), primary_key=True),
+        sa.Column('id_ordem_servico', sa.Integer(), sa.ForeignKey('ordem_de_servico.id_ordem_servico')),
+        sa.Column('id_servico', sa.Integer(), sa.ForeignKey('servico.id_servico')),
+        sa.Column('quantidade', sa.Integer(), nullable=False),
+        sa.Column('preco_unitario', sa.Numeric(10, 2), nullable=False),
+        sa.Column('desconto', sa.Numeric(10, 2)),
+        sa.Column('valor_total', sa.Numeric(10, 2), nullable=False),
+    )
+    op.create_table(
+        'peca_ordem_servico',
+        sa.Column('id_peca_os', sa.Integer(), primary_key=True),
+        sa.Column('id_ordem_servico', sa.Integer(), sa.ForeignKey('ordem_de_servico.id_ordem_servico')),
+        sa.Column('id_peca', sa.Integer(), sa.ForeignKey('peca.id_peca')),
+        sa.Column('quantidade', sa.Integer(), nullable=False),
+        sa.Column('preco_unitario', sa.Numeric(10, 2), nullable=False),
+        sa.Column('valor_total', sa.Numeric(10, 2), nullable=False),
+    )
+
+
+def downgrade():
+    for tabela in ('peca_ordem_servico', 'item_ordem_servico', 'ordem_de_servico', 'agendamento',
+                   'veiculo', 'peca', 'servico', 'mecanico', 'cliente'):
+        op.drop_table(tabela)
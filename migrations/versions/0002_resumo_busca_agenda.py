@@ -0,0 +1,78 @@
+"""resumo diário, reposição, busca por trigramas e agenda com duração
+
+Depois do upgrade rode `flask resumo-backfill` antes de ligar RESUMO_DIARIO=1.
+
+Revision ID: 0002_resumo_busca_agenda
+Revises: 0001_esquema_inicial
+Create Date: 2026-10-18 14:31:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_resumo_busca_agenda'
+down_revision = '0001_esquema_inicial'
+branch_labels = None
+depends_on = None
+
+# (nome, tabela, colunas) — só no PostgreSQL (pg_trgm)
+TRIGRAMAS = (
+    ('ix_cliente_busca_trgm', 'cliente', ('nome', 'cpf', 'telefone', 'email')),
+    ('ix_veiculo_busca_trgm', 'veiculo', ('placa', 'modelo')),
+    ('ix_mecanico_nome_trgm', 'mecanico', ('nome',)),
+    ('ix_servico_nome_trgm', 'servico', ('nome_servico',)),
+    ('ix_peca_nome_trgm', 'peca', ('nome_peca',)),
+    ('ix_ordem_busca_trgm', 'ordem_de_servico', ('numero_os',)),
+)
+
+
+def _postgresql():
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def upgrade():
+    op.create_table(
+        'resumo_diario',
+        sa.Column('dia', sa.Date(), primary_key=True),
+        sa.Column('id_mecanico', sa.Integer(), primary_key=True),
+        sa.Column('ordens_abertas', sa.Integer(), nullable=False),
+        sa.Column('ordens_concluidas', sa.Integer(), nullable=False),
+        sa.Column('receita', sa.Numeric(12, 2), nullable=False),
+        sa.Column('agendamentos', sa.Integer(), nullable=False),
+    )
+
+    op.create_index('ix_peca_reposicao', 'peca', ['nome_peca', 'id_peca'],
+                    postgresql_where=sa.text('estoque_atual < estoque_minimo'),
+                    sqlite_where=sa.text('estoque_atual < estoque_minimo'))
+
+    with op.batch_alter_table('agendamento') as tabela:
+        tabela.add_column(sa.Column('duracao_minutos', sa.Integer(), nullable=False, server_default='60'))
+    op.create_index('ix_agendamento_mecanico_data', 'agendamento', ['id_mecanico', 'data_agendamento'])
+
+    if _postgresql():
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        for nome, tabela, colunas in TRIGRAMAS:
+            op.create_index(nome, tabela, list(colunas), postgresql_using='gin',
+                            postgresql_ops={c: 'gin_trgm_ops' for c in colunas})
+        # falha se já houver agendamentos sobrepostos: resolva-os antes do upgrade
+        op.execute(
+            "ALTER TABLE agendamento ADD CONSTRAINT ex_agendamento_sobreposto "
+            "EXCLUDE USING gist (id_mecanico WITH =, tsrange("
+            "data_agendamento + hora_agendamento, "
+            "data_agendamento + hora_agendamento + duracao_minutos * interval '1 minute') WITH &&) "
+            "WHERE (status <> 'Cancelado')")
+
+
+def downgrade():
+    if _postgresql():
+        op.execute('ALTER TABLE agendamento DROP CONSTRAINT IF EXISTS ex_agendamento_sobreposto')
+        for nome, tabela, _ in TRIGRAMAS:
+            op.drop_index(nome, table_name=tabela)
+    op.drop_index('ix_agendamento_mecanico_data', table_name='agendamento')
+    with op.batch_alter_table('agendamento') as tabela:
+        tabela.drop_column('duracao_minutos')
+    op.drop_index('ix_peca_reposicao', table_name='peca')
+    op.drop_table('resumo_diario')
@@ -0,0 +1,50 @@
+"""índices das chaves estrangeiras e das consultas da dashboard e listagens
+
+No PostgreSQL os índices são criados com CREATE INDEX CONCURRENTLY (fora de
+transação), sem bloquear gravações nas tabelas. Use `flask verificar-indices`
+para conferir pelo EXPLAIN que as consultas quentes passam a usá-los.
+
+Revision ID: 0003_indices_consultas
+Revises: 0002_resumo_busca_agenda
+Create Date: 2026-10-18 14:32:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_indices_consultas'
+down_revision = '0002_resumo_busca_agenda'
+branch_labels = None
+depends_on = None
+
+INDICES = (
+    ('ix_cliente_nome', 'cliente', ['nome', 'id_cliente']),
+    ('ix_cliente_cadastro', 'cliente', ['data_cadastro', 'id_cliente']),
+    ('ix_veiculo_cliente', 'veiculo', ['id_cliente']),
+    ('ix_agendamento_veiculo', 'agendamento', ['id_veiculo']),
+    ('ix_agendamento_data_hora', 'agendamento', ['data_agendamento', 'hora_agendamento', 'id_agendamento']),
+    ('ix_agendamento_status', 'agendamento', ['status', 'id_agendamento']),
+    ('ix_ordem_abertura', 'ordem_de_servico', ['data_abertura', 'id_ordem_servico']),
+    ('ix_ordem_status_abertura', 'ordem_de_servico', ['status', 'data_abertura']),
+    ('ix_ordem_conclusao', 'ordem_de_servico', ['data_conclusao']),
+    ('ix_ordem_veiculo', 'ordem_de_servico', ['id_veiculo']),
+    ('ix_ordem_mecanico_abertura', 'ordem_de_servico', ['id_mecanico', 'data_abertura']),
+    ('ix_ordem_agendamento', 'ordem_de_servico', ['id_agendamento']),
+    ('ix_item_os_ordem', 'item_ordem_servico', ['id_ordem_servico']),
+    ('ix_item_os_servico', 'item_ordem_servico', ['id_servico']),
+    ('ix_peca_os_ordem', 'peca_ordem_servico', ['id_ordem_servico']),
+    ('ix_peca_os_peca', 'peca_ordem_servico', ['id_peca']),
+)
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for nome, tabela, colunas in INDICES:
+            op.create_index(nome, tabela, colunas, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for nome, tabela, _ in reversed(INDICES):
+            op.drop_index(nome, table_name=tabela, postgresql_concurrently=True, if_exists=True)
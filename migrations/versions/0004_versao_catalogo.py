@@ -0,0 +1,29 @@
+"""versão dos catálogos de referência (serviços, peças, mecânicos)
+
+Revision ID: 0004_versao_catalogo
+Revises: 0003_indices_consultas
+Create Date: 2026-10-18 16:05:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_versao_catalogo'
+down_revision = '0003_indices_consultas'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    tabela = op.create_table(
+        'versao_catalogo',
+        sa.Column('nome', sa.String(length=20), primary_key=True),
+        sa.Column('versao', sa.Integer(), nullable=False),
+    )
+    op.bulk_insert(tabela, [{'nome': nome, 'versao': 0} for nome in ('servicos', 'pecas', 'mecanicos')])
+
+
+def downgrade():
+    op.drop_table('versao_catalogo')
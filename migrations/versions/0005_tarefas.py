@@ -0,0 +1,41 @@
+"""fila de tarefas em segundo plano
+
+Revision ID: 0005_tarefas
+Revises: 0004_versao_catalogo
+Create Date: 2026-10-18 17:20:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_tarefas'
+down_revision = '0004_versao_catalogo'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'tarefa',
+        sa.Column('id_tarefa', sa.Integer(), primary_key=True),
+        sa.Column('tipo', sa.String(length=50), nullable=False),
+        sa.Column('parametros', sa.JSON(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('tentativas', sa.Integer(), nullable=False),
+        sa.Column('max_tentativas', sa.Integer(), nullable=False),
+        sa.Column('executar_apos', sa.DateTime(), nullable=False),
+        sa.Column('criada_em', sa.DateTime(), nullable=False),
+        sa.Column('iniciada_em', sa.DateTime(), nullable=True),
+        sa.Column('concluida_em', sa.DateTime(), nullable=True),
+        sa.Column('trabalhador', sa.String(length=100), nullable=True),
+        sa.Column('resultado', sa.JSON(), nullable=True),
+        sa.Column('erro', sa.Text(), nullable=True),
+    )
+    op.create_index('ix_tarefa_fila', 'tarefa', ['status', 'executar_apos', 'id_tarefa'])
+
+
+def downgrade():
+    op.drop_index('ix_tarefa_fila', table_name='tarefa')
+    op.drop_table('tarefa')
@@ -0,0 +1,24 @@
+"""batimento das tarefas em execução
+
+Revision ID: 0006_tarefa_batimento
+Revises: 0005_tarefas
+Create Date: 2026-10-19 09:10:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_tarefa_batimento'
+down_revision = '0005_tarefas'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('tarefa', sa.Column('batimento', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('tarefa', 'batimento')
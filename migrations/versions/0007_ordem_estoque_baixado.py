@@ -0,0 +1,28 @@
+"""marca as ordens cujas peças foram baixadas do estoque
+
+Revision ID: 0007_ordem_estoque_baixado
+Revises: 0006_tarefa_batimento
+Create Date: 2026-10-19 10:05:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_ordem_estoque_baixado'
+down_revision = '0006_tarefa_batimento'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # as ordens existentes ficam como não baixadas: não há como distinguir as criadas
+    # antes da baixa de estoque (ou pela carga sintética) das demais, e devolver peças
+    # que nunca saíram inflaria o estoque
+    op.add_column('ordem_de_servico', sa.Column('estoque_baixado', sa.Boolean(), nullable=False,
+                                                server_default=sa.false()))
+
+
+def downgrade():
+    op.drop_column('ordem_de_servico', 'estoque_baixado')
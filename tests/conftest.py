@@ -0,0 +1,65 @@
+import os
+from datetime import date
+import pytest
+import config
+from app import create_app, db
+from app.models import Cliente, Veiculo, Mecanico
+
+#================================
+# FIXTURES DOS TESTES
+#================================
+
+# Banco dos testes: TEST_DATABASE_URL (um PostgreSQL descartável: as tabelas são
+# apagadas e recriadas a cada teste) ou, sem ela, um SQLite temporário. Testes que
+# dependem do PostgreSQL (concorrência, COPY) são pulados no SQLite.
+
+
+@pytest.fixture
+def criar_app(tmp_path, monkeypatch):
+    # criar_app(RESUMO_DIARIO=True, ...) -> app com o esquema vazio
+    criados = []
+
+    def criar(**configuracao):
+        url = os.getenv('TEST_DATABASE_URL') or f"sqlite:///{tmp_path / 'teste.db'}"
+        monkeypatch.setattr(config.Config, 'SQLALCHEMY_DATABASE_URI', url)
+        for chave, valor in configuracao.items():
+            monkeypatch.setattr(config.Config, chave, valor, raising=False)
+        app = create_app()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+        criados.append(app)
+        return app
+
+    yield criar
+    for app in criados:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+
+@pytest.fixture
+def app(criar_app):
+    return criar_app()
+
+
+@pytest.fixture
+def postgresql(app):
+    with app.app_context():
+        if db.engine.dialect.name != 'postgresql':
+            pytest.skip('requer PostgreSQL (TEST_DATABASE_URL)')
+
+
+@pytest.fixture
+def cadastro(app):
+    # um cliente, um veículo e três mecânicos; devolve (id_veiculo, [id_mecanico, ...])
+    with app.app_context():
+        cliente = Cliente(nome='Cliente Teste', cpf='000.000.000-00', telefone='0', email='c@teste',
+                          endereco='Rua', data_cadastro=date(2024, 1, 1))
+        veiculo = Veiculo(placa='TST0A00', marca='Marca', modelo='Modelo', ano=2020, cliente=cliente)
+        equipe = [Mecanico(nome=f'Mecânico {i}', cpf=f'111.111.111-{i:02d}', telefone='0',
+                           data_admissao=date(2024, 1, 1)) for i in range(3)]
+        db.session.add_all([cliente, veiculo, *equipe])
+        db.session.commit()
+        return veiculo.id_veiculo, [m.id_mecanico for m in equipe]
@@ -0,0 +1,63 @@
+from datetime import date, datetime, time, timedelta
+import pytest
+from app import agenda, db
+from app.models import Agendamento
+
+DIA = date.today() + timedelta(days=2)
+
+
+@pytest.fixture
+def app(criar_app):
+    # expediente de 24h, todos os dias: o horário livre pode cair na madrugada
+    return criar_app(AGENDA_INICIO='00:00', AGENDA_FIM='23:59', AGENDA_DIAS='0,1,2,3,4,5,6')
+
+
+@pytest.fixture
+def noturno(app, cadastro):
+    # 23:00 -> 01:00 do dia seguinte
+    veiculo, (mecanico, _, _) = cadastro
+    with app.app_context():
+        db.session.add(Agendamento(data_agendamento=DIA, hora_agendamento=time(23), duracao_minutos=120,
+                                   status='Agendado', id_veiculo=veiculo, id_mecanico=mecanico))
+        db.session.commit()
+    return veiculo, mecanico
+
+
+def _novo(veiculo, mecanico, dia, hora, duracao=60):
+    return Agendamento(data_agendamento=dia, hora_agendamento=hora, duracao_minutos=duracao,
+                       status='Agendado', id_veiculo=veiculo, id_mecanico=mecanico)
+
+
+def test_conflito_depois_da_meia_noite(app, noturno):
+    veiculo, mecanico = noturno
+    with app.app_context():
+        with pytest.raises(agenda.ConflitoAgenda):
+            agenda.validar(_novo(veiculo, mecanico, DIA + timedelta(days=1), time(0, 30)))
+        agenda.validar(_novo(veiculo, mecanico, DIA + timedelta(days=1), time(1)))
+
+
+def test_conflito_com_agendamento_que_atravessa_a_meia_noite(app, noturno):
+    veiculo, mecanico = noturno
+    with app.app_context():
+        with pytest.raises(agenda.ConflitoAgenda):
+            agenda.validar(_novo(veiculo, mecanico, DIA, time(22, 30)))
+        with pytest.raises(agenda.ConflitoAgenda):
+            agenda.validar(_novo(veiculo, mecanico, DIA, time(21), duracao=24 * 60 + 15))
+
+
+def test_proximo_horario_pula_a_madrugada_ocupada(app, noturno):
+    _, mecanico = noturno
+    with app.app_context():
+        achado = agenda.proximo_horario(id_mecanico=mecanico, duracao=60,
+                                        a_partir=datetime.combine(DIA + timedelta(days=1), time(0)))
+    assert achado == (mecanico, datetime.combine(DIA + timedelta(days=1), time(1)))
+
+
+def test_proximo_horario_com_fuso(app, noturno):
+    _, mecanico = noturno
+    local = datetime.combine(DIA + timedelta(days=1), time(0))
+    resposta = app.test_client().get('/agenda/proximo-horario', query_string={
+        'mecanico': mecanico, 'duracao': 60, 'a_partir': local.astimezone().isoformat()})
+    assert resposta.status_code == 200
+    assert resposta.json['data'] == local.date().isoformat()
+    assert resposta.json['hora'] == '01:00'
@@ -0,0 +1,75 @@
+from datetime import date, datetime, time
+from decimal import Decimal
+import pytest
+from flask import url_for
+from app import db
+from app.carregamento import CARREGAMENTOS
+from app.models import (Cliente, Veiculo, Mecanico, Servico, Peca, Agendamento, OrdemDeServico,
+                        ItemOrdemServico, PecaOrdemServico)
+
+# Statements por página, com qualquer número de linhas: cada rota carrega os
+# relacionamentos junto (joinedload) e o modo estrito transforma um lazy load
+# esquecido em erro. Uma rota nova em CARREGAMENTOS precisa de limite aqui.
+LIMITES = {
+    'clientes_listar': 1,
+    'veiculos_listar': 1,
+    'mecanicos_listar': 1,
+    'servicos_listar': 1,
+    'pecas_listar': 1,
+    'pecas_reposicao': 1,
+    'agendamentos_listar': 1,
+    'ordens_listar': 1,
+    'clientes_editar': 1,
+    'servicos_editar': 1,
+    'mecanicos_editar': 1,
+    'pecas_editar': 1,
+    # + rótulo do cliente escolhido
+    'veiculos_editar': 2,
+    # com os catálogos frios (catalogos.py): + rótulo do veículo, versão e
+    # catálogo de mecânicos
+    'agendamentos_editar': 4,
+    # + linhas de serviço e de peça, rótulos do agendamento e do veículo, versão e
+    # catálogos de mecânicos, serviços e peças
+    'ordens_editar': 9,
+}
+LINHAS = 8
+
+
+@pytest.fixture
+def app(criar_app):
+    app = criar_app(CARREGAMENTO_ESTRITO=True)
+    with app.app_context():
+        for i in range(LINHAS):
+            cliente = Cliente(nome=f'Cliente {i}', cpf=f'000.000.000-{i:02d}', telefone='0',
+                              email=f'c{i}@teste', endereco='Rua', data_cadastro=date(2024, 1, 1))
+            veiculo = Veiculo(placa=f'TST0A{i:02d}', marca='Marca', modelo='Modelo', ano=2020, cliente=cliente)
+            mecanico = Mecanico(nome=f'Mecânico {i}', cpf=f'111.111.111-{i:02d}', telefone='0',
+                                data_admissao=date(2024, 1, 1))
+            agendamento = Agendamento(data_agendamento=date(2024, 5, 1 + i), hora_agendamento=time(9),
+                                      status='Agendado', veiculo=veiculo, mecanico=mecanico)
+            ordem = OrdemDeServico(numero_os=f'OS-{i}', data_abertura=datetime(2024, 5, 1 + i, 9),
+                                   status='Aberta', veiculo=veiculo, mecanico=mecanico, agendamento=agendamento)
+            servico = Servico(nome_servico=f'Serviço {i}', preco_base=Decimal('10.00'))
+            # metade abaixo do estoque mínimo, para aparecer em /pecas/reposicao
+            peca = Peca(nome_peca=f'Peça {i}', preco_custo=Decimal('1.00'), preco_venda=Decimal('2.00'),
+                        estoque_minimo=5, estoque_atual=i)
+            ordem.itens_servico.append(ItemOrdemServico(servico=servico, quantidade=1, preco_unitario=Decimal('10.00'),
+                                                        valor_total=Decimal('10.00')))
+            ordem.pecas_os.append(PecaOrdemServico(peca=peca, quantidade=1, preco_unitario=Decimal('2.00'),
+                                                   valor_total=Decimal('2.00')))
+            db.session.add_all([cliente, veiculo, mecanico, agendamento, ordem, servico, peca])
+        db.session.commit()
+    return app
+
+
+def test_toda_rota_tem_limite():
+    assert set(LIMITES) == set(CARREGAMENTOS)
+
+
+@pytest.mark.parametrize('endpoint', sorted(CARREGAMENTOS))
+def test_pagina_dentro_do_limite(app, endpoint):
+    with app.test_request_context():
+        caminho = url_for(endpoint, id=1) if endpoint.endswith('_editar') else url_for(endpoint)
+    resposta = app.test_client().get(caminho)
+    assert resposta.status_code == 200
+    assert int(resposta.headers['X-SQL-Queries']) <= LIMITES[endpoint]
@@ -0,0 +1,56 @@
+from datetime import date, datetime, time, timedelta
+import pytest
+from app import db
+from app.dashboard import dashboard_cache
+from app.models import Agendamento, OrdemDeServico
+
+# Statements de / com o snapshot frio (contagens + séries + as duas listas) e quente
+# (tudo do cache), não importa quantos agendamentos e ordens existam.
+LIMITE_FRIO = 4
+LIMITE_QUENTE = 0
+
+
+@pytest.fixture(params=[False, True], ids=['tabelas', 'resumo'])
+def app(request, criar_app):
+    return criar_app(CARREGAMENTO_ESTRITO=True, RESUMO_DIARIO=request.param)
+
+
+@pytest.fixture
+def movimento(app, cadastro):
+    veiculo, mecanicos = cadastro
+    amanha = date.today() + timedelta(days=1)
+    with app.app_context():
+        for i in range(6):
+            mecanico = mecanicos[i % len(mecanicos)]
+            db.session.add(Agendamento(data_agendamento=amanha + timedelta(days=i), hora_agendamento=time(9),
+                                       status='Agendado', id_veiculo=veiculo, id_mecanico=mecanico))
+            db.session.add(OrdemDeServico(numero_os=f'OS-{i}', data_abertura=datetime.now() - timedelta(days=30 * i),
+                                          status='Em Andamento', id_veiculo=veiculo, id_mecanico=mecanico))
+        db.session.commit()
+    dashboard_cache.invalidar()
+
+
+def _statements(resposta):
+    assert resposta.status_code == 200
+    # o except da rota também responde 200, mas com as listas vazias
+    assert b'TST0A00' in resposta.data
+    return int(resposta.headers['X-SQL-Queries'])
+
+
+def test_dashboard_dentro_do_limite(app, movimento):
+    cliente = app.test_client()
+    assert _statements(cliente.get('/')) <= LIMITE_FRIO
+    assert _statements(cliente.get('/')) <= LIMITE_QUENTE
+
+
+def test_escrita_invalida_o_snapshot_inteiro(app, movimento, cadastro):
+    veiculo, (mecanico, _, _) = cadastro
+    cliente = app.test_client()
+    cliente.get('/')
+    with app.app_context():
+        db.session.add(Agendamento(data_agendamento=date.today(), hora_agendamento=time(7),
+                                   status='Agendado', id_veiculo=veiculo, id_mecanico=mecanico))
+        db.session.commit()
+    resposta = cliente.get('/')
+    assert int(resposta.headers['X-SQL-Queries']) > LIMITE_QUENTE
+    assert b'07:00:00' in resposta.data
@@ -0,0 +1,68 @@
+from datetime import datetime
+from decimal import Decimal
+import pytest
+from app import db
+from app.models import OrdemDeServico, Peca, PecaOrdemServico
+
+
+@pytest.fixture
+def peca(app):
+    with app.app_context():
+        nova = Peca(nome_peca='Filtro', preco_custo=Decimal('10'), preco_venda=Decimal('20'),
+                    estoque_minimo=1, estoque_atual=10)
+        db.session.add(nova)
+        db.session.commit()
+        return nova.id_peca
+
+
+def _estoque(id_peca):
+    return db.session.get(Peca, id_peca).estoque_atual
+
+
+def test_ordem_criada_baixa_e_devolve_ao_excluir(app, cadastro, peca):
+    veiculo, (mecanico, _, _) = cadastro
+    cliente = app.test_client()
+    resposta = cliente.post('/ordens/criar', data={
+        'numero_os': 'OS-1', 'data_abertura': '2024-05-01T09:00', 'status': 'Aberta',
+        'id_veiculo': veiculo, 'id_mecanico': mecanico,
+        'pecas_ids[]': [peca], 'pecas_qtd[]': [3]})
+    assert resposta.status_code == 302
+    with app.app_context():
+        ordem = db.session.query(OrdemDeServico).filter_by(numero_os='OS-1').one()
+        assert ordem.estoque_baixado
+        assert _estoque(peca) == 7
+        id_ordem = ordem.id_ordem_servico
+
+    cliente.get(f'/ordens/excluir/{id_ordem}')
+    with app.app_context():
+        assert _estoque(peca) == 10
+
+
+def test_ordem_sem_baixa_nao_devolve_ao_excluir(app, cadastro, peca):
+    # ordens antigas / da carga sintética nunca tiraram peças do estoque
+    veiculo, (mecanico, _, _) = cadastro
+    with app.app_context():
+        ordem = OrdemDeServico(numero_os='OS-LEGADO', data_abertura=datetime(2023, 1, 1), status='Concluída',
+                               id_veiculo=veiculo, id_mecanico=mecanico)
+        db.session.add(ordem)
+        db.session.flush()
+        db.session.add(PecaOrdemServico(id_ordem_servico=ordem.id_ordem_servico, id_peca=peca, quantidade=4,
+                                        preco_unitario=Decimal('20'), valor_total=Decimal('80')))
+        db.session.commit()
+        id_ordem = ordem.id_ordem_servico
+
+    app.test_client().get(f'/ordens/excluir/{id_ordem}')
+    with app.app_context():
+        assert db.session.get(OrdemDeServico, id_ordem) is None
+        assert _estoque(peca) == 10
+
+
+def test_ajuste_sem_saldo_nao_movimenta(app, peca):
+    from app.estoque import EstoqueInsuficiente, ajustar
+    with app.app_context():
+        with pytest.raises(EstoqueInsuficiente):
+            ajustar({peca: 1}, {peca: 20})
+        db.session.rollback()
+        ajustar({peca: 5}, {peca: 2})
+        db.session.commit()
+        assert _estoque(peca) == 13
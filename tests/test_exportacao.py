@@ -0,0 +1,20 @@
+import io
+from datetime import date
+import openpyxl
+from app import db
+from app.models import Cliente
+
+
+def test_xlsx_tem_cabecalho_e_todas_as_linhas(app):
+    with app.app_context():
+        db.session.add_all([Cliente(nome=f'Cliente {i}', cpf=f'000.000.000-{i:02d}', telefone='0',
+                                    email=f'c{i}@teste', endereco='Rua', data_cadastro=date(2024, 1, 1))
+                            for i in range(5)])
+        db.session.commit()
+    resposta = app.test_client().get('/exportar/clientes.xlsx')
+    assert resposta.status_code == 200
+    assert 'clientes_' in resposta.headers['Content-Disposition']
+    planilha = openpyxl.load_workbook(io.BytesIO(resposta.data), read_only=True)['clientes']
+    linhas = list(planilha.values)
+    assert linhas[0][:2] == ('id_cliente', 'nome')
+    assert [linha[1] for linha in linhas[1:]] == [f'Cliente {i}' for i in range(5)]
@@ -0,0 +1,47 @@
+import io
+import pytest
+from app import db
+from app.importacao import Importador, importar
+from app.models import Cliente, Veiculo
+
+CLIENTES = '''nome;cpf;telefone;email;endereco;data_cadastro
+Ana;111.111.111-11;0;ana@teste;"Rua A, 1";2024-01-02
+"Bruno ""B""";222.222.222-22;0;bruno@teste;Rua B;
+'''
+VEICULOS = '''placa,marca,modelo,ano,cor,km_atual,cpf_cliente
+AAA1A11,Fiat,Uno,2010,,,111.111.111-11
+BBB2B22,VW,Gol,2012,Prata,1000,222.222.222-22
+'''
+
+
+@pytest.fixture(params=[False, True], ids=['insert', 'copy'])
+def copiar(request, app):
+    if request.param:
+        with app.app_context():
+            if db.engine.dialect.name != 'postgresql':
+                pytest.skip('requer PostgreSQL (TEST_DATABASE_URL)')
+    return request.param
+
+
+def test_importa_clientes_e_veiculos(app, copiar):
+    with app.app_context():
+        assert importar(io.StringIO(CLIENTES), 'clientes', copiar=copiar).inseridos == 2
+        assert importar(io.StringIO(VEICULOS), 'veiculos', copiar=copiar).inseridos == 2
+        bruno = db.session.query(Cliente).filter_by(cpf='222.222.222-22').one()
+        assert bruno.nome == 'Bruno "B"'
+        assert db.session.query(Cliente).filter_by(cpf='111.111.111-11').one().endereco == 'Rua A, 1'
+        uno = db.session.query(Veiculo).filter_by(placa='AAA1A11').one()
+        assert (uno.cor, uno.km_atual) == (None, None)
+        assert db.session.query(Veiculo).filter_by(placa='BBB2B22').one().id_cliente == bruno.id_cliente
+
+
+def test_lote_rejeitado_pelo_banco(app, copiar, monkeypatch):
+    # duplicata que escapa da checagem prévia (como numa escrita concorrente)
+    with app.app_context():
+        importar(io.StringIO(CLIENTES), 'clientes', copiar=copiar)
+        monkeypatch.setattr(Importador, 'existentes', lambda self, linhas: {c.key: set() for c in self.unicos})
+        relatorio = importar(io.StringIO(CLIENTES), 'clientes', copiar=copiar)
+        assert relatorio.inseridos == 0
+        assert [numero for numero, _ in relatorio.erros] == [2, 3]
+        assert all('lote rejeitado pelo banco' in mensagem for _, mensagem in relatorio.erros)
+        assert db.session.query(Cliente).count() == 2
@@ -0,0 +1,35 @@
+import pytest
+from sqlalchemy import event
+from app import db, metricas, perfil
+
+TOKEN = 'segredo-de-teste'
+
+
+@pytest.fixture
+def app(criar_app, tmp_path):
+    return criar_app(PERFIL_TOKEN=TOKEN, PERFIL_DIR=str(tmp_path / 'perfis'))
+
+
+def test_token_so_pelo_cabecalho(app):
+    cliente = app.test_client()
+    assert cliente.get('/sistema/perfis', query_string={'token': TOKEN}).status_code == 404
+    assert cliente.get('/sistema/perfis', headers={'X-Perfil': 'errado'}).status_code == 404
+    assert cliente.get('/sistema/perfis', headers={'X-Perfil': TOKEN}).status_code == 200
+
+
+def test_perfil_gravado_e_aberto_com_cabecalho(app):
+    cliente = app.test_client()
+    assert cliente.get('/clientes', headers={'X-Perfil': TOKEN}).status_code == 200
+    lista = cliente.get('/sistema/perfis', headers={'X-Perfil': TOKEN})
+    assert b'clientes_listar' in lista.data
+    assert b'token=' not in lista.data
+
+
+def test_sem_gatilho_nao_toca_no_perfil(app, monkeypatch):
+    def proibido(*args):
+        raise AssertionError('Perfil criado sem gatilho')
+    monkeypatch.setattr(perfil, 'Perfil', proibido)
+    assert app.test_client().get('/clientes').status_code == 200
+    # o SQL do perfil vem do cronômetro de metricas.py, não de listeners próprios
+    with app.app_context():
+        assert event.contains(db.engine, 'after_cursor_execute', metricas._parar_cronometro)
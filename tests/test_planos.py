@@ -0,0 +1,15 @@
+from sqlalchemy import text
+from app import db, planos, semente
+
+
+def test_consultas_quentes_usam_os_indices(app, postgresql):
+    # volume pequeno, mas o bastante para o PostgreSQL preferir os índices (com
+    # menos ordens o relatório do mês ainda varre ordem_de_servico inteira)
+    with app.app_context():
+        semente.semear(clientes=2000, veiculos=2500, ordens=20000, agendamentos=5000,
+                       mecanicos=20, servicos=30, pecas=200, eco=lambda mensagem: None)
+        with db.engine.connect() as conexao:
+            conexao.execute(text('ANALYZE'))
+            resultados = planos.verificar(conexao)
+    falhas = [(descricao, sorted(usados)) for descricao, _, usados, ok in resultados if not ok]
+    assert resultados and not falhas
@@ -0,0 +1,24 @@
+from datetime import date, datetime
+from decimal import Decimal
+from app import db
+from app.models import OrdemDeServico, Servico, ItemOrdemServico
+from app.relatorios import RELATORIOS, Periodo
+
+
+def test_periodo_sem_receita_nao_divide_por_zero(app, cadastro):
+    # só itens de valor zero (cortesias): sum(total) over () = 0 no denominador
+    veiculo, (mecanico, _, _) = cadastro
+    with app.app_context():
+        servico = Servico(nome_servico='Cortesia', preco_base=Decimal('0'))
+        ordem = OrdemDeServico(numero_os='OS-0', data_abertura=datetime(2024, 5, 1), status='Concluída',
+                               id_veiculo=veiculo, id_mecanico=mecanico)
+        db.session.add_all([servico, ordem])
+        db.session.flush()
+        db.session.add(ItemOrdemServico(id_ordem_servico=ordem.id_ordem_servico, id_servico=servico.id_servico,
+                                        quantidade=1, preco_unitario=Decimal('0'), valor_total=Decimal('0')))
+        db.session.commit()
+        periodo = Periodo(date(2024, 5, 1), date(2024, 5, 31))
+        for nome in ('mecanicos', 'servicos'):
+            linhas = RELATORIOS[nome](periodo)
+            assert len(linhas) == 1
+            assert linhas[0]['participacao'] is None
@@ -0,0 +1,68 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+
+def _app_com_replica(criar_app, url, **configuracao):
+    app = criar_app(DATABASE_REPLICA_URLS=url, **configuracao)
+    return app, app.extensions['replicas']
+
+
+def test_verifica_no_maximo_uma_vez_por_intervalo(criar_app, tmp_path):
+    url = f"sqlite:///{tmp_path / 'teste.db'}"
+    app, replicas = _app_com_replica(criar_app, url, SQLALCHEMY_DATABASE_URI=url, REPLICA_VERIFICACAO=60)
+    conexoes = []
+    event.listen(replicas.engines[0], 'engine_connect', lambda conexao: conexoes.append(conexao))
+    cliente = app.test_client()
+    for _ in range(5):
+        assert cliente.get('/clientes').status_code == 200
+    # uma verificação + uma conexão da sessão por requisição
+    assert len(conexoes) == 1 + 5
+
+
+def test_queda_no_meio_da_consulta_tira_do_rodizio(criar_app, tmp_path, monkeypatch):
+    # réplica sem as tabelas; o erro é tratado como queda de conexão
+    app, replicas = _app_com_replica(criar_app, f"sqlite:///{tmp_path / 'replica.db'}", REPLICA_VERIFICACAO=60)
+    engine = replicas.engines[0]
+    monkeypatch.setattr(engine.dialect, 'is_disconnect', lambda *args: True)
+    cliente = app.test_client()
+    with pytest.raises(OperationalError):
+        cliente.get('/clientes')
+    assert replicas.candidatas() == []
+    assert cliente.get('/clientes').status_code == 200
+
+
+def test_redirect_depois_de_excluir_le_do_primario(criar_app, tmp_path):
+    # a exclusão é um GET; a réplica (atrasada) ainda tem o cliente
+    from datetime import date
+    from app import db
+    from app.models import Cliente
+    linha = {'id_cliente': 1, 'nome': 'Cliente Atrasado', 'cpf': '000.000.000-00', 'telefone': '0',
+             'email': 'atrasado@teste', 'endereco': 'Rua', 'data_cadastro': date(2024, 1, 1)}
+    app, replicas = _app_com_replica(criar_app, f"sqlite:///{tmp_path / 'replica.db'}", REPLICA_VERIFICACAO=60)
+    with app.app_context():
+        db.metadata.create_all(replicas.engines[0])
+        for bind in (db.engine, replicas.engines[0]):
+            with bind.begin() as conexao:
+                conexao.execute(Cliente.__table__.insert(), linha)
+    cliente = app.test_client()
+    assert b'Cliente Atrasado' in cliente.get('/clientes').data
+    resposta = cliente.get('/clientes/excluir/1', follow_redirects=True)
+    assert resposta.status_code == 200
+    assert b'Cliente Atrasado' not in resposta.data
+
+
+def test_snapshot_calculado_na_replica_apos_escrita_nao_fica_no_cache(criar_app, tmp_path):
+    from app import db
+    from app.dashboard import dashboard_cache
+    app, replicas = _app_com_replica(criar_app, f"sqlite:///{tmp_path / 'replica.db'}",
+                                     REPLICA_VERIFICACAO=60, REPLICA_ADERENCIA=60)
+    with app.app_context():
+        db.metadata.create_all(replicas.engines[0])
+    dashboard_cache.invalidar()
+    cliente = app.test_client()
+    assert cliente.get('/').status_code == 200
+    assert dashboard_cache.stats()['itens'] == 0
+    app.config['REPLICA_ADERENCIA'] = 0
+    assert cliente.get('/').status_code == 200
+    assert dashboard_cache.stats()['itens'] == 1
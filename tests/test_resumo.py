@@ -0,0 +1,117 @@
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Agendamento, OrdemDeServico, ResumoDiario
+from app.resumo import recalcular
+
+
+@pytest.fixture
+def app(criar_app):
+    return criar_app(RESUMO_DIARIO=True)
+
+
+def _resumo():
+    # linhas não nulas do resumo, para comparar com o recálculo completo
+    linhas = db.session.execute(select(ResumoDiario.dia, ResumoDiario.id_mecanico, ResumoDiario.ordens_abertas,
+                                       ResumoDiario.ordens_concluidas, ResumoDiario.receita,
+                                       ResumoDiario.agendamentos)).all()
+    return {(l[0], l[1]): (l[2], l[3], Decimal(l[4]), l[5]) for l in linhas if any(l[2:])}
+
+
+def _ordem(numero, veiculo, mecanico, abertura, valor, **extra):
+    return OrdemDeServico(numero_os=numero, id_veiculo=veiculo, id_mecanico=mecanico, status='Aberta',
+                          data_abertura=abertura, valor_total=valor, **extra)
+
+
+def test_diferencas_batem_com_recalculo(app, cadastro):
+    veiculo, (m1, m2, m3) = cadastro
+    with app.app_context():
+        ordens = [_ordem('OS-1', veiculo, m1, datetime(2024, 5, 1, 9), Decimal('100.00')),
+                  _ordem('OS-2', veiculo, m1, datetime(2024, 5, 1, 15), Decimal('50.00')),
+                  _ordem('OS-3', veiculo, m2, datetime(2024, 5, 2, 8), None)]
+        agendamentos = [Agendamento(data_agendamento=date(2024, 5, d), hora_agendamento=datetime(2024, 1, 1, 8 + d).time(),
+                                    status='Agendado', id_veiculo=veiculo, id_mecanico=m1) for d in (1, 2)]
+        db.session.add_all(ordens + agendamentos)
+        db.session.commit()
+
+        # troca de mecânico e de valor, conclusão em outro dia, exclusão e remarcação
+        ordens[0].id_mecanico = m3
+        ordens[0].valor_total = Decimal('120.00')
+        ordens[1].data_conclusao = datetime(2024, 5, 3, 10)
+        ordens[2].valor_total = Decimal('30.00')
+        agendamentos[0].data_agendamento = date(2024, 5, 4)
+        db.session.flush()
+        ordens[1].status = 'Concluída'         # não mexe no resumo
+        db.session.delete(agendamentos[1])
+        db.session.commit()
+
+        incremental = _resumo()
+        recalcular(db.session.connection(), date(2024, 5, 1), date(2024, 5, 31))
+        db.session.commit()
+        assert incremental == _resumo()
+        assert incremental[(date(2024, 5, 1), m3)] == (1, 0, Decimal('120.00'), 0)
+        assert incremental[(date(2024, 5, 3), m1)] == (0, 1, Decimal('0'), 0)
+
+
+def test_flush_que_falha_nao_deixa_diferencas_pendentes(app, cadastro):
+    veiculo, (m1, _, _) = cadastro
+    with app.app_context():
+        db.session.add(_ordem('OS-1', veiculo, m1, datetime(2024, 5, 1, 9), Decimal('10.00')))
+        db.session.commit()
+        db.session.add(_ordem('OS-1', veiculo, m1, datetime(2024, 5, 2, 9), Decimal('99.00')))
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+        db.session.add(_ordem('OS-2', veiculo, m1, datetime(2024, 5, 3, 9), Decimal('20.00')))
+        db.session.commit()
+
+        incremental = _resumo()
+        assert (date(2024, 5, 2), m1) not in incremental
+        recalcular(db.session.connection(), date(2024, 5, 1), date(2024, 5, 31))
+        db.session.commit()
+        assert incremental == _resumo()
+
+
+@pytest.mark.parametrize('linha_existente', [False, True])
+def test_transacoes_intercaladas_no_mesmo_dia_e_mecanico(app, cadastro, postgresql, linha_existente):
+    # duas transações abertas ao mesmo tempo gravam ordens do mesmo (dia, mecânico):
+    # a segunda espera a primeira e as duas contagens ficam no resumo
+    veiculo, (mecanico, _, _) = cadastro
+    abertura = datetime(2024, 6, 10, 9)
+    with app.app_context():
+        if linha_existente:
+            db.session.add(_ordem('OS-0', veiculo, mecanico, abertura, Decimal('5.00')))
+            db.session.commit()
+
+        primeira = Session(db.engine)
+        primeira.add(_ordem('OS-A', veiculo, mecanico, abertura, Decimal('100.00')))
+        primeira.flush()
+
+        erros = []
+
+        def segunda_transacao():
+            with app.app_context(), Session(db.engine) as segunda:
+                try:
+                    segunda.add(_ordem('OS-B', veiculo, mecanico, abertura, Decimal('40.00')))
+                    segunda.commit()
+                except Exception as e:
+                    erros.append(e)
+
+        paralela = threading.Thread(target=segunda_transacao)
+        paralela.start()
+        time.sleep(0.5)
+        assert paralela.is_alive(), 'a segunda transação deveria esperar a primeira'
+        primeira.commit()
+        primeira.close()
+        paralela.join(10)
+
+        assert not erros
+        linha = db.session.get(ResumoDiario, (abertura.date(), mecanico))
+        assert linha.ordens_abertas == (3 if linha_existente else 2)
+        assert linha.receita == (Decimal('145.00') if linha_existente else Decimal('140.00'))
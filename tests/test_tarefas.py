@@ -0,0 +1,132 @@
+import os
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Tarefa
+from app.tarefas import Trabalhador, enfileirar, PENDENTE, EXECUTANDO, FALHOU
+
+
+@pytest.fixture
+def trabalhador(app):
+    trabalhador = Trabalhador(app, threads=1, processos=0, intervalo=0.1)
+    yield trabalhador
+    trabalhador.threads.shutdown()
+    if trabalhador.processos:
+        trabalhador.processos.shutdown()
+
+
+def _fila(*tipos):
+    ids = [enfileirar(tipo).id_tarefa for tipo in tipos]
+    db.session.commit()
+    return ids
+
+
+def _futuro(resultado=None, erro=None):
+    futuro = Future()
+    if erro is None:
+        futuro.set_result(resultado)
+    else:
+        futuro.set_exception(erro)
+    return futuro
+
+
+def _iniciada(trabalhador, id_tarefa, futuro):
+    # como iniciar(), mas com um futuro já pronto
+    trabalhador.vagas[False] -= 1
+    trabalhador.em_execucao[futuro] = (id_tarefa, False)
+    return futuro
+
+
+def test_reserva_pula_a_tarefa_travada(app, postgresql, trabalhador):
+    with app.app_context():
+        primeira, segunda = _fila('resumo', 'resumo')
+        with Session(db.engine) as outra:
+            outra.execute(select(Tarefa).where(Tarefa.id_tarefa == primeira).with_for_update())
+            # sem SKIP LOCKED a reserva esperaria a outra transação
+            db.session.execute(text("SET LOCAL lock_timeout = '2s'"))
+            reservada = trabalhador.reservar(['resumo'])
+        assert reservada.id_tarefa == segunda
+        assert db.session.get(Tarefa, segunda).trabalhador == trabalhador.nome
+        assert db.session.get(Tarefa, primeira).status == PENDENTE
+
+
+def test_recupera_tarefas_sem_batimento(app, trabalhador):
+    antigo = datetime.utcnow() - timedelta(seconds=app.config['TAREFAS_TIMEOUT'] + 60)
+    with app.app_context():
+        def presa(tentativas, batimento):
+            tarefa = Tarefa(tipo='resumo', parametros={}, status=EXECUTANDO, tentativas=tentativas,
+                            max_tentativas=3, batimento=batimento, trabalhador='outro')
+            db.session.add(tarefa)
+            return tarefa
+        morta, esgotada, viva = presa(1, antigo), presa(3, antigo), presa(1, datetime.utcnow())
+        db.session.commit()
+        trabalhador.recuperar()
+        db.session.expire_all()
+        assert morta.status == PENDENTE and 'tempo esgotado' in morta.erro
+        assert esgotada.status == FALHOU
+        assert viva.status == EXECUTANDO
+
+
+def test_nao_finaliza_tarefa_de_outro_worker(app, trabalhador):
+    with app.app_context():
+        concluida, falha = _fila('resumo', 'resumo')
+        for _ in range(2):
+            trabalhador.reservar(['resumo'])
+        # dada como morta e reservada por outro worker enquanto esta ainda rodava
+        for id_tarefa in (concluida, falha):
+            db.session.get(Tarefa, id_tarefa).trabalhador = 'outro'
+        db.session.commit()
+        trabalhador.finalizar(_iniciada(trabalhador, concluida, _futuro({'linhas': 1})))
+        trabalhador.finalizar(_iniciada(trabalhador, falha, _futuro(erro=RuntimeError('x'))))
+        db.session.expire_all()
+        for id_tarefa in (concluida, falha):
+            tarefa = db.session.get(Tarefa, id_tarefa)
+            assert (tarefa.status, tarefa.trabalhador, tarefa.resultado, tarefa.erro) == (EXECUTANDO, 'outro', None, None)
+        assert trabalhador.vagas[False] == 1
+
+
+def test_falha_volta_com_espera_exponencial(app, trabalhador):
+    espera = app.config['TAREFAS_ESPERA']
+    with app.app_context():
+        id_tarefa, = _fila('resumo')
+        tarefa = db.session.get(Tarefa, id_tarefa)
+        for tentativa in range(1, tarefa.max_tentativas + 1):
+            tarefa.executar_apos = datetime.utcnow()
+            db.session.commit()
+            assert trabalhador.reservar(['resumo']).id_tarefa == id_tarefa
+            antes = datetime.utcnow()
+            trabalhador.finalizar(_iniciada(trabalhador, id_tarefa, _futuro(erro=RuntimeError('falhou'))))
+            db.session.refresh(tarefa)
+            assert tarefa.tentativas == tentativa and 'RuntimeError: falhou' in tarefa.erro
+            if tentativa < tarefa.max_tentativas:
+                assert tarefa.status == PENDENTE
+                atraso = (tarefa.executar_apos - antes).total_seconds()
+                assert espera * 2 ** (tentativa - 1) - 1 <= atraso <= espera * 2 ** (tentativa - 1) + 1
+        assert tarefa.status == FALHOU
+
+
+def test_pool_de_processos_quebrado_e_recriado(app, monkeypatch):
+    # os processos (spawn) montam o próprio app a partir do ambiente
+    monkeypatch.setenv('DATABASE_URL', app.config['SQLALCHEMY_DATABASE_URI'])
+    trabalhador = Trabalhador(app, threads=1, processos=1, intervalo=0.1)
+    try:
+        # um processo do pool morre (como num kill por falta de memória)
+        with pytest.raises(BrokenProcessPool):
+            trabalhador.processos.submit(os._exit, 1).result(60)
+        quebrado = trabalhador.processos
+        with app.app_context():
+            id_tarefa, = _fila('relatorios')
+            trabalhador.iniciar(*trabalhador.reservar(['relatorios']))
+            tarefa = db.session.get(Tarefa, id_tarefa)
+            db.session.refresh(tarefa)
+            assert (tarefa.status, tarefa.tentativas) == (PENDENTE, 0)
+        assert not trabalhador.em_execucao and trabalhador.vagas[True] == 1
+        assert trabalhador.processos is not quebrado
+        assert trabalhador.processos.submit(pow, 2, 3).result(60) == 8
+    finally:
+        trabalhador.threads.shutdown()
+        trabalhador.processos.shutdown()